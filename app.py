@@ -5,20 +5,23 @@ Based on Chituboard plugin for proper firmware communication
 Now with modular file management and plugin system
 """
 
+import time
+APP_IMPORT_STARTED = time.perf_counter()  # For the startup report in __main__
+
 import os
 import shutil
 import subprocess
-import time
+import collections
 import serial
 import threading
 from pathlib import Path
 from datetime import datetime
-from dataclasses import asdict
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from dataclasses import asdict, replace
+from flask import Flask, Response, abort, make_response, render_template, request, jsonify, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
 import logging
 import tempfile
-import re
+import json
 from enum import Enum
 from dataclasses import dataclass
 from typing import Optional
@@ -29,6 +32,18 @@ from file_routes import create_file_routes
 from config_manager import ConfigManager
 from plugin_manager import PluginManager
 from config_routes import create_config_routes
+from status_cache import StatusCache
+from command_queue import CommandPriority, SerialCommandWorker, command_priority
+from response_classifier import ResponseKind, classify_response
+from job_history import JobHistory
+from job_routes import create_job_routes
+from telemetry import Telemetry
+from telemetry_routes import create_telemetry_routes
+from metrics import REGISTRY, CONTENT_TYPE
+from printer_registry import DEFAULT_PRINTER_ID, PrinterRegistry
+from printer_routes import create_printer_routes
+from usb_gadget import UsbGadgetManager
+from usb_routes import create_usb_routes
 
 # Configuration - Use your working mount point
 USB_DRIVE_MOUNT = Path("/mnt/usb_share")  # Your working USB mount point
@@ -44,16 +59,70 @@ app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Metrics (served at /metrics)
+COMMAND_SECONDS = REGISTRY.histogram('resin_serial_command_seconds',
+                                     'Serial command round trip by G/M-code', ('printer', 'code'))
+LOCK_WAIT_SECONDS = REGISTRY.histogram('resin_serial_lock_wait_seconds',
+                                       'Time spent waiting for the serial communication lock', ('printer',))
+COMMAND_TIMEOUTS = REGISTRY.counter('resin_serial_timeouts_total',
+                                    'Commands whose reply did not arrive in time', ('printer', 'code'))
+COMMAND_ERRORS = REGISTRY.counter('resin_serial_errors_total',
+                                  'Serial I/O errors', ('printer', 'code'))
+PRINTER_CONNECTED = REGISTRY.gauge('resin_printer_connected', 'Whether the printer is connected', ('printer',))
+POLL_INTERVAL = REGISTRY.gauge('resin_status_poll_interval_seconds', 'Current status poll interval', ('printer',))
+POLLS = REGISTRY.gauge('resin_status_polls', 'Status polls since startup', ('printer',))
+QUEUE_PENDING = REGISTRY.gauge('resin_serial_queue_pending', 'Commands waiting for the serial worker', ('printer',))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('resin_http_request_seconds',
+                                          'HTTP request latency by route', ('method', 'route', 'status'))
+
+def command_code(command):
+    """Metric label for a command: its G/M-code, or 'other'"""
+    code = command.strip().split(' ', 1)[0].upper()
+    if len(code) > 1 and code[0] in 'GM' and code[1:].isdigit():
+        return code
+    return 'other'
+
+def parse_gcode(commands):
+    """
+    Normalise G-code for sending: split lines, drop ';' comments and blanks
+
+    Args:
+        commands: A string or list of strings, each possibly multi-line
+
+    Returns:
+        list: One command per entry
+    """
+    if isinstance(commands, str):
+        commands = [commands]
+    result = []
+    for text in commands:
+        for line in str(text).splitlines():
+            line = line.split(';', 1)[0].strip()
+            if line:
+                result.append(line)
+    return result
+
 # Initialize managers
-config_manager = ConfigManager()
-file_manager = FileManager(USB_DRIVE_MOUNT, ALLOWED_EXTENSIONS)
+# Settings changes are coalesced into one write per second (SD card wear)
+config_manager = ConfigManager(write_delay=1.0)
+file_manager = FileManager(USB_DRIVE_MOUNT, set(
+    config_manager.snapshot().section('file_management').get('allowed_extensions', ALLOWED_EXTENSIONS)))
+config_manager.subscribe(
+    lambda snapshot, changed: file_manager.set_allowed_extensions(
+        snapshot.section('file_management').get('allowed_extensions', ALLOWED_EXTENSIONS)),
+    {'file_management'})
 plugin_manager = PluginManager(config_manager=config_manager)
+usb_gadget = UsbGadgetManager(config_manager, USB_DRIVE_MOUNT)
+job_history = JobHistory()
+telemetry = Telemetry()
 
 # Register blueprints
 file_blueprint = create_file_routes(file_manager)
 config_blueprint = create_config_routes(config_manager, plugin_manager)
 app.register_blueprint(file_blueprint)
 app.register_blueprint(config_blueprint)
+# Plugin routes are served on demand (see PluginManager.dispatch_request)
+plugin_manager.mount(app)
 
 # Printer State Enums (from Chituboard approach)
 class PrinterState(Enum):
@@ -72,33 +141,110 @@ class PrintStatus:
     total_layers: int = 0
     current_byte: int = 0
     total_bytes: int = 0
+    time_remaining: float = 0.0
 
 class ChituboardPrinter:
     """
     Printer communication class based on Chituboard plugin approach
     Handles the specific firmware quirks and communication protocols
     """
+
+    # Longest single blocking read on the serial port (seconds)
+    READ_SLICE = 0.1
+
+    # Readiness probe: hello command retried until the board answers
+    READY_TIMEOUT = 5.0
+    READY_PROBE_TIMEOUT = 0.5
+    
+    # Unacknowledged bytes a batch may have in flight; kept well inside the
+    # firmware's serial receive buffer
+    BATCH_RX_BUFFER = 96
     
-    def __init__(self, config_manager=None):
+    # Status queries a busy board answers with "wait" instead of a report;
+    # for any other command a "wait" line is not its reply
+    BUSY_REPLY_COMMANDS = {'M27', 'M4000'}
+
+    # Firmware fixes reported through _log_replacement
+    REPLACEMENT_LABELS = {
+        ResponseKind.BUSY: "wait",
+        ResponseKind.IDENTIFIER: "identifier",
+        ResponseKind.POSITION: "M114",
+        ResponseKind.VERSION: "start",
+    }
+
+    # Adaptive polling: fast polls for this long after a state change or
+    # a user command, and when a print has less than POLL_NEAR_END left
+    POLL_TRANSITION_WINDOW = 10.0
+    POLL_NEAR_END = 30.0
+    # Steady-state interval grows by this factor per unchanged poll
+    POLL_BACKOFF = 1.5
+
+    # A print that reads as idle this long (seconds) was stopped at the printer
+    JOB_IDLE_GRACE = 15.0
+
+    # Reconnect backoff bounds (seconds)
+    RECONNECT_MIN_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30.0
+
+    def __init__(self, config_manager=None, printer_id=DEFAULT_PRINTER_ID, job_history=None, telemetry=None):
+        """
+        Args:
+            config_manager (ConfigManager): Source of the printer settings
+            printer_id (str): Registry ID; printers other than the default
+                one take their overrides from the 'printers' config section
+            job_history (JobHistory): Where this printer's jobs are recorded
+            telemetry (Telemetry): Where this printer's samples are recorded
+        """
         self.config_manager = config_manager
+        self.printer_id = printer_id
+        if job_history is None:
+            job_history = JobHistory() if printer_id == DEFAULT_PRINTER_ID else JobHistory(
+                f"data/job_history_{printer_id}.db")
+        self.job_history = job_history
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
         
-        # Load configuration
-        printer_config = config_manager.get_app_config('printer') if config_manager else {}
-        
-        self.serial_port = printer_config.get('serial_port', '/dev/serial0')
-        self.baudrate = printer_config.get('baudrate', 115200)
-        self.timeout = printer_config.get('timeout', 5.0)
-        self.firmware_version = printer_config.get('firmware_version', 'V4.13')
+        # Load configuration; later changes are applied live (see apply_config)
+        self.serial_port = None
+        self.baudrate = None
+        self._serial_settings_changed = False
+        self.apply_config(self.printer_config(config_manager.snapshot()) if config_manager else {})
+        self._config_subscription = None
+        if config_manager:
+            self._config_subscription = config_manager.subscribe(
+                lambda snapshot, changed: self.apply_config(self.printer_config(snapshot)),
+                {'printer', 'printers'})
         
         self.connection = None
         self.is_connected = False
         self.print_status = PrintStatus()
         self.selected_file = ""
+        self.layer_index = None
         self.z_position = 0.0
+        self.bed_temperature = None
         self._communication_lock = threading.Lock()
+        self._command_worker = SerialCommandWorker(self._execute_command, name=f"serial-io-{printer_id}",
+                                                   execute_batch=self._execute_batch)
+        self._read_buffer = bytearray()
         self._logged_replacements = {}
         self._monitoring_thread = None
         self._stop_monitoring = False
+        self.status_cache = StatusCache()
+        
+        # Adaptive poll scheduling (see _next_poll_interval)
+        self.poll_interval = self.status_poll_fast_interval
+        self.polls_total = 0
+        self._fast_poll_until = 0.0
+        self._last_polled_state = None
+        self._job_idle_since = None
+        
+        # Connection supervision (see _monitoring_loop)
+        self.connection_state = 'disconnected'
+        self.last_connect_error = None
+        self.auto_reconnect = True
+        self._reconnect_delay = self.RECONNECT_MIN_DELAY
+        self._next_reconnect = None
+        self._wake_event = threading.Event()
+        self._connected_event = threading.Event()
         
         # Chituboard communication settings
         self.communication_settings = {
@@ -113,53 +259,80 @@ class ChituboardPrinter:
             'exclusive': True
         }
         
-        # Regex patterns for parsing responses (from Chituboard)
-        self.regex_float_pattern = r"[-+]?[0-9]*\.?[0-9]+"
-        self.regex_int_pattern = r"\d+"
-        self.parse_M4000 = {
-            "floatB": re.compile(r"(^|[^A-Za-z])[Bb]:\s*(?P<actual>%s)(\s*\/?\s*(?P<target>%s))?" %
-                             (self.regex_float_pattern, self.regex_float_pattern)),
-            "floatD": re.compile(r"(^|[^A-Za-z])[Dd]z?\s*(?P<current>%s)(\s*\/?\s*(?P<total>%s))(\s*\/?\s*(?P<pause>%s))?" %
-                             (self.regex_float_pattern, self.regex_float_pattern, self.regex_int_pattern)),
-            "floatX": re.compile(r"(^|[^A-Za-z])[Xx]:(?P<value>%s)" % self.regex_float_pattern),
-            "floatY": re.compile(r"(^|[^A-Za-z])[Yy]:(?P<value>%s)" % self.regex_float_pattern),
-            "floatZ": re.compile(r"(^|[^A-Za-z])[Zz]:(?P<value>%s)" % self.regex_float_pattern),
-        }
-        self.regex_sdPrintingByte = re.compile(r"(?P<current>[0-9]+)/(?P<total>[0-9]+)")
-        self.fix_M114 = re.compile(r"C: ")
         
+    def printer_config(self, snapshot):
+        """This printer's settings: the 'printer' section plus its overrides"""
+        config = dict(snapshot.section('printer'))
+        if self.printer_id != DEFAULT_PRINTER_ID:
+            overrides = snapshot.section('printers').get(self.printer_id, {})
+            config.update(overrides)
+            # Only one printer hangs off the Pi's USB port; never inherit it
+            config['usb_gadget'] = overrides.get('usb_gadget', False)
+        return config
+    
+    def apply_config(self, printer_config):
+        """
+        Apply the 'printer' config section
+        A changed serial port or baudrate makes the supervisor reconnect
+        """
+        serial_settings = (self.serial_port, self.baudrate)
+        self.name = printer_config.get('name', self.printer_id)
+        # Whether this printer reads the USB gadget images (the file manager's files)
+        self.usb_gadget = printer_config.get('usb_gadget', True)
+        self.serial_port = printer_config.get('serial_port', '/dev/serial0')
+        self.baudrate = printer_config.get('baudrate', 115200)
+        self.timeout = printer_config.get('timeout', 5.0)
+        self.firmware_version = printer_config.get('firmware_version', 'V4.13')
+        self.status_poll_interval = printer_config.get('status_poll_interval', 2.0)
+        self.status_poll_fast_interval = printer_config.get('status_poll_fast_interval', 0.5)
+        self.status_poll_max_interval = printer_config.get('status_poll_max_interval', 8.0)
+        self.status_poll_idle_interval = printer_config.get('status_poll_idle_interval', 5.0)
+        self.status_max_age = printer_config.get('status_max_age', 10.0)
+        
+        if serial_settings != (None, None) and serial_settings != (self.serial_port, self.baudrate):
+            logger.info(f"Serial settings changed to {self.serial_port} @ {self.baudrate}")
+            self._serial_settings_changed = True
+            self._reconnect_delay = self.RECONNECT_MIN_DELAY
+            self._wake_event.set()
+    
     def connect(self):
-        """Connect to printer with proper initialization"""
+        """
+        Connect to printer with proper initialization
+        
+        Rather than sleeping fixed settle times, the hello command is repeated
+        until the board answers (it may still be booting after the port open)
+        or READY_TIMEOUT expires.
+        """
         try:
             if self.connection and self.connection.is_open:
                 self.connection.close()
+            self.is_connected = False
+            self.connection_state = 'connecting'
                 
-            # Give the serial port a moment to be available
-            time.sleep(1)
-                
+            # Reads block for at most one short slice so the reply deadline in
+            # _read_line is honoured; they still return as soon as data arrives
             self.connection = serial.Serial(
                 port=self.serial_port,
                 baudrate=self.baudrate,
-                timeout=self.timeout,
+                timeout=min(self.timeout, self.READ_SLICE),
                 exclusive=False  # Changed to False for compatibility
             )
             
-            # Wait for connection to stabilize
-            time.sleep(2)
-            
             # Clear any pending data
             self.connection.reset_input_buffer()
             self.connection.reset_output_buffer()
             
             # Send hello command (Chituboard approach)
-            response = self._send_command("M4002")
+            response = self._wait_until_ready()
             if response:
                 self.is_connected = True
+                self.connection_state = 'connected'
+                self.last_connect_error = None
+                self._connected_event.set()
                 
                 # Initialize SD card (critical for USB gadget mode)
                 try:
                     self._send_command("M21")  # Initialize SD card
-                    time.sleep(1)
                 except Exception as e:
                     logger.debug(f"SD initialization warning: {e}")
                 
@@ -180,6 +353,7 @@ class ChituboardPrinter:
                 
                 # Call plugin hook
                 plugin_manager.call_hook('printer_connected', {
+                    'printer_id': self.printer_id,
                     'firmware_version': self.firmware_version,
                     'serial_port': self.serial_port,
                     'baudrate': self.baudrate
@@ -189,17 +363,40 @@ class ChituboardPrinter:
                 return True
             else:
                 logger.error("No response to hello command")
+                self.last_connect_error = "No response to hello command"
+                self.connection.close()
+                self.connection_state = 'disconnected'
                 return False
                 
         except Exception as e:
             logger.error(f"Failed to connect to printer: {e}")
             self.is_connected = False
+            self.connection_state = 'disconnected'
+            self.last_connect_error = str(e)
             return False
     
+    def _wait_until_ready(self):
+        """
+        Probe the firmware with the hello command until it replies
+        
+        Returns:
+            str: The hello response, or "" if the board never answered
+        """
+        deadline = time.monotonic() + self.READY_TIMEOUT
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return ""
+            response = self._send_command("M4002", timeout=min(self.READY_PROBE_TIMEOUT, remaining))
+            if response:
+                return response
+    
     def disconnect(self):
-        """Disconnect from printer"""
+        """Disconnect from printer and stop reconnecting until asked to"""
         try:
+            self.auto_reconnect = False
             self._stop_monitoring = True
+            self._wake_event.set()
             if self._monitoring_thread and self._monitoring_thread.is_alive():
                 self._monitoring_thread.join(timeout=5)
                 
@@ -210,178 +407,510 @@ class ChituboardPrinter:
             plugin_manager.call_hook('printer_disconnected')
             
             self.is_connected = False
+            self.connection_state = 'disconnected'
+            self._connected_event.clear()
+            self._publish_status()
             logger.info("Disconnected from printer")
         except Exception as e:
             logger.error(f"Error disconnecting: {e}")
     
+    def shutdown(self):
+        """Disconnect for good and release the worker thread (printer removed)"""
+        if self._config_subscription and self.config_manager:
+            self.config_manager.unsubscribe(self._config_subscription)
+        self.disconnect()
+        self._command_worker.stop()
+    
     def _start_monitoring(self):
         """Start monitoring thread for USB status and printer communication"""
         if self._monitoring_thread and self._monitoring_thread.is_alive():
             return
             
         self._stop_monitoring = False
-        self._monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
+        self._monitoring_thread = threading.Thread(target=self._monitoring_loop, daemon=True,
+                                                   name=f"printer-monitor-{self.printer_id}")
         self._monitoring_thread.start()
-        logger.info("Started printer monitoring thread")
+        logger.info(f"Started printer monitoring thread for {self.printer_id}")
+    
+    def ensure_monitoring(self):
+        """Start the status poller if it is not already running (unless manually disconnected)"""
+        if not self.auto_reconnect:
+            return
+        if not (self._monitoring_thread and self._monitoring_thread.is_alive()):
+            self._start_monitoring()
+    
+    def request_reconnect(self):
+        """Reconnect as soon as possible, resetting the backoff"""
+        self.auto_reconnect = True
+        self._reconnect_delay = self.RECONNECT_MIN_DELAY
+        self._wake_event.set()
+        self.ensure_monitoring()
+    
+    def wait_until_connected(self, timeout):
+        """
+        Block until the supervisor has connected
+        
+        Args:
+            timeout (float): Maximum seconds to wait
+            
+        Returns:
+            bool: True if connected
+        """
+        return self._connected_event.wait(timeout)
+    
+    def connection_error(self):
+        """Describe why the printer is not connected, for API responses"""
+        if self.connection_state == 'connecting':
+            return "Connecting..."
+        if not self.auto_reconnect:
+            return "Disconnected"
+        message = self.last_connect_error or "Failed to connect"
+        if self._next_reconnect:
+            retry_in = max(0.0, self._next_reconnect - time.monotonic())
+            message += f" (retrying in {retry_in:.0f}s)"
+        return message
+    
+    def _sleep(self, seconds):
+        """Sleep that request_reconnect/disconnect can cut short"""
+        self._wake_event.wait(seconds)
+        self._wake_event.clear()
+    
+    def _connection_lost(self, error):
+        """Mark the port dead after an I/O error so the supervisor reconnects"""
+        if not self.is_connected:
+            return
+        logger.warning(f"Lost connection to printer: {error}")
+        self.is_connected = False
+        self.connection_state = 'disconnected'
+        self.last_connect_error = str(error)
+        self._connected_event.clear()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        plugin_manager.call_hook('printer_disconnected')
+        self._wake_event.set()
     
     def _monitoring_loop(self):
-        """Monitor printer status"""
-        while not self._stop_monitoring and self.is_connected:
+        """
+        Background status poller and connection supervisor
+        This is the only place status queries (M27/M4000) are sent from;
+        results are published to status_cache for the HTTP handlers.
+        While disconnected it retries with exponential backoff.
+        """
+        while not self._stop_monitoring:
             try:
-                # Update print status less frequently to avoid overwhelming printer
-                if self.print_status.state == PrinterState.PRINTING:
-                    self.get_print_status()
-                    
-                time.sleep(3)  # Check every 3 seconds instead of 1
+                if self._serial_settings_changed:
+                    self._serial_settings_changed = False
+                    if self.is_connected:
+                        # Under the lock so no command is cut off mid-reply
+                        with self._communication_lock:
+                            self._connection_lost("serial settings changed")
+                
+                if not self.is_connected:
+                    if not self.connect():
+                        delay = self._reconnect_delay
+                        self._next_reconnect = time.monotonic() + delay
+                        self._publish_status()
+                        logger.info(f"Printer not available, retrying in {delay:.1f}s")
+                        self._sleep(delay)
+                        self._reconnect_delay = min(self._reconnect_delay * 2, self.RECONNECT_MAX_DELAY)
+                        continue
+                    self._reconnect_delay = self.RECONNECT_MIN_DELAY
+                    self._next_reconnect = None
+                
+                # Idle probe is M27 only; Z and the bed/resin temperature can
+                # only change while printing or after a command, which opens
+                # the fast-poll window, and M4000 reports them with the progress
+                detailed = (self.print_status.state in (PrinterState.PRINTING, PrinterState.PAUSED) or
+                            time.monotonic() < self._fast_poll_until)
+                status = self.get_print_status(detailed)
+                self.polls_total += 1
+                
+                self._track_job(status)
+                self.telemetry.record(status.progress_percent, status.current_byte, status.current_layer,
+                                 self.z_position, self.bed_temperature)
+                interval = self._next_poll_interval(status)
+                self._publish_status(status)
+                self._sleep(interval)
                 
             except Exception as e:
                 logger.debug(f"Monitoring loop error: {e}")
-                time.sleep(5)
+                self._sleep(self.status_poll_interval)
+    
+    def _next_poll_interval(self, status):
+        """
+        Choose the delay before the next status poll
+        
+        Fast around state changes, user commands and the end of a print;
+        growing from status_poll_interval up to status_poll_max_interval
+        while a print runs unchanged; status_poll_idle_interval when idle,
+        which still notices prints started from the touchscreen.
+        """
+        now = time.monotonic()
+        if status.state != self._last_polled_state:
+            if self._last_polled_state is not None:
+                logger.debug(f"Printer state {self._last_polled_state} -> {status.state}, polling fast")
+            self._last_polled_state = status.state
+            self._fast_poll_until = max(self._fast_poll_until, now + self.POLL_TRANSITION_WINDOW)
+        
+        active = status.state in (PrinterState.PRINTING, PrinterState.PAUSED)
+        near_end = (status.state == PrinterState.PRINTING and
+                    ((status.time_remaining and status.time_remaining < self.POLL_NEAR_END) or
+                     status.progress_percent >= 99))
+        
+        if now < self._fast_poll_until or near_end:
+            interval = self.status_poll_fast_interval
+        elif active:
+            if self.poll_interval < self.status_poll_interval:
+                interval = self.status_poll_interval
+            else:
+                interval = min(self.poll_interval * self.POLL_BACKOFF, self.status_poll_max_interval)
+        else:
+            interval = self.status_poll_idle_interval
+        
+        self.poll_interval = interval
+        return interval
+    
+    def _track_job(self, status):
+        """
+        Keep the job history in step with polled printer state
+        Catches prints started, finished or stopped on the printer itself
+        """
+        state = status.state
+        if self.job_history.active_job is None:
+            if state in (PrinterState.PRINTING, PrinterState.PAUSED):
+                self.job_history.begin(self.selected_file, status.total_layers)
+            return
+        
+        if state == PrinterState.FINISHED:
+            self.job_history.finish('completed', 100.0)
+            self._job_idle_since = None
+        elif state == PrinterState.IDLE:
+            # Right after M6030 the board reports byte 0 (idle) for a while
+            now = time.monotonic()
+            if self._job_idle_since is None:
+                self._job_idle_since = now
+            elif now - self._job_idle_since > self.JOB_IDLE_GRACE:
+                self.job_history.finish('stopped', status.progress_percent)
+                self._job_idle_since = None
+        elif state in (PrinterState.PRINTING, PrinterState.PAUSED):
+            self._job_idle_since = None
+            self.job_history.sample(status.progress_percent, status.current_layer, status.total_layers)
+    
+    def _mark_activity(self):
+        """Poll fast for a while and right away, e.g. after a user command"""
+        self._fast_poll_until = time.monotonic() + self.POLL_TRANSITION_WINDOW
+        self._wake_event.set()
+    
+    def _publish_status(self, status=None):
+        """Publish the current printer state to the status cache"""
+        PRINTER_CONNECTED.set(1 if self.is_connected else 0, self.printer_id)
+        POLL_INTERVAL.set(self.poll_interval, self.printer_id)
+        POLLS.set(self.polls_total, self.printer_id)
+        QUEUE_PENDING.set(self._command_worker.pending(), self.printer_id)
+        if self.is_connected:
+            data = {
+                'printer_id': self.printer_id,
+                'name': self.name,
+                'connected': True,
+                'connection_state': self.connection_state,
+                'firmware_version': self.firmware_version,
+                'print_status': serialize_print_status(status or self.print_status),
+                'selected_file': self.selected_file,
+                'z_position': self.z_position,
+                'poll_interval': self.poll_interval
+            }
+        else:
+            data = {
+                'printer_id': self.printer_id,
+                'name': self.name,
+                'connected': False,
+                'connection_state': self.connection_state,
+                'firmware_version': f"Connection Error: {self.connection_error()}",
+                'print_status': serialize_print_status(PrintStatus(state=PrinterState.IDLE)),
+                'selected_file': "",
+                'z_position': 0.0
+            }
+        return self.status_cache.publish(data)
+    
+    def send_command_async(self, command, timeout=None, priority=None):
+        """
+        Queue a command on the serial I/O worker
+
+        Pause/resume/stop jump ahead of queued commands and status polls
+        wait behind everything else (see command_queue.command_priority).
+
+        Args:
+            command (str): Command to send
+            timeout (float): Reply timeout, defaults as in _execute_command
+            priority (CommandPriority): Optional explicit priority
+
+        Returns:
+            Future: Resolves to the classified FirmwareResponse
+            (its .text is the processed response)
+        """
+        if not self.connection or not self.connection.is_open:
+            raise Exception("Printer not connected")
+        if priority is None:
+            priority = command_priority(command)
+        if priority != CommandPriority.STATUS and self.is_connected:
+            self._mark_activity()
+        return self._command_worker.submit(command, timeout, priority)
     
     def _send_command(self, command, timeout=None):
+        """Send command to printer and wait for the processed response"""
+        return self.send_command_async(command, timeout).result().text
+    
+    def _query(self, command, timeout=None):
+        """Send command to printer and wait for the classified FirmwareResponse"""
+        return self.send_command_async(command, timeout).result()
+    
+    def send_commands(self, commands, timeout=None):
+        """
+        Run several commands back to back, one reply per command
+
+        The batch holds the serial port for its whole duration, so status
+        polls and other callers cannot interleave with it. Nothing more is
+        sent after an error reply.
+
+        Args:
+            commands (list): Commands in order; multi-line strings are split
+                and ';' comments and blank lines dropped
+            timeout (float): Per-reply timeout, defaults as in _execute_command
+
+        Returns:
+            list: FirmwareResponse per command that was sent
+        """
+        commands = parse_gcode(commands)
+        if not commands:
+            return []
+        if not self.connection or not self.connection.is_open:
+            raise Exception("Printer not connected")
+        self._mark_activity()
+        return self._command_worker.submit_batch(commands, timeout).result()
+    
+    def _execute_command(self, command, timeout=None):
         """
         Send command to printer with proper response handling
         Based on Chituboard's communication approach
+        Only runs on the serial I/O worker thread
+        """
+        return self._execute_batch([command], timeout)[0]
+    
+    def _execute_batch(self, commands, timeout=None):
+        """
+        Send commands and collect one reply line each, under a single
+        acquisition of the communication lock
+        
+        Commands are streamed ahead of their replies as long as the
+        unacknowledged bytes fit in BATCH_RX_BUFFER (character counting),
+        so a macro costs little more than one round trip. Commands with
+        long replies (M23/M6030) are never overlapped with others. In a
+        batch, "wait" lines the busy firmware sends unprompted are skipped
+        (see _read_reply), so they cannot shift later replies.
+        Only runs on the serial I/O worker thread
+        
+        Args:
+            commands (list): Single-line commands
+            timeout (float): Per-reply timeout, defaults as in _execute_command
+        
+        Returns:
+            list: FirmwareResponse per command sent; shorter than commands
+            if it stopped at an error or missing reply
         """
         if not self.connection or not self.connection.is_open:
             raise Exception("Printer not connected")
-            
+        
+        lock_requested = time.perf_counter()
         with self._communication_lock:
+            LOCK_WAIT_SECONDS.observe(time.perf_counter() - lock_requested, self.printer_id)
+            responses = []
+            in_flight = collections.deque()   # (command, bytes, sent at)
+            in_flight_bytes = 0
+            next_index = 0
+            command = commands[0]
             try:
-                # Clear input buffer
+                # Clear input buffer (stale bytes from a previous reply are discarded too)
                 self.connection.reset_input_buffer()
+                self._read_buffer.clear()
                 
-                # Send command with proper line ending
-                if not command.endswith('\n'):
-                    command += '\n'
-                command_bytes = command.encode('latin-1', errors='ignore')  # Use latin-1 for binary safety
-                self.connection.write(command_bytes)
-                self.connection.flush()
-                
-                # Wait for response with extended timeout for USB operations
-                response_timeout = timeout or (self.timeout * 3 if 'M6030' in command or 'M23' in command else self.timeout)
-                response = ""
-                start_time = time.time()
-                
-                while time.time() - start_time < response_timeout:
-                    if self.connection.in_waiting > 0:
-                        try:
-                            # Read with latin-1 encoding for binary safety
-                            char = self.connection.read(1).decode('latin-1', errors='ignore')
-                            response += char
-                            if response.endswith('\n') or response.endswith('\r\n'):
-                                break
-                        except UnicodeDecodeError:
-                            continue
-                    else:
-                        time.sleep(0.01)
-                
-                # Process response using Chituboard approach
-                response = self._process_response(response.strip(), command.strip())
-                logger.debug(f"Command: {command.strip()} -> Response: {response}")
-                return response
+                while next_index < len(commands) or in_flight:
+                    # Send while the printer's receive buffer has room
+                    while next_index < len(commands):
+                        command = commands[next_index].strip()
+                        command_bytes = (command + '\n').encode('latin-1', errors='ignore')  # Use latin-1 for binary safety
+                        slow = self._is_slow_command(command)
+                        if in_flight and (slow or self._is_slow_command(in_flight[-1][0]) or
+                                          in_flight_bytes + len(command_bytes) > self.BATCH_RX_BUFFER):
+                            break
+                        self.connection.write(command_bytes)
+                        in_flight.append((command, len(command_bytes), time.perf_counter()))
+                        in_flight_bytes += len(command_bytes)
+                        next_index += 1
+                    self.connection.flush()
+                    
+                    # Wait for the oldest command's reply
+                    command, size, sent_at = in_flight.popleft()
+                    in_flight_bytes -= size
+                    code = command_code(command)
+                    line, response = self._read_reply(command, timeout, skip_busy=len(commands) > 1)
+                    COMMAND_SECONDS.observe(time.perf_counter() - sent_at, self.printer_id, code)
+                    logger.debug(f"Command: {command} -> Response: {response.text}")
+                    responses.append(response)
+                    
+                    if not line.endswith(b'\n'):
+                        COMMAND_TIMEOUTS.inc(self.printer_id, code)
+                        if len(commands) > 1:
+                            logger.warning(f"No reply to {command}, abandoning batch after {len(responses)} of {len(commands)} commands")
+                        break
+                    if response.kind == ResponseKind.ERROR and next_index < len(commands):
+                        logger.warning(f"{command} failed ({response.text}), abandoning batch")
+                        # Drain replies to commands already sent so they cannot leak
+                        for pending, _, _ in in_flight:
+                            responses.append(self._read_reply(pending, timeout, skip_busy=True)[1])
+                        break
+                return responses
                 
+            except (serial.SerialException, OSError) as e:
+                logger.error(f"Communication error for command {command}: {e}")
+                COMMAND_ERRORS.inc(self.printer_id, command_code(command))
+                self._connection_lost(e)
+                raise
             except Exception as e:
-                logger.error(f"Communication error for command {command.strip()}: {e}")
+                logger.error(f"Communication error for command {command}: {e}")
                 raise
     
+    def _read_reply(self, command, timeout=None, skip_busy=False):
+        """
+        Read and classify the reply to one command
+        
+        Args:
+            command (str): Command the reply belongs to
+            timeout (float): Reply timeout, defaults as in _execute_command
+            skip_busy (bool): Read past "wait" lines unless the command is
+                one the firmware answers with "wait" (BUSY_REPLY_COMMANDS)
+            
+        Returns:
+            tuple: (raw line, FirmwareResponse); the line lacks its
+            terminator if the reply did not arrive in time
+        """
+        deadline = time.monotonic() + self._reply_timeout(command, timeout)
+        line = self._read_line(deadline)
+        response = self._process_response(line, command)
+        if skip_busy and command_code(command) not in self.BUSY_REPLY_COMMANDS:
+            busy = None
+            while response.kind is ResponseKind.BUSY and line.endswith(b'\n'):
+                busy = response
+                line = self._read_line(deadline)
+                response = self._process_response(line, command)
+            if busy and not line.endswith(b'\n'):
+                # Still busy when the time ran out
+                response = busy
+        return line, response
+    
+    def _is_slow_command(self, command):
+        """USB file operations reply late and are sent on their own"""
+        return 'M6030' in command or 'M23' in command
+    
+    def _reply_timeout(self, command, timeout=None):
+        # Extended timeout for USB operations
+        return timeout or (self.timeout * 3 if self._is_slow_command(command) else self.timeout)
+    
+    def _read_line(self, deadline):
+        """
+        Read one reply line from the printer.
+
+        Pulls everything the port already holds in a single read and only
+        blocks (for at most READ_SLICE) while nothing is available, so it
+        returns as soon as the terminator arrives instead of polling.
+        Bytes received after the terminator stay buffered for the next call.
+
+        Args:
+            deadline (float): time.monotonic() value after which to give up
+
+        Returns:
+            bytes: The line including its terminator, or whatever partial
+            data arrived before the deadline
+        """
+        while True:
+            newline = self._read_buffer.find(b'\n')
+            if newline >= 0:
+                line = bytes(self._read_buffer[:newline + 1])
+                del self._read_buffer[:newline + 1]
+                return line
+
+            if time.monotonic() >= deadline:
+                break
+
+            chunk = self.connection.read(max(1, self.connection.in_waiting))
+            if chunk:
+                self._read_buffer.extend(chunk)
+
+        partial = bytes(self._read_buffer)
+        self._read_buffer.clear()
+        return partial
+
     def _process_response(self, response, original_command):
         """
         Process printer response using Chituboard's firmware fixes
-        """
-        if not response:
-            return response
+        Classification and rewriting live in response_classifier
         
-        # Handle binary data in response
-        try:
-            # Filter out non-printable characters except newlines
-            filtered_response = ''.join(char for char in response if ord(char) >= 32 or char in '\r\n\t')
-            if filtered_response != response:
-                logger.debug(f"Filtered binary data from response: {len(response)} -> {len(filtered_response)} chars")
-                response = filtered_response
-        except:
-            pass
+        Args:
+            response (bytes): Raw reply line from the port
+            original_command (str): Command the reply belongs to
             
-        # Fix "wait" responses (Chituboard fix)
-        if response == "wait" or response.startswith("wait"):
-            self._log_replacement("wait", response, "echo:busy processing")
-            return "echo:busy processing"
+        Returns:
+            FirmwareResponse: Classified reply; .text has the firmware fixes applied
+        """
+        parsed = classify_response(response, original_command, self.firmware_version)
+        if not parsed.text:
+            return parsed
         
-        # Fix firmware identifier (Chituboard fix) 
-        if "CBD make it" in response:
-            fixed = response.replace("CBD make it", f"FIRMWARE_NAME:CBD made it PROTOCOL_VERSION:{self.firmware_version}")
-            self._log_replacement("identifier", response, fixed)
-            return fixed
-        elif "ZWLF make it" in response:
-            fixed = response.replace("ZWLF make it", f"FIRMWARE_NAME:ZWLF made it PROTOCOL_VERSION:{self.firmware_version}")
-            self._log_replacement("identifier", response, fixed)
-            return fixed
-            
-        # Fix M114 response format (Chituboard fix)
-        if "C: X:" in response:
-            fixed = self.fix_M114.sub("", response)
-            self._log_replacement("M114", response, fixed)
-            return fixed
-            
-        # Process M4000 responses (temperature simulation)
-        if original_command == "M4000":
-            return self._process_m4000_response(response)
+        label = self.REPLACEMENT_LABELS.get(parsed.kind)
+        if label and parsed.text != parsed.raw:
+            self._log_replacement(label, parsed.raw, parsed.text)
+        
+        if parsed.kind is ResponseKind.VERSION:
+            self.firmware_version = parsed.version
+        elif parsed.command == "M4000":
+            if parsed.bed:
+                self.bed_temperature = float(parsed.bed[0])
+            if parsed.total_bytes:
+                self._apply_m4000_progress(parsed)
+        
+        return parsed
+    
+    def _apply_m4000_progress(self, parsed):
+        """Update print status from the D:current/total/paused field of an M4000 reply"""
+        current = parsed.current_byte
+        total = parsed.total_bytes
+        
+        self.print_status.current_byte = current
+        self.print_status.total_bytes = total
+        self.print_status.progress_percent = (current / total) * 100
+        self._update_layer_progress()
+        
+        # Check if paused
+        if parsed.paused and current > 0:
+            self.print_status.state = PrinterState.PAUSED
             
-        # Handle start command response
-        if response.startswith('ok V'):
-            self.firmware_version = response[3:]
-            fixed = 'ok start' + response
-            self._log_replacement("start", response, fixed)
-            return fixed
+        # Check if finished
+        elif current >= total:
+            self.print_status.state = PrinterState.FINISHED
             
-        return response
-    
-    def _process_m4000_response(self, response):
-        """
-        Process M4000 response and convert to temperature format
-        Based on Chituboard's approach
-        """
-        matchB = self.parse_M4000["floatB"].search(response)
-        matchD = self.parse_M4000["floatD"].search(response)
+        elif current > 0:
+            self.print_status.state = PrinterState.PRINTING
         
-        if matchB:
-            try:
-                actual = matchB.group('actual')
-                target = matchB.group('target') if matchB.group('target') else actual
-                # Convert to temperature format that monitoring expects
-                return f"T:0 /0 B:{actual} /{target}"
-            except Exception as e:
-                logger.debug(f"Error parsing M4000 B response: {e}")
-                
-        if matchD:
-            try:
-                current = int(float(matchD.group('current')))
-                total = int(float(matchD.group('total')))
-                pause = int(matchD.group('pause')) if matchD.group('pause') else 0
-                
-                # Update print status
-                if total > 0:
-                    self.print_status.current_byte = current
-                    self.print_status.total_bytes = total
-                    self.print_status.progress_percent = (current / total) * 100
-                    
-                    # Check if paused
-                    if pause == 1 and current > 0:
-                        self.print_status.state = PrinterState.PAUSED
-                        
-                    # Check if finished
-                    elif current >= total and total > 0:
-                        self.print_status.state = PrinterState.FINISHED
-                        
-                    elif current > 0:
-                        self.print_status.state = PrinterState.PRINTING
-                        
-                return f"SD printing byte {current}/{total}"
-                
-            except Exception as e:
-                logger.debug(f"Error parsing M4000 D response: {e}")
-                
-        return response
+        else:
+            self.print_status.state = PrinterState.IDLE
+    
+    def _set_not_printing(self):
+        """Reset progress after the printer reported that no print runs"""
+        self.print_status.state = PrinterState.IDLE
+        self.print_status.progress_percent = 0
+        self.print_status.current_byte = 0
+        self.print_status.current_layer = 0
     
     def _log_replacement(self, replacement_type, original, replacement):
         """Log response replacements (from Chituboard)"""
@@ -397,45 +926,58 @@ class ChituboardPrinter:
             raise Exception("Printer not connected")
         return self.firmware_version
     
-    def get_print_status(self):
-        """Get current print status"""
+    def get_print_status(self, detailed=False):
+        """
+        Get current print status
+        
+        Args:
+            detailed (bool): Query M4000 instead of M27; its reply also
+                carries Z, the bed/resin temperature and the pause flag
+        """
         if not self.is_connected:
             return PrintStatus(state=PrinterState.UNKNOWN)
             
         try:
-            # Query printer status using M27 (SD card status)
-            response = self._send_command("M27")
-            if response:
-                # Parse SD printing status
-                if "SD printing byte" in response:
-                    match = self.regex_sdPrintingByte.search(response)
-                    if match:
-                        current = int(match.group("current"))
-                        total = int(match.group("total"))
+            if detailed:
+                # Progress and temperature are applied by _process_response
+                parsed = self._query("M4000")
+                if parsed.z is not None:
+                    self.z_position = parsed.z
+                if parsed.total_bytes == 0:
+                    self._set_not_printing()
+            else:
+                # Query printer status using M27 (SD card status)
+                parsed = self._query("M27")
+                if parsed.text:
+                    # Parse SD printing status
+                    if parsed.kind is ResponseKind.PROGRESS:
+                        if parsed.printing:
+                            current = parsed.current_byte
+                            total = parsed.total_bytes
                         
-                        self.print_status.current_byte = current
-                        self.print_status.total_bytes = total
+                            self.print_status.current_byte = current
+                            self.print_status.total_bytes = total
+                            self._update_layer_progress()
                         
-                        if total > 0:
-                            self.print_status.progress_percent = (current / total) * 100
+                            if total > 0:
+                                self.print_status.progress_percent = (current / total) * 100
                             
-                            if current >= total:
-                                self.print_status.state = PrinterState.FINISHED
-                            elif current > 0:
-                                self.print_status.state = PrinterState.PRINTING
+                                if current >= total:
+                                    self.print_status.state = PrinterState.FINISHED
+                                elif current > 0:
+                                    self.print_status.state = PrinterState.PRINTING
+                                else:
+                                    self.print_status.state = PrinterState.IDLE
                             else:
                                 self.print_status.state = PrinterState.IDLE
-                        else:
-                            self.print_status.state = PrinterState.IDLE
                             
-                elif "Not SD printing" in response:
-                    self.print_status.state = PrinterState.IDLE
-                    self.print_status.progress_percent = 0
-                    self.print_status.current_byte = 0
+                        else:
+                            self._set_not_printing()
             
-            # Call plugin hook
+            # Call plugin hook (runs later on the hook executor, so pass a copy)
             plugin_manager.call_hook('status_update', {
-                'print_status': self.print_status,
+                'printer_id': self.printer_id,
+                'print_status': replace(self.print_status),
                 'z_position': self.z_position,
                 'selected_file': self.selected_file
             })
@@ -446,6 +988,15 @@ class ChituboardPrinter:
             logger.error(f"Error getting print status: {e}")
             return PrintStatus(state=PrinterState.ERROR)
     
+    def _update_layer_progress(self):
+        """Derive layer number and time remaining from the reported byte position"""
+        if self.layer_index is None:
+            return
+        current = self.print_status.current_byte
+        self.print_status.total_layers = self.layer_index.layer_count
+        self.print_status.current_layer = self.layer_index.layer_at(current)
+        self.print_status.time_remaining = round(self.layer_index.time_remaining(current), 1)
+    
     def get_selected_file(self):
         """Get currently selected file"""
         return self.selected_file
@@ -453,11 +1004,9 @@ class ChituboardPrinter:
     def get_z_position(self):
         """Get current Z position"""
         try:
-            response = self._send_command("M114")
-            if response and "Z:" in response:
-                match = self.parse_M4000["floatZ"].search(response)
-                if match:
-                    self.z_position = float(match.group('value'))
+            parsed = self._query("M114")
+            if parsed.z is not None:
+                self.z_position = parsed.z
             return self.z_position
         except Exception as e:
             logger.debug(f"Error getting Z position: {e}")
@@ -474,6 +1023,11 @@ class ChituboardPrinter:
             response = self._send_command(f"M23 {filename}", timeout=10)
             if response and ("ok" in response.lower() or "file opened" in response.lower()):
                 self.selected_file = filename
+                # Built once per selection; each poll is then a binary search.
+                # Printers reading their own media have no local copy to index.
+                self.layer_index = file_manager.get_layer_index(filename) if self.usb_gadget else None
+                self.print_status.total_layers = self.layer_index.layer_count if self.layer_index else 0
+                self.print_status.current_layer = 0
                 logger.info(f"File selected: {filename}")
                 return True
             else:
@@ -500,6 +1054,8 @@ class ChituboardPrinter:
             
             if response and "ok" in response.lower():
                 self.print_status.state = PrinterState.PRINTING
+                self.job_history.begin(self.selected_file, self.print_status.total_layers)
+                self._job_idle_since = None
                 
                 # Call plugin hook
                 plugin_manager.call_hook('print_started', self.selected_file)
@@ -554,14 +1110,18 @@ class ChituboardPrinter:
             response = self._send_command("M33")
             if response and "ok" in response.lower():
                 old_status = self.print_status.state.value
+                self.job_history.finish('stopped', self.print_status.progress_percent)
                 self.print_status.state = PrinterState.IDLE
                 self.print_status.progress_percent = 0
                 self.print_status.current_byte = 0
+                self.print_status.current_layer = 0
+                self.print_status.time_remaining = 0.0
                 
                 # Call plugin hook
                 plugin_manager.call_hook('print_finished', self.selected_file, old_status)
                 
                 self.selected_file = ""
+                self.layer_index = None
                 logger.info("Print stopped")
                 return True
             return False
@@ -581,8 +1141,8 @@ class ChituboardPrinter:
     def move_by(self, distance):
         """Move Z axis by relative distance"""
         try:
-            response = self._send_command(f"G91\nG1 Z{distance} F600\nG90")
-            return response and "ok" in response.lower()
+            responses = self.send_commands(["G91", f"G1 Z{distance} F600", "G90"])
+            return len(responses) == 3 and all("ok" in r.text.lower() for r in responses)
         except Exception as e:
             logger.error(f"Error moving Z by {distance}: {e}")
             return False
@@ -591,21 +1151,33 @@ class ChituboardPrinter:
         """Reboot printer"""
         try:
             response = self._send_command("M999")
+            self.job_history.finish('failed', self.print_status.progress_percent)
             return True  # Don't wait for response as printer reboots
         except Exception as e:
             logger.error(f"Error rebooting printer: {e}")
             return False
 
-# Initialize printer with config manager
-printer = ChituboardPrinter(config_manager)
+# Initialize printers: the default one from the 'printer' section, any
+# others from the 'printers' section (see PrinterRegistry)
+printer = ChituboardPrinter(config_manager, job_history=job_history, telemetry=telemetry)
+printers = PrinterRegistry(config_manager, lambda printer_id: ChituboardPrinter(config_manager, printer_id),
+                           default=printer)
+
+app.register_blueprint(create_job_routes(job_history, printers))
+app.register_blueprint(create_telemetry_routes(telemetry, printers))
+app.register_blueprint(create_printer_routes(printers))
+app.register_blueprint(create_usb_routes(usb_gadget, printers, file_manager))
 
-def test_printer_connection():
-    """Test if we can communicate with the printer"""
+
+def test_printer_connection(printer):
+    """
+    Check whether a printer is connected without blocking
+    Connecting is left to the background supervisor (see _monitoring_loop)
+    """
     try:
         if not printer.is_connected:
-            connected = printer.connect()
-            if not connected:
-                return False, "Failed to connect"
+            printer.ensure_monitoring()
+            return False, printer.connection_error()
         
         firmware_version = printer.get_firmware_version()
         return True, firmware_version
@@ -624,66 +1196,182 @@ def serialize_print_status(status):
         'current_layer': status.current_layer,
         'total_layers': status.total_layers,
         'current_byte': status.current_byte,
-        'total_bytes': status.total_bytes
+        'total_bytes': status.total_bytes,
+        'time_remaining': status.time_remaining
     }
 
 # ----------------- ROUTES -----------------
 
+def printer_route(rule, **options):
+    """
+    Register a printer view at /api<rule> (default printer) and at
+    /api/printers/<printer_id><rule>; the view takes printer_id=None
+    """
+    def decorator(view):
+        app.route(f'/api{rule}', **options)(view)
+        app.route(f'/api/printers/<printer_id>{rule}', **options)(view)
+        return view
+    return decorator
+
+@app.url_value_preprocessor
+def check_printer_id(endpoint, values):
+    if values and 'printer_id' in values and values['printer_id'] not in printers:
+        abort(make_response(jsonify({'success': False,
+                                     'error': f"Unknown printer: {values['printer_id']}"}), 404))
+
+@app.before_request
+def start_request_timer():
+    request.environ['resin.request_started'] = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = request.environ.get('resin.request_started')
+    if started is not None:
+        # Label by URL rule, not path, so /api/jobs/<id> is a single series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                     request.method, route, str(response.status_code))
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text-format metrics"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
 @app.route('/')
 def index():
     # Get plugin assets for template
     plugin_assets = plugin_manager.get_frontend_assets()
     return render_template('index.html', plugin_assets=plugin_assets)
 
-@app.route('/api/status')
-def api_status():
-    connected, firmware_info = test_printer_connection()
+# Longest /api/connect waits for the supervisor before reporting failure
+CONNECT_WAIT_TIMEOUT = 8
+
+# Status stream settings
+STREAM_KEEPALIVE_INTERVAL = 15  # seconds between keepalive comments
+STREAM_USB_INTERVAL = 10        # seconds between USB status refreshes
+
+# USB status shared by all status streams; whichever stream finds it older
+# than STREAM_USB_INTERVAL recomputes it (mountpoint check, disk usage)
+usb_status_cache = StatusCache()
+usb_status_refresh_lock = threading.Lock()
+
+def shared_usb_status():
+    """
+    Latest shared USB status, refreshed once per STREAM_USB_INTERVAL
     
-    if connected:
-        firmware_version = firmware_info
-        status = printer.get_print_status()
-        selected_file = printer.get_selected_file()
-        z_pos = printer.get_z_position()
+    Returns:
+        StatusSnapshot: USB status snapshot (version 0 until first computed)
+    """
+    snapshot = usb_status_cache.get()
+    if snapshot.age >= STREAM_USB_INTERVAL and usb_status_refresh_lock.acquire(blocking=False):
+        try:
+            snapshot = usb_status_cache.publish(get_usb_status())
+        finally:
+            usb_status_refresh_lock.release()
+    return snapshot
+
+def build_status_response(snapshot, printer):
+    """Build the /api/status payload from a printer's status snapshot"""
+    if snapshot.version:
+        response_data = dict(snapshot.data)
     else:
-        firmware_version = f"Connection Error: {firmware_info}"
-        status = PrintStatus(state=PrinterState.IDLE)
-        selected_file = ""
-        z_pos = 0.0
-
-    response_data = {
-        'connected': connected,
-        'firmware_version': firmware_version,
-        'print_status': serialize_print_status(status),
-        'selected_file': selected_file,
-        'z_position': z_pos
-    }
+        response_data = {
+            'connected': False,
+            'firmware_version': "Connecting...",
+            'print_status': serialize_print_status(PrintStatus(state=PrinterState.IDLE)),
+            'selected_file': "",
+            'z_position': 0.0
+        }
+    
+    age = snapshot.age
+    response_data['status_version'] = snapshot.version
+    response_data['status_age'] = round(age, 3) if snapshot.version else None
+    response_data['stale'] = age > printer.status_max_age
     
     # Allow plugins to modify the response
-    response_data = plugin_manager.modify_response('status', response_data)
+    return plugin_manager.modify_response('status', response_data)
+
+@printer_route('/status')
+def api_status(printer_id=None):
+    # Served from the poller's snapshot - never touches the serial port
+    printer = printers.get(printer_id)
+    printer.ensure_monitoring()
+    return jsonify(build_status_response(printer.status_cache.get(), printer))
+
+@printer_route('/status/stream')
+def api_status_stream(printer_id=None):
+    """
+    Server-Sent Events stream of status deltas
+    Each event carries only the sections (and status keys) that changed
+    since the previous event: status, usb and status_bar_items
+    """
+    printer = printers.get(printer_id)
+    printer.ensure_monitoring()
     
-    return jsonify(response_data)
+    def generate():
+        sent_status = {}
+        sent_sections = {}
+        version = -1
+        usb_version = 0
+        
+        while True:
+            snapshot = printer.status_cache.wait_for_update(version, STREAM_KEEPALIVE_INTERVAL)
+            event = {}
+            
+            if snapshot.version != version:
+                version = snapshot.version
+                status = build_status_response(snapshot, printer)
+                status.pop('status_age', None)
+                changed = {key: value for key, value in status.items() if sent_status.get(key) != value}
+                if changed:
+                    event['status'] = changed
+                    sent_status.update(changed)
+            
+            sections = {'status_bar_items': plugin_manager.get_status_bar_items()}
+            usb = shared_usb_status()
+            if usb.version != usb_version:
+                usb_version = usb.version
+                sections['usb'] = usb.data
+            for name, value in sections.items():
+                if sent_sections.get(name) != value:
+                    event[name] = value
+                    sent_sections[name] = value
+            
+            if event:
+                yield f"data: {json.dumps(event)}\n\n"
+            else:
+                yield ": keepalive\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-@app.route('/api/connect', methods=['POST'])
-def api_connect():
+@printer_route('/connect', methods=['POST'])
+def api_connect(printer_id=None):
+    printer = printers.get(printer_id)
     try:
-        connected, info = test_printer_connection()
-        if connected:
+        printer.request_reconnect()
+        if printer.wait_until_connected(CONNECT_WAIT_TIMEOUT):
             return jsonify({'success': True, 'message': 'Printer is connected'})
         else:
-            return jsonify({'success': False, 'error': f'Cannot connect to printer: {info}'})
+            return jsonify({'success': False, 'error': f'Cannot connect to printer: {printer.connection_error()}'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/disconnect', methods=['POST'])
-def api_disconnect():
+@printer_route('/disconnect', methods=['POST'])
+def api_disconnect(printer_id=None):
+    printer = printers.get(printer_id)
     try:
         printer.disconnect()
         return jsonify({'success': True, 'message': 'Disconnected from printer'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/pause', methods=['POST'])
-def api_pause():
+@printer_route('/pause', methods=['POST'])
+def api_pause(printer_id=None):
+    printer = printers.get(printer_id)
     try:
         success = printer.pause_printing()
         if success:
@@ -694,8 +1382,9 @@ def api_pause():
         logger.error(f"Failed to pause print: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/resume', methods=['POST'])
-def api_resume():
+@printer_route('/resume', methods=['POST'])
+def api_resume(printer_id=None):
+    printer = printers.get(printer_id)
     try:
         success = printer.resume_printing()
         if success:
@@ -706,8 +1395,9 @@ def api_resume():
         logger.error(f"Failed to resume print: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/stop', methods=['POST'])
-def api_stop():
+@printer_route('/stop', methods=['POST'])
+def api_stop(printer_id=None):
+    printer = printers.get(printer_id)
     try:
         success = printer.stop_printing()
         if success:
@@ -718,8 +1408,9 @@ def api_stop():
         logger.error(f"Failed to stop print: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/home_z', methods=['POST'])
-def api_home_z():
+@printer_route('/home_z', methods=['POST'])
+def api_home_z(printer_id=None):
+    printer = printers.get(printer_id)
     try:
         success = printer.move_to_home()
         if success:
@@ -730,8 +1421,9 @@ def api_home_z():
         logger.error(f"Failed to home Z: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/move_z', methods=['POST'])
-def api_move_z():
+@printer_route('/move_z', methods=['POST'])
+def api_move_z(printer_id=None):
+    printer = printers.get(printer_id)
     data = request.get_json()
     distance = float(data.get('distance', 0))
     try:
@@ -744,8 +1436,44 @@ def api_move_z():
         logger.error(f"Failed to move Z by {distance}: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/reboot', methods=['POST'])
-def api_reboot():
+# Largest macro /api/gcode accepts
+MAX_GCODE_COMMANDS = 500
+
+@printer_route('/gcode', methods=['POST'])
+def api_gcode(printer_id=None):
+    """
+    Run a G-code macro (peel test, calibration sequence, ...) as one batch
+    Body: {"commands": ["G91", "G1 Z5 F300", ...]} or {"gcode": "G91\\nG1 Z5 F300"}
+    """
+    printer = printers.get(printer_id)
+    data = request.get_json(silent=True) or {}
+    commands = parse_gcode(data.get('commands') or data.get('gcode') or [])
+    if not commands:
+        return jsonify({'success': False, 'error': 'No commands given'}), 400
+    if len(commands) > MAX_GCODE_COMMANDS:
+        return jsonify({'success': False, 'error': f'At most {MAX_GCODE_COMMANDS} commands per request'}), 400
+    
+    try:
+        timeout = float(data['timeout']) if data.get('timeout') else None
+        started = time.perf_counter()
+        responses = printer.send_commands(commands, timeout)
+        results = [{'command': command, 'response': response.text, 'kind': response.kind.value}
+                   for command, response in zip(commands, responses)]
+        success = (len(responses) == len(commands) and
+                   all(response.kind != ResponseKind.ERROR for response in responses))
+        return jsonify({
+            'success': success,
+            'results': results,
+            'sent': len(responses),
+            'elapsed': round(time.perf_counter() - started, 3)
+        })
+    except Exception as e:
+        logger.error(f"Failed to run G-code: {e}")
+        return jsonify({'success': False, 'error': str(e)})
+
+@printer_route('/reboot', methods=['POST'])
+def api_reboot(printer_id=None):
+    printer = printers.get(printer_id)
     try:
         success = printer.reboot()
         if success:
@@ -761,6 +1489,7 @@ def api_recover_usb_error():
     """Recover from USB/Memory errors like M_11800"""
     try:
         logger.info("Attempting USB error recovery...")
+        printer = printers.gadget_printer()
         
         # Step 1: Stop any current operation
         try:
@@ -778,14 +1507,10 @@ def api_recover_usb_error():
             
         # Step 3: Reset USB communication
         try:
-            subprocess.run(['sudo', 'rmmod', 'g_mass_storage'], capture_output=True, text=True)
-            time.sleep(2)
-            subprocess.run(['sudo', 'modprobe', 'g_mass_storage', 'file=/piusb.bin', 
-                          'removable=1', 'ro=0', 'stall=0', 'nofua=1', 'cdrom=0'], 
-                         capture_output=True, text=True)
+            usb_gadget.restart()
             time.sleep(3)
         except Exception as e:
-            logger.warning(f"USB module restart failed: {e}")
+            logger.warning(f"USB gadget restart failed: {e}")
             
         # Step 4: Reset printer communication
         try:
@@ -804,20 +1529,22 @@ def api_recover_usb_error():
         logger.error(f"USB error recovery failed: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/select_file', methods=['POST'])
-def api_select_file():
+@printer_route('/select_file', methods=['POST'])
+def api_select_file(printer_id=None):
+    printer = printers.get(printer_id)
     data = request.get_json()
     filename = data.get('filename', '')
     
     logger.info(f"Attempting to select file: {filename}")
     
     try:
-        # Check if file exists using file manager
-        if not file_manager.file_exists(filename):
+        # Check if file exists using file manager (printers reading
+        # their own media are trusted to report missing files themselves)
+        if printer.usb_gadget and not file_manager.file_exists(filename):
             logger.error(f"File not found: {filename}")
             return jsonify({'success': False, 'error': f'File not found: {filename}'})
         
-        connected, info = test_printer_connection()
+        connected, info = test_printer_connection(printer)
         if not connected:
             logger.error(f"Printer not connected: {info}")
             return jsonify({'success': False, 'error': f'Printer not connected: {info}'})
@@ -833,20 +1560,22 @@ def api_select_file():
         logger.error(f"Failed to select file {filename}: {e}")
         return jsonify({'success': False, 'error': str(e)})
 
-@app.route('/api/print_file', methods=['POST'])
-def api_print_file():
+@printer_route('/print_file', methods=['POST'])
+def api_print_file(printer_id=None):
+    printer = printers.get(printer_id)
     data = request.get_json()
     filename = data.get('filename', '')
     
     logger.info(f"Attempting to print file: {filename}")
     
     try:
-        # Check if file exists using file manager
-        if not file_manager.file_exists(filename):
+        # Check if file exists using file manager (printers reading
+        # their own media are trusted to report missing files themselves)
+        if printer.usb_gadget and not file_manager.file_exists(filename):
             logger.error(f"File not found: {filename}")
             return jsonify({'success': False, 'error': f'File not found: {filename}'})
         
-        connected, info = test_printer_connection()
+        connected, info = test_printer_connection(printer)
         if not connected:
             logger.error(f"Printer not connected: {info}")
             return jsonify({'success': False, 'error': f'Printer not connected: {info}'})
@@ -866,7 +1595,7 @@ def api_check_usb_installation():
     """Check if USB gadget is installed - adapted for g_mass_storage"""
     try:
         # Check for g_mass_storage setup
-        usb_image_exists = Path('/piusb.bin').exists()
+        usb_image_exists = Path(usb_gadget.image_file).exists()
         mount_point_exists = USB_DRIVE_MOUNT.exists()
         
         # Check if g_mass_storage is configured in rc.local
@@ -881,7 +1610,7 @@ def api_check_usb_installation():
         fstab_configured = False
         try:
             with open('/etc/fstab', 'r') as f:
-                fstab_configured = '/piusb.bin' in f.read()
+                fstab_configured = usb_gadget.image_file in f.read()
         except:
             pass
         
@@ -889,7 +1618,7 @@ def api_check_usb_installation():
         
         return jsonify({
             'installed': installed,
-            'setup_type': 'g_mass_storage',
+            'setup_type': usb_gadget.running_backend() or 'g_mass_storage',
             'components': {
                 'usb_image': usb_image_exists,
                 'mount_point': mount_point_exists,
@@ -902,13 +1631,10 @@ def api_check_usb_installation():
         logger.error(f"Failed to check USB installation: {e}")
         return jsonify({'error': str(e), 'installed': False})
 
-@app.route('/api/usb_status')
-def api_usb_status():
+def get_usb_status():
     """Check USB drive status - adapted for g_mass_storage setup"""
     try:
-        # Check if g_mass_storage module is loaded
-        result = subprocess.run(['lsmod'], capture_output=True, text=True)
-        service_active = 'g_mass_storage' in result.stdout
+        gadget = usb_gadget.status()
         
         # Check if mount point is mounted
         mounted = False
@@ -928,36 +1654,31 @@ def api_usb_status():
         # Get USB space using file manager
         usb_space = file_manager.get_disk_usage()
         
-        return jsonify({
-            'service_running': service_active,
+        return {
+            'service_running': gadget['running'],
             'mounted': mounted,
             'mount_point': str(USB_DRIVE_MOUNT),
             'usb_space': usb_space,
-            'setup_type': 'g_mass_storage'
-        })
+            'setup_type': gadget['backend'],
+            'active_image': gadget['active_image'],
+            'staging_image': gadget['staging_image']
+        }
     except Exception as e:
         logger.error(f"Failed to get USB status: {e}")
-        return jsonify({'error': str(e)})
+        return {'error': str(e)}
+
+@app.route('/api/usb_status')
+def api_usb_status():
+    """Check USB drive status - adapted for g_mass_storage setup"""
+    # Fresh on request; the status streams pick it up too
+    return jsonify(usb_status_cache.publish(get_usb_status()).data)
 
 @app.route('/api/start_usb_gadget', methods=['POST'])
 def api_start_usb_gadget():
-    """Start USB gadget using g_mass_storage"""
+    """Start USB gadget (configfs, or g_mass_storage where configfs is unavailable)"""
     try:
-        # Load g_mass_storage module with optimized parameters
-        result = subprocess.run([
-            'sudo', 'modprobe', 'g_mass_storage',
-            'file=/piusb.bin',
-            'removable=1',
-            'ro=0',
-            'stall=0',
-            'nofua=1',
-            'cdrom=0'
-        ], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return jsonify({'success': True, 'message': 'USB Gadget started'})
-        else:
-            return jsonify({'success': False, 'error': result.stderr})
+        usb_gadget.start()
+        return jsonify({'success': True, 'message': 'USB Gadget started'})
     except Exception as e:
         logger.error(f"Failed to start USB gadget: {e}")
         return jsonify({'success': False, 'error': str(e)})
@@ -966,12 +1687,8 @@ def api_start_usb_gadget():
 def api_stop_usb_gadget():
     """Stop USB gadget"""
     try:
-        result = subprocess.run(['sudo', 'rmmod', 'g_mass_storage'], 
-                              capture_output=True, text=True)
-        if result.returncode == 0:
-            return jsonify({'success': True, 'message': 'USB Gadget stopped'})
-        else:
-            return jsonify({'success': False, 'error': result.stderr})
+        usb_gadget.stop()
+        return jsonify({'success': True, 'message': 'USB Gadget stopped'})
     except Exception as e:
         logger.error(f"Failed to stop USB gadget: {e}")
         return jsonify({'success': False, 'error': str(e)})
@@ -986,43 +1703,42 @@ def api_install_usb_gadget():
 
 def cleanup():
     try:
-        if printer and printer.is_connected:
-            printer.disconnect()
+        if printers:
+            printers.stop_all()
         if plugin_manager:
             plugin_manager.shutdown_all_plugins()
+        config_manager.flush()
     except:
         pass
 
-if __name__ == '__main__':
-    import atexit
-    atexit.register(cleanup)
-    
-    print("🖨️ Resin Print Portal with Plugin System")
-    print("Initializing plugin system...")
-    
-    # Discover and load plugins
-    discovered_plugins = plugin_manager.discover_plugins()
-    
-    # Try to load all discovered plugins
-    for plugin_name in discovered_plugins:
-        if plugin_manager.load_plugin(plugin_name):
-            print(f"✅ Plugin loaded: {plugin_name}")
-        else:
-            print(f"❌ Failed to load plugin: {plugin_name}")
+def background_startup(app_ready):
+    """
+    Slow startup work, run while the web server is already answering
     
-    # Initialize enabled plugins
+    Args:
+        app_ready (float): perf_counter() value when the server was bound
+    """
+    # Discover plugins from their metadata and initialize the enabled ones;
+    # disabled plugins are never imported
+    started = time.perf_counter()
+    plugin_manager.discover_plugins()
     plugin_manager.initialize_enabled_plugins()
+    for name in plugin_manager.loaded_plugins:
+        timing = plugin_manager.timings.get(name, {})
+        print(f"✅ Plugin enabled: {name} (import {timing.get('import_ms', 0):.1f} ms, "
+              f"init {timing.get('init_ms', 0):.1f} ms)")
+    if not plugin_manager.loaded_plugins:
+        print("ℹ️ No plugins loaded")
+    print(f"⏱️ Plugins ready in {(time.perf_counter() - started) * 1000:.0f} ms")
     
-    # Register plugin blueprints
-    plugin_manager.register_blueprints(app)
-    
-    print("Testing printer connection...")
-    connected, info = test_printer_connection()
-    if connected:
-        print(f"✅ Printer connected: {info}")
-    else:
-        print(f"❌ Printer connection failed: {info}")
-        print("Check your serial port configuration and make sure the printer is connected.")
+    # Expose the images to the printer; with a staging image this also
+    # mounts it where uploads go
+    if config_manager.snapshot().section('usb').get('auto_start', True):
+        try:
+            usb_gadget.ensure_started()
+            print(f"✅ USB gadget running ({usb_gadget.running_backend()}): {usb_gadget.image_file}")
+        except Exception as e:
+            print(f"⚠️ USB gadget warning: {e}")
     
     # Test file manager initialization
     is_valid, message = file_manager.validate_mount_point()
@@ -1031,11 +1747,35 @@ if __name__ == '__main__':
     else:
         print(f"⚠️ File manager warning: {message}")
     
-    # Show loaded plugins
-    loaded_plugins = list(plugin_manager.loaded_plugins.keys())
-    if loaded_plugins:
-        print(f"✅ Loaded plugins: {', '.join(loaded_plugins)}")
-    else:
-        print("ℹ️ No plugins loaded")
+    # The status pollers have been connecting since the server was bound;
+    # each printer connects on its own, so report them in order
+    for printer_id, fleet_printer in printers.items():
+        label = "Printer" if printer_id == DEFAULT_PRINTER_ID else f"Printer {printer_id}"
+        if fleet_printer.wait_until_connected(fleet_printer.READY_TIMEOUT + 1):
+            print(f"✅ {label} connected: {fleet_printer.firmware_version} on {fleet_printer.serial_port} "
+                  f"({time.perf_counter() - app_ready:.1f} s after startup)")
+        else:
+            print(f"❌ {label} connection failed: {fleet_printer.connection_error()}")
+            print("Check your serial port configuration and make sure the printer is connected.")
+
+if __name__ == '__main__':
+    import atexit
+    from werkzeug.serving import make_server
+    atexit.register(cleanup)
+    
+    print("🖨️ Resin Print Portal with Plugin System")
     
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Bind first so the UI is reachable while the printer and plugins start
+    server = make_server('0.0.0.0', 5000, app, threaded=True)
+    app_ready = time.perf_counter()
+    print(f"⏱️ Modules imported in {(app_ready - APP_IMPORT_STARTED) * 1000:.0f} ms, "
+          f"listening on http://0.0.0.0:5000")
+    
+    # Status pollers connect (and keep retrying) in the background
+    printers.start_all()
+    threading.Thread(target=background_startup, args=(app_ready,), name="startup", daemon=True).start()
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+File Index Benchmark
+Measures FileManager listing, storage stats and the cleanup scan against
+a directory of dummy slice files, comparing the in-memory index with the
+old glob-and-stat implementation.
+
+Run from the repository root:
+    python3 benchmarks/file_index_benchmark.py [file counts...] [--iterations N]
+"""
+
+import argparse
+import logging
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from file_manager import FileManager  # noqa: E402
+
+EXTENSIONS = ['.ctb', '.cbddlp', '.pwmx']
+
+
+class LegacyFileManager(FileManager):
+    """The pre-index implementation: every call re-lists the directory"""
+
+    def get_file_list(self):
+        files = []
+        for file_path in self.usb_drive_mount.glob("*"):
+            if file_path.is_file() and self.is_allowed_file(file_path.name):
+                stat = file_path.stat()
+                files.append({
+                    'name': file_path.name,
+                    'size': stat.st_size,
+                    'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                    'path': str(file_path),
+                    'extension': file_path.suffix.lower(),
+                    'metadata': self._get_metadata_dict(file_path, stat)
+                })
+        return sorted(files, key=lambda x: x['modified'], reverse=True)
+
+    def get_storage_stats(self):
+        disk_usage = self.get_disk_usage()
+        files = self.get_file_list()
+        extensions = {}
+        for file in files:
+            ext = extensions.setdefault(file['extension'], {'count': 0, 'size': 0})
+            ext['count'] += 1
+            ext['size'] += file['size']
+        total_file_size = sum(file['size'] for file in files)
+        return {
+            'disk_usage': disk_usage,
+            'total_files': len(files),
+            'total_file_size': total_file_size,
+            'extensions': extensions
+        }
+
+    def cleanup_old_files(self, max_files=50, max_age_days=30):
+        # Scan-only part of the old cleanup (limits are set so nothing is deleted)
+        current_time = datetime.now()
+        for file_info in sorted(self.get_file_list(), key=lambda x: x['modified']):
+            file_modified = datetime.strptime(file_info['modified'], '%Y-%m-%d %H:%M:%S')
+            (current_time - file_modified).days
+        remaining_files = self.get_file_list()
+        sorted(remaining_files, key=lambda x: x['modified'])
+        return 0, ""
+
+
+def populate(directory, count):
+    for i in range(count):
+        path = directory / f"model_{i:05d}{EXTENSIONS[i % len(EXTENSIONS)]}"
+        path.write_bytes(b"\0" * (64 + i % 512))
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run(count, iterations):
+    directory = Path(tempfile.mkdtemp(prefix="file-index-bench-"))
+    try:
+        populate(directory, count)
+        results = {}
+        for label, cls in (("legacy", LegacyFileManager), ("indexed", FileManager)):
+            manager = cls(directory)
+            manager.get_file_list()  # warm metadata cache / build index
+            results[label] = {
+                'list': measure(manager.get_file_list, iterations),
+                'stats': measure(manager.get_storage_stats, iterations),
+                'cleanup': measure(lambda: manager.cleanup_old_files(max_files=count + 1,
+                                                                     max_age_days=36500), iterations),
+            }
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('counts', nargs='*', type=int, default=[1000, 10000])
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"{'files':>7} {'operation':<10} {'legacy ms':>10} {'indexed ms':>11} {'speedup':>8}")
+    for count in args.counts:
+        results = run(count, args.iterations)
+        for op in ('list', 'stats', 'cleanup'):
+            legacy = results['legacy'][op]
+            indexed = results['indexed'][op]
+            print(f"{count:>7} {op:<10} {legacy:>10.2f} {indexed:>11.3f} {legacy / indexed:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
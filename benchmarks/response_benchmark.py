@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Response Classifier Benchmark
+Measures per-reply processing cost of response_classifier.classify_response
+against the previous character-filter and regex-chain implementation of
+ChituboardPrinter._process_response, over a corpus of captured replies.
+The legacy figures include the second parse get_print_status and
+get_z_position ran on M27/M114 replies, since the classifier's typed
+result replaces it.
+
+Run from the repository root:
+    python3 benchmarks/response_benchmark.py [rounds]
+"""
+
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from response_classifier import classify_response  # noqa: E402
+
+# (command, raw reply line) as read from a ChiTu board, weighted roughly by
+# how often each occurs while a print is monitored
+CORPUS = [
+    ("M27", b"SD printing byte 41234/1048576\r\n"),
+    ("M27", b"SD printing byte 523113/1048576\r\n"),
+    ("M27", b"Not SD printing.\r\n"),
+    ("M27", b"wait\r\n"),
+    ("M114", b"ok C: X:0.000000 Y:0.000000 Z:12.500000 E:0.000000\r\n"),
+    ("M114", b"ok C: X:0.000000 Y:0.000000 Z:155.000000 E:0.000000\r\n"),
+    ("M4000", b"ok B:0/0 X:0.000 Y:0.000 Z:12.500 F:256/256 D:41234/1048576/0\r\n"),
+    ("M4000", b"ok B:0/0 X:0.000 Y:0.000 Z:155.000 F:256/256 D:0/0/1\r\n"),
+    ("M4002", b"\x00\x13ok V4.13\r\n"),
+    ("M115", b"ok CBD make it. Date:Dec 14 2020 Time:10:21:00\r\n"),
+    ("M21", b"ok\r\n"),
+    ("M23 model.ctb", b"ok File opened: model.ctb Size: 1048576\r\n"),
+    ("M23 missing.ctb", b"Error:open failed, File: missing.ctb.\r\n"),
+    ("M6030 'model.ctb'", b"ok\r\n"),
+    ("M25", b"ok\r\n"),
+    ("G28 Z0", b"ok\x00\r\n"),
+]
+
+
+class LegacyResponseProcessor:
+    """The previous _process_response, minus logging and printer state"""
+
+    def __init__(self, firmware_version="V4.13"):
+        self.firmware_version = firmware_version
+        num = r"[-+]?[0-9]*\.?[0-9]+"
+        self.parse_M4000 = {
+            "floatB": re.compile(r"(^|[^A-Za-z])[Bb]:\s*(?P<actual>%s)(\s*\/?\s*(?P<target>%s))?" % (num, num)),
+            "floatD": re.compile(r"(^|[^A-Za-z])[Dd]z?\s*(?P<current>%s)(\s*\/?\s*(?P<total>%s))(\s*\/?\s*(?P<pause>%s))?" %
+                                 (num, num, r"\d+")),
+        }
+        self.fix_M114 = re.compile(r"C: ")
+        self.regex_sdPrintingByte = re.compile(r"(?P<current>[0-9]+)/(?P<total>[0-9]+)")
+        self.floatZ = re.compile(r"(^|[^A-Za-z])[Zz]:(?P<value>%s)" % num)
+
+    def handle(self, line, original_command):
+        """process() plus the follow-up parsing the status poller did"""
+        response = self.process(line, original_command)
+        if original_command == "M27" and "SD printing byte" in response:
+            match = self.regex_sdPrintingByte.search(response)
+            int(match.group("current")), int(match.group("total"))
+        elif original_command == "M114" and "Z:" in response:
+            float(self.floatZ.search(response).group('value'))
+        return response
+
+    def process(self, line, original_command):
+        response = line.decode('latin-1', errors='ignore').strip()
+        original_command = original_command.strip()
+        if not response:
+            return response
+        filtered_response = ''.join(char for char in response if ord(char) >= 32 or char in '\r\n\t')
+        if filtered_response != response:
+            response = filtered_response
+        if response == "wait" or response.startswith("wait"):
+            return "echo:busy processing"
+        if "CBD make it" in response:
+            return response.replace("CBD make it", f"FIRMWARE_NAME:CBD made it PROTOCOL_VERSION:{self.firmware_version}")
+        elif "ZWLF make it" in response:
+            return response.replace("ZWLF make it", f"FIRMWARE_NAME:ZWLF made it PROTOCOL_VERSION:{self.firmware_version}")
+        if "C: X:" in response:
+            return self.fix_M114.sub("", response)
+        if original_command == "M4000":
+            matchB = self.parse_M4000["floatB"].search(response)
+            matchD = self.parse_M4000["floatD"].search(response)
+            if matchB:
+                actual = matchB.group('actual')
+                target = matchB.group('target') if matchB.group('target') else actual
+                return f"T:0 /0 B:{actual} /{target}"
+            if matchD:
+                current = int(float(matchD.group('current')))
+                total = int(float(matchD.group('total')))
+                return f"SD printing byte {current}/{total}"
+            return response
+        if response.startswith('ok V'):
+            return 'ok start' + response
+        return response
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    legacy = LegacyResponseProcessor()
+
+    # Both implementations must produce the same text for every reply
+    for command, line in CORPUS:
+        old = legacy.process(line, command)
+        new = classify_response(line, command, "V4.13").text
+        if old != new:
+            raise SystemExit(f"Mismatch for {command} {line!r}: {old!r} != {new!r}")
+
+    total = rounds * len(CORPUS)
+    print(f"{len(CORPUS)} captured replies x {rounds} rounds = {total} replies")
+    print(f"{'implementation':<16} {'us/reply':>10} {'replies/s':>12}")
+    for label, fn in (("legacy", legacy.handle),
+                      ("classifier", lambda line, command: classify_response(line, command, "V4.13"))):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for command, line in CORPUS:
+                fn(line, command)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<16} {elapsed / total * 1e6:>10.2f} {total / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
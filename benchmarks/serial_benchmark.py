@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Serial Reader Benchmark
+Measures ChituboardPrinter._send_command throughput and latency against a
+pty-backed simulated printer, comparing the buffered line reader with the old
+byte-at-a-time polling reader.
+
+Run from the repository root:
+    python3 benchmarks/serial_benchmark.py [iterations] [firmware delay ms]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import serial
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import ChituboardPrinter  # noqa: E402
+from printer_simulator import ChituboardSimulator  # noqa: E402
+
+COMMANDS = ["M4000", "M27", "M114"]
+PRINT_FILE = "benchmark.ctb"
+
+
+class LegacyReaderPrinter(ChituboardPrinter):
+    """Printer using the previous one-byte-per-read polling loop"""
+
+    def _read_line(self, deadline):
+        response = b""
+        while time.monotonic() < deadline:
+            if self.connection.in_waiting > 0:
+                response += self.connection.read(1)
+                if response.endswith(b"\n"):
+                    break
+            else:
+                time.sleep(0.01)
+        return response
+
+
+def open_printer(printer_class, port):
+    printer = printer_class()
+    printer.connection = serial.Serial(port=port, baudrate=115200,
+                                       timeout=ChituboardPrinter.READ_SLICE)
+    printer.is_connected = True
+    return printer
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1000
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+    return p50, p99
+
+
+def run(printer_class, port, iterations):
+    """Send `iterations` commands and return (commands/sec, p50 ms, p99 ms, cpu s)"""
+    printer = open_printer(printer_class, port)
+
+    latencies = []
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for i in range(iterations):
+        command = COMMANDS[i % len(COMMANDS)]
+        start = time.perf_counter()
+        response = printer._send_command(command)
+        latencies.append(time.perf_counter() - start)
+        if not response:
+            raise RuntimeError(f"No response to {command}")
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    printer.connection.close()
+
+    p50, p99 = percentiles(latencies)
+    return iterations / wall, p50, p99, cpu
+
+
+def run_status_polls(printer_class, port, polls):
+    """Run monitoring-loop poll cycles (M27 + M114) and return (p50 ms, p99 ms, cpu ms/poll)"""
+    printer = open_printer(printer_class, port)
+
+    durations = []
+    cpu_start = time.process_time()
+    for _ in range(polls):
+        start = time.perf_counter()
+        printer.get_print_status()
+        printer.get_z_position()
+        durations.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+    printer.connection.close()
+
+    p50, p99 = percentiles(durations)
+    return p50, p99, cpu / polls * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    reply_delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+    simulator = ChituboardSimulator(files={PRINT_FILE: 50 * 1024 * 1024},
+                                    reply_delay=reply_delay, busy_time=0)
+    port = simulator.start()
+    try:
+        print(f"Simulated printer on {port}, {iterations} commands per run, "
+              f"{reply_delay * 1000:.1f} ms firmware delay")
+        print(f"{'reader':<10} {'cmd/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'cpu s':>8}")
+        for label, printer_class in (("legacy", LegacyReaderPrinter), ("buffered", ChituboardPrinter)):
+            rate, p50, p99, cpu = run(printer_class, port, iterations)
+            print(f"{label:<10} {rate:>10.1f} {p50:>10.2f} {p99:>10.2f} {cpu:>8.2f}")
+
+        # Status polling while a print is running
+        simulator.handle_command(f"M6030 '{PRINT_FILE}'")
+        polls = max(1, iterations // 3)
+        print(f"\nStatus poll cycle (M27 + M114) during a print, {polls} polls")
+        print(f"{'reader':<10} {'p50 ms':>10} {'p99 ms':>10} {'cpu ms':>8}")
+        for label, printer_class in (("legacy", LegacyReaderPrinter), ("buffered", ChituboardPrinter)):
+            p50, p99, cpu = run_status_polls(printer_class, port, polls)
+            print(f"{label:<10} {p50:>10.2f} {p99:>10.2f} {cpu:>8.3f}")
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Serial Command Queue for Resin Printer Control Application
+Runs all printer I/O on one dedicated worker thread, ordered by priority
+"""
+
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Callable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CommandPriority(IntEnum):
+    """Lower value runs first"""
+    EMERGENCY = 0   # pause / stop / resume - must never wait behind polling
+    NORMAL = 1      # file selection, motion, print start
+    STATUS = 2      # periodic status queries
+
+# G/M-codes that jump the queue
+EMERGENCY_COMMANDS = {'M25', 'M24', 'M33', 'M112'}
+
+# Read-only status queries that may wait behind everything else
+STATUS_COMMANDS = {'M27', 'M114', 'M4000', 'M105'}
+
+def command_priority(command: str) -> CommandPriority:
+    """Classify a command by its G/M-code"""
+    code = command.strip().split(' ', 1)[0].upper()
+    if code in EMERGENCY_COMMANDS:
+        return CommandPriority.EMERGENCY
+    if code in STATUS_COMMANDS:
+        return CommandPriority.STATUS
+    return CommandPriority.NORMAL
+
+def batch_priority(commands: List[str]) -> CommandPriority:
+    """A batch runs at the priority of its most urgent command"""
+    return min((command_priority(command) for command in commands), default=CommandPriority.NORMAL)
+
+class SerialCommandWorker:
+    """
+    Single-threaded executor for printer commands
+
+    Commands are queued with a priority and executed one at a time by the
+    worker thread, which owns the serial port. Callers get a Future back
+    and decide themselves whether (and how long) to wait for the reply.
+    Equal-priority commands run in submission order.
+    """
+
+    def __init__(self, execute: Callable[[str, Optional[float]], str], name: str = "serial-io",
+                 execute_batch: Optional[Callable[[List[str], Optional[float]], list]] = None):
+        """
+        Args:
+            execute: Callable(command, timeout) performing one blocking
+                command/response exchange on the port
+            name (str): Worker thread name
+            execute_batch: Callable(commands, timeout) running a list of
+                commands as one exchange, required for submit_batch
+        """
+        self._execute = execute
+        self._execute_batch = execute_batch
+        self._name = name
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, command: str, timeout: Optional[float] = None,
+               priority: Optional[CommandPriority] = None) -> Future:
+        """
+        Queue a command for execution
+
+        Args:
+            command (str): Command to send
+            timeout (float): Reply timeout passed to the executor
+            priority (CommandPriority): Overrides the priority derived from the command
+
+        Returns:
+            Future: Resolves to the processed response or raises the I/O error
+        """
+        if priority is None:
+            priority = command_priority(command)
+        return self._enqueue(self._execute, command, timeout, priority)
+
+    def submit_batch(self, commands: List[str], timeout: Optional[float] = None,
+                     priority: Optional[CommandPriority] = None) -> Future:
+        """
+        Queue a list of commands to run back to back as one queue entry,
+        so nothing else is interleaved with them on the port
+
+        Args:
+            commands (list): Commands to send, in order
+            timeout (float): Per-reply timeout passed to the executor
+            priority (CommandPriority): Overrides the priority derived from the commands
+
+        Returns:
+            Future: Resolves to the list of processed responses
+        """
+        if self._execute_batch is None:
+            raise RuntimeError("Worker was created without a batch executor")
+        if priority is None:
+            priority = batch_priority(commands)
+        return self._enqueue(self._execute_batch, list(commands), timeout, priority)
+
+    def _enqueue(self, execute, command, timeout, priority):
+        future = Future()
+
+        # Commands issued from the worker itself (e.g. by a hook running on
+        # it) would deadlock waiting behind their own caller - run inline
+        if threading.current_thread() is self._thread:
+            self._run(execute, command, timeout, future)
+            return future
+
+        self._ensure_started()
+        self._queue.put((int(priority), next(self._sequence), execute, command, timeout, future))
+        return future
+
+    def stop(self):
+        """Let the worker thread exit once the commands already queued have run"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put((len(CommandPriority), next(self._sequence), None, None, None, None))
+
+    def pending(self) -> int:
+        """Number of commands waiting to run"""
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._worker_loop, name=self._name, daemon=True)
+            self._thread.start()
+            logger.info(f"Started serial command worker: {self._name}")
+
+    def _worker_loop(self):
+        while True:
+            _, _, execute, command, timeout, future = self._queue.get()
+            if execute is None:
+                self._queue.task_done()
+                logger.info(f"Stopped serial command worker: {self._name}")
+                return
+            try:
+                if future.set_running_or_notify_cancel():
+                    self._run(execute, command, timeout, future)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, execute, command, timeout, future):
+        try:
+            future.set_result(execute(command, timeout))
+        except BaseException as e:
+            future.set_exception(e)
@@ -5,21 +5,97 @@ Handles application settings and plugin configurations
 Fixed version with better error handling and persistence
 """
 
+import atexit
+import copy
 import json
 import os
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Callable, Dict, Any, Iterable, Mapping, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Change-notification section names besides the app config sections
+PLUGIN_SECTION_PREFIX = "plugin:"      # + plugin name, for its settings
+ENABLED_PLUGINS_SECTION = "enabled_plugins"
+
+_EMPTY = MappingProxyType({})
+
+def freeze(value):
+    """Read-only deep copy: dicts become mappingproxies, lists tuples"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def thaw(value):
+    """Mutable deep copy of a frozen value (e.g. for JSON or plugin configs)"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Immutable view of all configuration at one version
+    
+    Snapshots are replaced, never modified, so holding one needs no lock.
+    """
+    version: int
+    app: Mapping[str, Any]
+    plugins: Mapping[str, Any]
+    
+    def section(self, name: str) -> Mapping[str, Any]:
+        """App config section, empty if missing"""
+        return self.app.get(name, _EMPTY)
+    
+    def plugin_settings(self, plugin_name: str) -> Mapping[str, Any]:
+        """Settings of one plugin, empty if none"""
+        return self.plugins.get("plugin_settings", _EMPTY).get(plugin_name, _EMPTY)
+    
+    def sections(self) -> Dict[str, Any]:
+        """Every change-notification section name -> its value"""
+        result = dict(self.app)
+        for plugin_name, settings in self.plugins.get("plugin_settings", _EMPTY).items():
+            result[PLUGIN_SECTION_PREFIX + plugin_name] = settings
+        result[ENABLED_PLUGINS_SECTION] = self.plugins.get("enabled_plugins", ())
+        return result
+
 class ConfigManager:
-    """Manages application and plugin configurations"""
+    """
+    Manages application and plugin configurations
+    
+    With write_delay > 0 changes are written behind: every change made
+    within write_delay seconds of the first one goes to disk in a single
+    atomic write, and pending changes are flushed at exit (or by flush()).
     
-    def __init__(self, config_dir: str = "config"):
+    Every change also publishes a new immutable ConfigSnapshot (see
+    snapshot()) and notifies the subscribers of the sections that changed.
+    """
+    
+    def __init__(self, config_dir: str = "config", write_delay: float = 0.0):
         self.config_dir = Path(config_dir)
         self.config_dir.mkdir(exist_ok=True)
         
+        # Write-behind state
+        self.write_delay = write_delay
+        self._lock = threading.RLock()         # Guards the config dicts
+        self._write_lock = threading.Lock()    # Orders file writes
+        self._dirty = set()                    # 'app' / 'plugins'
+        self._flush_timer = None
+        if write_delay > 0:
+            atexit.register(self.flush)
+        
+        # Published snapshots and change subscribers: (callback, sections or None)
+        self._snapshot = None
+        self._subscribers = []
+        
         # Configuration files
         self.app_config_file = self.config_dir / "app_config.json"
         self.plugin_config_file = self.config_dir / "plugin_config.json"
@@ -30,12 +106,29 @@ class ConfigManager:
                 "serial_port": "/dev/serial0",
                 "baudrate": 115200,
                 "timeout": 5.0,
-                "firmware_version": "V4.13"
+                "firmware_version": "V4.13",
+                "status_poll_interval": 2.0,
+                "status_poll_fast_interval": 0.5,
+                "status_poll_max_interval": 8.0,
+                "status_poll_idle_interval": 5.0,
+                "status_max_age": 10.0,
+                # Reads the USB gadget images (only one printer can)
+                "usb_gadget": True
             },
+            # Further printers: {id: settings overriding "printer"};
+            # "usb_gadget" is not inherited and defaults to false there
+            "printers": {},
             "usb": {
                 "mount_point": "/mnt/usb_share",
                 "image_file": "/piusb.bin",
-                "auto_start": True
+                "auto_start": True,
+                # Second image uploads are staged to, swapped in by /api/usb/swap
+                "staging_image_file": "",
+                # Images exposed as further LUNs
+                "extra_image_files": [],
+                "backend": "auto",
+                "mount_options": "loop,rw,umask=000",
+                "mirror_after_swap": True
             },
             "interface": {
                 "theme": "dark",
@@ -61,6 +154,8 @@ class ConfigManager:
         self.app_config = self._load_config(self.app_config_file, self.default_app_config)
         self.plugin_config = self._load_config(self.plugin_config_file, self.default_plugin_config)
         
+        self._snapshot = ConfigSnapshot(1, freeze(self.app_config), freeze(self.plugin_config))
+        
         logger.info(f"Loaded app config: {list(self.app_config.keys())}")
         logger.info(f"Loaded plugin config with {len(self.plugin_config.get('enabled_plugins', []))} enabled plugins")
     
@@ -105,16 +200,132 @@ class ConfigManager:
                 result[key] = value
         return result
     
-    def _save_config(self, config_file: Path, config: Dict[str, Any]) -> bool:
-        """Save configuration to file with error handling"""
+    def _persist(self, which: str) -> bool:
+        """
+        Save 'app' or 'plugins' config now, or schedule it in write-behind mode
+        
+        Returns:
+            bool: Whether the write succeeded (or was queued)
+        """
+        self._publish()
+        if self.write_delay <= 0:
+            return self._write(which)
+        
+        with self._lock:
+            self._dirty.add(which)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.write_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return True
+    
+    def snapshot(self) -> ConfigSnapshot:
+        """Current configuration as an immutable snapshot (lock-free)"""
+        return self._snapshot
+    
+    def subscribe(self, callback: Callable[[ConfigSnapshot, set], None],
+                  sections: Optional[Iterable[str]] = None):
+        """
+        Get notified of configuration changes
+        
+        Args:
+            callback: Called as callback(snapshot, changed_sections) on the
+                thread that made the change
+            sections: App section names, PLUGIN_SECTION_PREFIX + plugin name
+                or ENABLED_PLUGINS_SECTION to watch; None for all
+        
+        Returns:
+            The callback, for unsubscribe()
+        """
+        with self._lock:
+            self._subscribers.append((callback, frozenset(sections) if sections is not None else None))
+        return callback
+    
+    def unsubscribe(self, callback):
+        """Stop notifying callback"""
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not callback]
+    
+    def _publish(self):
+        """Replace the snapshot after a change and notify affected subscribers"""
+        with self._lock:
+            previous = self._snapshot
+            snapshot = ConfigSnapshot(previous.version + 1, freeze(self.app_config), freeze(self.plugin_config))
+            old_sections, new_sections = previous.sections(), snapshot.sections()
+            changed = {name for name in old_sections.keys() | new_sections.keys()
+                       if old_sections.get(name) != new_sections.get(name)}
+            if not changed:
+                return
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+        
+        logger.debug(f"Config version {snapshot.version}, changed: {sorted(changed)}")
+        for callback, sections in subscribers:
+            if sections is not None and not sections & changed:
+                continue
+            try:
+                callback(snapshot, changed if sections is None else changed & sections)
+            except Exception as e:
+                logger.error(f"Error in config subscriber {callback}: {e}")
+    
+    def flush(self) -> bool:
+        """
+        Write all pending changes now
+        
+        Returns:
+            bool: Whether every pending write succeeded
+        """
+        with self._lock:
+            pending = sorted(self._dirty)
+            self._dirty.clear()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        
+        success = True
+        for which in pending:
+            if not self._write(which):
+                success = False
+                # Keep it pending so the next change or flush retries
+                with self._lock:
+                    self._dirty.add(which)
+        return success
+    
+    def _write(self, which: str) -> bool:
+        with self._write_lock:
+            with self._lock:
+                if which == 'app':
+                    config_file, config = self.app_config_file, self.app_config
+                else:
+                    config_file, config = self.plugin_config_file, self.plugin_config
+                # Serialize under the lock so no change lands half-way through
+                try:
+                    data = json.dumps(config, indent=2, sort_keys=True)
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Error serializing config for {config_file}: {e}")
+                    return False
+            return self._save_config(config_file, data)
+    
+    def _save_config(self, config_file: Path, config) -> bool:
+        """
+        Save configuration to file with error handling
+        
+        Args:
+            config_file (Path): Target file
+            config: Config dict, or its already serialized JSON text
+        """
         try:
             # Create directory if it doesn't exist
             config_file.parent.mkdir(parents=True, exist_ok=True)
+            if not isinstance(config, str):
+                config = json.dumps(config, indent=2, sort_keys=True)
             
-            # Write to temporary file first
+            # Write to temporary file first, and make sure it reached the card
             temp_file = config_file.with_suffix('.json.tmp')
             with open(temp_file, 'w') as f:
-                json.dump(config, f, indent=2, sort_keys=True)
+                f.write(config)
+                f.flush()
+                os.fsync(f.fileno())
             
             # Atomically replace the original file
             temp_file.replace(config_file)
@@ -134,7 +345,10 @@ class ConfigManager:
             return False
     
     def get_app_config(self, section: Optional[str] = None) -> Dict[str, Any]:
-        """Get application configuration"""
+        """
+        Get application configuration
+        Returns the live dicts; use snapshot() for a stable read-only view
+        """
         if section:
             return self.app_config.get(section, {})
         return self.app_config
@@ -142,16 +356,49 @@ class ConfigManager:
     def set_app_config(self, section: str, key: str, value: Any) -> bool:
         """Set application configuration value"""
         try:
-            if section not in self.app_config:
-                self.app_config[section] = {}
-            self.app_config[section][key] = value
-            success = self._save_config(self.app_config_file, self.app_config)
+            with self._lock:
+                if section not in self.app_config:
+                    self.app_config[section] = {}
+                self.app_config[section][key] = value
+            success = self._persist('app')
             logger.info(f"Set app config {section}.{key} = {value}, saved: {success}")
             return success
         except Exception as e:
             logger.error(f"Error setting app config {section}.{key}: {e}")
             return False
     
+    def update_many(self, changes: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Apply several application config changes as one transaction
+        
+        Either every change is applied and saved with a single write, or
+        (if any value is invalid) none is.
+        
+        Args:
+            changes (dict): {section: {key: value}}
+        
+        Returns:
+            bool: Whether the changes were applied and saved (or queued)
+        """
+        try:
+            with self._lock:
+                updated = copy.deepcopy(self.app_config)
+                for section, values in changes.items():
+                    if not isinstance(values, dict):
+                        raise ValueError(f"Changes for section {section} must be a dict")
+                    target = updated.setdefault(section, {})
+                    if not isinstance(target, dict):
+                        raise ValueError(f"Config section {section} is not a dict")
+                    target.update(values)
+                json.dumps(updated)  # Reject values that cannot be saved
+                self.app_config = updated
+            success = self._persist('app')
+            logger.info(f"Updated app config sections {list(changes)}, saved: {success}")
+            return success
+        except Exception as e:
+            logger.error(f"Error updating app config: {e}")
+            return False
+    
     def get_plugin_config(self, plugin_name: Optional[str] = None) -> Dict[str, Any]:
         """Get plugin configuration"""
         if plugin_name:
@@ -164,8 +411,9 @@ class ConfigManager:
             if "plugin_settings" not in self.plugin_config:
                 self.plugin_config["plugin_settings"] = {}
             
-            self.plugin_config["plugin_settings"][plugin_name] = config
-            success = self._save_config(self.plugin_config_file, self.plugin_config)
+            with self._lock:
+                self.plugin_config["plugin_settings"][plugin_name] = config
+            success = self._persist('plugins')
             logger.info(f"Set plugin config for {plugin_name}, saved: {success}")
             return success
         except Exception as e:
@@ -180,8 +428,9 @@ class ConfigManager:
                 self.plugin_config["enabled_plugins"] = []
             
             if plugin_name not in self.plugin_config["enabled_plugins"]:
-                self.plugin_config["enabled_plugins"].append(plugin_name)
-                success = self._save_config(self.plugin_config_file, self.plugin_config)
+                with self._lock:
+                    self.plugin_config["enabled_plugins"].append(plugin_name)
+                success = self._persist('plugins')
                 logger.info(f"Enabled plugin {plugin_name}, saved: {success}")
                 return success
             else:
@@ -199,8 +448,9 @@ class ConfigManager:
                 self.plugin_config["enabled_plugins"] = []
             
             if plugin_name in self.plugin_config["enabled_plugins"]:
-                self.plugin_config["enabled_plugins"].remove(plugin_name)
-                success = self._save_config(self.plugin_config_file, self.plugin_config)
+                with self._lock:
+                    self.plugin_config["enabled_plugins"].remove(plugin_name)
+                success = self._persist('plugins')
                 logger.info(f"Disabled plugin {plugin_name}, saved: {success}")
                 return success
             else:
@@ -228,16 +478,15 @@ class ConfigManager:
         """Reset configuration to defaults"""
         try:
             if section == "app":
-                self.app_config = self.default_app_config.copy()
-                return self._save_config(self.app_config_file, self.app_config)
+                self.app_config = copy.deepcopy(self.default_app_config)
+                return self._persist('app')
             elif section == "plugins":
-                self.plugin_config = self.default_plugin_config.copy()
-                return self._save_config(self.plugin_config_file, self.plugin_config)
+                self.plugin_config = copy.deepcopy(self.default_plugin_config)
+                return self._persist('plugins')
             elif section is None:
-                self.app_config = self.default_app_config.copy()
-                self.plugin_config = self.default_plugin_config.copy()
-                return (self._save_config(self.app_config_file, self.app_config) and
-                       self._save_config(self.plugin_config_file, self.plugin_config))
+                self.app_config = copy.deepcopy(self.default_app_config)
+                self.plugin_config = copy.deepcopy(self.default_plugin_config)
+                return self._persist('app') and self._persist('plugins')
             return False
         except Exception as e:
             logger.error(f"Error resetting config: {e}")
@@ -266,11 +515,11 @@ class ConfigManager:
             
             if "app_config" in import_data:
                 self.app_config = self._merge_configs(self.default_app_config, import_data["app_config"])
-                self._save_config(self.app_config_file, self.app_config)
+                self._persist('app')
             
             if "plugin_config" in import_data:
                 self.plugin_config = self._merge_configs(self.default_plugin_config, import_data["plugin_config"])
-                self._save_config(self.plugin_config_file, self.plugin_config)
+                self._persist('plugins')
             
             logger.info(f"Imported config from: {import_path}")
             return True
@@ -5,7 +5,7 @@ Handles API endpoints for configuration and plugin management
 """
 
 import logging
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, request, jsonify, send_from_directory
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -52,21 +52,19 @@ def create_config_routes(config_manager, plugin_manager):
             data = request.get_json()
             configs = data.get('configs', [])
             
-            results = []
+            # Applied as one transaction: a single config write for all values
+            changes = {}
             for config_item in configs:
                 section = config_item.get('section')
                 key = config_item.get('key')
-                value = config_item.get('value')
-                
                 if section and key:
-                    success = config_manager.set_app_config(section, key, value)
-                    results.append({
-                        'section': section,
-                        'key': key,
-                        'success': success
-                    })
+                    changes.setdefault(section, {})[key] = config_item.get('value')
+            
+            success = config_manager.update_many(changes)
+            results = [{'section': section, 'key': key, 'success': success}
+                       for section, values in changes.items() for key in values]
             
-            return jsonify({'success': True, 'results': results})
+            return jsonify({'success': success, 'results': results})
             
         except Exception as e:
             logger.error(f"Error setting bulk app config: {e}")
@@ -101,16 +99,10 @@ def create_config_routes(config_manager, plugin_manager):
     def list_plugins():
         """List all available plugins"""
         try:
-            # Discover plugins first
+            # Discover plugins first (reads their metadata without importing them)
             discovered_plugins = plugin_manager.discover_plugins()
             logger.info(f"API: Discovered plugins: {discovered_plugins}")
             
-            # Try to load each discovered plugin if not already loaded
-            for plugin_name in discovered_plugins:
-                if plugin_name not in plugin_manager.available_plugins:
-                    logger.info(f"API: Loading plugin {plugin_name}")
-                    plugin_manager.load_plugin(plugin_name)
-            
             plugins_info = plugin_manager.get_all_plugins_info()
             logger.info(f"API: Returning {len(plugins_info)} plugins")
             
@@ -242,44 +234,39 @@ def create_config_routes(config_manager, plugin_manager):
             logger.error(f"Error importing config: {e}")
             return jsonify({'success': False, 'error': str(e)})
     
-    @config_bp.route('/ui/toolbar_items', methods=['GET'])
-    def get_toolbar_items():
-        """Get toolbar items from plugins"""
+    def ui_response(kind):
+        """Cached UI contributions, answering 304 when the client's copy is current"""
         try:
-            items = plugin_manager.get_toolbar_items()
-            return jsonify({'success': True, 'items': items})
+            entry = plugin_manager.ui_registry.get(kind)
+            if entry.etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                response = Response(entry.body, mimetype='application/json')
+            response.set_etag(entry.etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
         except Exception as e:
-            logger.error(f"Error getting toolbar items: {e}")
+            logger.error(f"Error getting {kind}: {e}")
             return jsonify({'success': False, 'error': str(e)})
     
+    @config_bp.route('/ui/toolbar_items', methods=['GET'])
+    def get_toolbar_items():
+        """Get toolbar items from plugins"""
+        return ui_response('toolbar_items')
+    
     @config_bp.route('/ui/status_bar_items', methods=['GET'])
     def get_status_bar_items():
         """Get status bar items from plugins"""
-        try:
-            items = plugin_manager.get_status_bar_items()
-            return jsonify({'success': True, 'items': items})
-        except Exception as e:
-            logger.error(f"Error getting status bar items: {e}")
-            return jsonify({'success': False, 'error': str(e)})
+        return ui_response('status_bar_items')
     
     @config_bp.route('/ui/config_tabs', methods=['GET'])
     def get_config_tabs():
         """Get configuration tabs from plugins"""
-        try:
-            tabs = plugin_manager.get_config_tabs()
-            return jsonify({'success': True, 'tabs': tabs})
-        except Exception as e:
-            logger.error(f"Error getting config tabs: {e}")
-            return jsonify({'success': False, 'error': str(e)})
+        return ui_response('config_tabs')
     
     @config_bp.route('/ui/frontend_assets', methods=['GET'])
     def get_frontend_assets():
         """Get frontend assets from plugins"""
-        try:
-            assets = plugin_manager.get_frontend_assets()
-            return jsonify({'success': True, 'assets': assets})
-        except Exception as e:
-            logger.error(f"Error getting frontend assets: {e}")
-            return jsonify({'success': False, 'error': str(e)})
+        return ui_response('frontend_assets')
     
     return config_bp
\ No newline at end of file
@@ -4,20 +4,43 @@ File Manager Module for Resin Printer Control Application
 Handles all file operations, upload, delete, and file listing functionality
 """
 
+import bisect
+import hashlib
 import os
+import secrets
 import shutil
+import tempfile
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import logging
 
+from metrics import REGISTRY
+from slice_file import SliceMetadataCache, read_layer_index
+from thumbnail_cache import ThumbnailCache
+
 logger = logging.getLogger(__name__)
 
+FILE_SCAN_SECONDS = REGISTRY.histogram('resin_file_scan_seconds',
+                                       'Duration of full rescans of the USB mount point')
+
 class FileManager:
     """
     Handles all file management operations for the printer application
     """
     
+    # Full rescan interval (seconds) to catch files rewritten in place,
+    # which do not change the directory mtime
+    INDEX_RESCAN_INTERVAL = 60
+    
+    # Copy buffer for streamed uploads
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
+    
+    # Resumable uploads untouched for this long (seconds) are discarded
+    UPLOAD_SESSION_TTL = 24 * 3600
+    
     def __init__(self, usb_drive_mount, allowed_extensions=None):
         """
         Initialize file manager with mount point and allowed extensions
@@ -31,11 +54,57 @@ class FileManager:
             '.ctb', '.cbddlp', '.pwmx', '.pwmo', '.pwms', '.pws', '.pw0', '.pwx'
         }
         
+        # Parsed slice file headers, keyed by (path, size, mtime)
+        self.metadata_cache = SliceMetadataCache()
+        
+        # Decoded preview images, keyed by (inode, mtime)
+        self.thumbnail_cache = ThumbnailCache()
+        
+        # In-memory file index: name -> (size, mtime_ns, file info dict)
+        # Refreshed when the directory mtime changes and updated in place
+        # by our own uploads and deletions
+        self._index = {}
+        # (-mtime_ns, name) for every indexed file, newest first; kept
+        # sorted with bisect as files come and go
+        self._index_order = []
+        self._index_dir_mtime = None
+        self._index_scanned = 0.0
+        self._index_lock = threading.RLock()
+        
+        # Running totals over the index, kept in step with every add/remove
+        self._stats = self._empty_stats()
+        
+        # Resumable upload sessions: upload_id -> session dict
+        self._uploads = {}
+        self._uploads_lock = threading.Lock()
+        
         # Ensure mount point exists
         self.usb_drive_mount.mkdir(exist_ok=True)
         
+        # Partial uploads from a previous run cannot be resumed
+        for stale in self.usb_drive_mount.glob(".upload-*.part"):
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+        
         logger.info(f"File manager initialized with mount point: {self.usb_drive_mount}")
     
+    def set_allowed_extensions(self, allowed_extensions):
+        """
+        Change the accepted file extensions and rebuild the index
+        
+        Args:
+            allowed_extensions (iterable): Extensions including the dot
+        """
+        extensions = {extension.lower() for extension in allowed_extensions}
+        if extensions == self.allowed_extensions:
+            return
+        with self._index_lock:
+            self.allowed_extensions = extensions
+            self.refresh_index(force=True)
+        logger.info(f"Allowed extensions: {', '.join(sorted(extensions))}")
+    
     def is_allowed_file(self, filename):
         """
         Check if file has allowed extension
@@ -73,26 +142,60 @@ class FileManager:
         Returns:
             list: List of dictionaries containing file information
         """
-        files = []
+        self.refresh_index()
+        with self._index_lock:
+            # Copies, so callers cannot alter the index
+            return [self._copy_file_info(self._index[name][2]) for _, name in self._index_order]
+    
+    def refresh_index(self, force=False):
+        """
+        Bring the in-memory file index up to date
+        
+        Costs a single stat of the mount point unless the directory changed
+        or the periodic rescan is due.
         
-        if not self.usb_drive_mount.exists() or not self.usb_drive_mount.is_dir():
+        Args:
+            force (bool): Rescan even if the directory looks unchanged
+        """
+        try:
+            dir_stat = self.usb_drive_mount.stat()
+        except OSError:
             logger.warning(f"USB drive mount point does not exist: {self.usb_drive_mount}")
-            return files
+            with self._index_lock:
+                self._index = {}
+                self._index_order = []
+                self._index_dir_mtime = None
+                self._stats = self._empty_stats()
+            return
+        
+        with self._index_lock:
+            if (not force and
+                    dir_stat.st_mtime_ns == self._index_dir_mtime and
+                    time.monotonic() - self._index_scanned < self.INDEX_RESCAN_INTERVAL):
+                return
+            with FILE_SCAN_SECONDS.time():
+                self._scan_directory(dir_stat.st_mtime_ns)
+    
+    def _scan_directory(self, dir_mtime):
+        """Rescan the mount point, reusing entries whose size and mtime are unchanged"""
+        index = {}
         
         try:
-            for file_path in self.usb_drive_mount.glob("*"):
-                if file_path.is_file() and self.is_allowed_file(file_path.name):
+            with os.scandir(self.usb_drive_mount) as entries:
+                for entry in entries:
+                    if not self.is_allowed_file(entry.name):
+                        continue
                     try:
-                        stat = file_path.stat()
-                        files.append({
-                            'name': file_path.name,
-                            'size': stat.st_size,
-                            'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
-                            'path': str(file_path),
-                            'extension': file_path.suffix.lower()
-                        })
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                        cached = self._index.get(entry.name)
+                        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                            index[entry.name] = cached
+                        else:
+                            index[entry.name] = self._make_index_entry(Path(entry.path), stat)
                     except Exception as e:
-                        logger.warning(f"Error reading file info for {file_path.name}: {e}")
+                        logger.warning(f"Error reading file info for {entry.name}: {e}")
                         continue
                         
         except PermissionError:
@@ -100,8 +203,93 @@ class FileManager:
         except Exception as e:
             logger.error(f"Error reading USB drive: {e}")
         
+        self._index = index
+        self._index_dir_mtime = dir_mtime
+        self._index_scanned = time.monotonic()
+        self._stats = self._empty_stats()
+        for entry in index.values():
+            self._stats_add(entry[2])
         # Sort by modification time (newest first)
-        return sorted(files, key=lambda x: x['modified'], reverse=True)
+        self._index_order = sorted((-entry[1], name) for name, entry in index.items())
+        logger.debug(f"File index rebuilt: {len(index)} files")
+    
+    def _make_index_entry(self, file_path, stat):
+        """Build an index entry (size, mtime_ns, file info dict)"""
+        return (stat.st_size, stat.st_mtime_ns, {
+            'name': file_path.name,
+            'size': stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+            'mtime': stat.st_mtime,
+            'path': str(file_path),
+            'extension': file_path.suffix.lower(),
+            'metadata': self._get_metadata_dict(file_path, stat)
+        })
+    
+    @staticmethod
+    def _copy_file_info(file_info):
+        metadata = file_info['metadata']
+        return dict(file_info, metadata=dict(metadata) if metadata else metadata)
+    
+    def _order_remove(self, name, entry):
+        key = (-entry[1], name)
+        position = bisect.bisect_left(self._index_order, key)
+        if position < len(self._index_order) and self._index_order[position] == key:
+            del self._index_order[position]
+    
+    @staticmethod
+    def _empty_stats():
+        return {'total_files': 0, 'total_file_size': 0, 'extensions': {}}
+    
+    def _stats_add(self, file_info):
+        self._stats['total_files'] += 1
+        self._stats['total_file_size'] += file_info['size']
+        ext = self._stats['extensions'].setdefault(file_info['extension'], {'count': 0, 'size': 0})
+        ext['count'] += 1
+        ext['size'] += file_info['size']
+    
+    def _stats_remove(self, file_info):
+        self._stats['total_files'] -= 1
+        self._stats['total_file_size'] -= file_info['size']
+        ext = self._stats['extensions'][file_info['extension']]
+        ext['count'] -= 1
+        ext['size'] -= file_info['size']
+        if ext['count'] == 0:
+            del self._stats['extensions'][file_info['extension']]
+    
+    def _index_file(self, file_path):
+        """Add or update a single file in the index after we wrote it"""
+        with self._index_lock:
+            old = self._index.pop(file_path.name, None)
+            if old:
+                self._stats_remove(old[2])
+                self._order_remove(file_path.name, old)
+            try:
+                stat = file_path.stat()
+                entry = self._make_index_entry(file_path, stat)
+                self._index[file_path.name] = entry
+                self._stats_add(entry[2])
+                bisect.insort(self._index_order, (-entry[1], file_path.name))
+            except OSError:
+                pass
+            self._mark_index_current()
+    
+    def _unindex_file(self, filename):
+        """Remove a single file from the index after we deleted it"""
+        with self._index_lock:
+            old = self._index.pop(filename, None)
+            if old:
+                self._stats_remove(old[2])
+                self._order_remove(filename, old)
+            self._mark_index_current()
+    
+    def _mark_index_current(self):
+        """Accept the directory's new mtime after our own change"""
+        if self._index_dir_mtime is None:
+            return
+        try:
+            self._index_dir_mtime = self.usb_drive_mount.stat().st_mtime_ns
+        except OSError:
+            self._index_dir_mtime = None
     
     def file_exists(self, filename):
         """
@@ -113,6 +301,10 @@ class FileManager:
         Returns:
             bool: True if file exists, False otherwise
         """
+        if self.is_allowed_file(filename):
+            self.refresh_index()
+            return filename in self._index
+        
         file_path = self.usb_drive_mount / filename
         return file_path.exists() and file_path.is_file()
     
@@ -149,72 +341,412 @@ class FileManager:
                 'name': file_path.name,
                 'size': stat.st_size,
                 'modified': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+                'mtime': stat.st_mtime,
                 'path': str(file_path),
                 'extension': file_path.suffix.lower(),
-                'size_mb': round(stat.st_size / (1024 * 1024), 2)
+                'size_mb': round(stat.st_size / (1024 * 1024), 2),
+                'metadata': self._get_metadata_dict(file_path, stat)
             }
         except Exception as e:
             logger.error(f"Error getting file info for {filename}: {e}")
             return None
     
-    def save_uploaded_file(self, uploaded_file):
+    def get_slice_info(self, filename):
         """
-        Save an uploaded file to the USB drive
+        Get parsed slice file metadata (resolution, layers, exposure, ...)
         
         Args:
-            uploaded_file: Flask uploaded file object
+            filename (str): Name of the file
             
         Returns:
-            tuple: (success: bool, message: str, filename: str or None)
+            SliceFileInfo: Parsed metadata or None if unsupported/unreadable
+        """
+        return self.metadata_cache.get(self.get_file_path(filename))
+    
+    def get_layer_index(self, filename):
         """
-        if not uploaded_file.filename:
-            return False, "No filename provided", None
+        Build the byte offset -> layer index for a slice file
+        
+        Args:
+            filename (str): Name of the file
             
-        if not self.is_allowed_file(uploaded_file.filename):
-            return False, f"File type not allowed: {uploaded_file.filename}", None
+        Returns:
+            LayerIndex: Index over the file's layer table or None
+        """
+        info = self.get_slice_info(filename)
+        if info is None:
+            return None
+        return read_layer_index(self.get_file_path(filename), info)
+    
+    def get_thumbnail(self, filename):
+        """
+        Get the cached PNG preview for a slice file
+        
+        Args:
+            filename (str): Name of the file
+            
+        Returns:
+            Path: Path to the PNG or None if the file has no preview
+        """
+        if not self.file_exists(filename):
+            return None
+        return self.thumbnail_cache.get(self.get_file_path(filename))
+    
+    def _get_metadata_dict(self, file_path, stat):
+        """Cached slice metadata for a file listing entry"""
+        info = self.metadata_cache.get(file_path, stat)
+        return info.to_dict() if info else None
+    
+    def _unique_path(self, filename):
+        """
+        Get a path in the USB drive that does not clash with an existing file
         
-        # Secure the filename
-        filename = secure_filename(uploaded_file.filename)
+        Args:
+            filename (str): Secured filename
+            
+        Returns:
+            Path: Target path, with a _N suffix added if needed
+        """
+        file_path = self.usb_drive_mount / filename
+        
+        if file_path.exists():
+            base_name = file_path.stem
+            extension = file_path.suffix
+            counter = 1
+            
+            while file_path.exists():
+                new_name = f"{base_name}_{counter}{extension}"
+                file_path = self.usb_drive_mount / new_name
+                counter += 1
+            
+            logger.info(f"File renamed to avoid conflict: {file_path.name}")
+        
+        return file_path
+    
+    def _check_upload_name(self, filename):
+        """
+        Validate an upload filename
         
+        Returns:
+            tuple: (error message or None, secured filename)
+        """
         if not filename:
-            return False, "Invalid filename", None
+            return "No filename provided", None
+        if not self.is_allowed_file(filename):
+            return f"File type not allowed: {filename}", None
+        
+        secured = secure_filename(filename)
+        if not secured:
+            return "Invalid filename", None
+        if not self.usb_drive_mount.exists():
+            return "USB drive not accessible", None
+        return None, secured
+    
+    def _commit_upload(self, temp_path, filename):
+        """
+        Move a completed temporary file into place under a unique name
+        
+        Returns:
+            Path: Final file path
+        """
+        with self._index_lock:
+            file_path = self._unique_path(filename)
+            os.replace(temp_path, file_path)
+        self._index_file(file_path)
+        return file_path
+    
+    def save_stream(self, filename, stream, expected_size=None):
+        """
+        Save a raw request body to the USB drive without intermediate copies
         
+        The data is written to a temporary file next to the target and renamed
+        into place once complete, so a broken transfer never leaves a partial
+        slice file visible to the printer.
+        
+        Args:
+            filename (str): Original filename
+            stream: Readable binary stream (e.g. request.stream)
+            expected_size (int): Content length, checked if given
+            
+        Returns:
+            tuple: (success: bool, message: str, filename: str or None)
+        """
+        error, filename = self._check_upload_name(filename)
+        if error:
+            return False, error, None
+        
+        temp_file = None
         try:
-            # Check if USB drive is accessible
-            if not self.usb_drive_mount.exists():
-                return False, "USB drive not accessible", None
+            temp_file = self.upload_temp_file()
+            while True:
+                chunk = stream.read(self.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                temp_file.write(chunk)
+        except Exception as e:
+            logger.error(f"Error streaming file {filename}: {e}")
+            if temp_file:
+                self.discard_temp_upload(temp_file)
+            return False, f"Error saving file: {str(e)}", None
+        
+        return self.save_temp_upload(filename, temp_file, expected_size)
+    
+    def upload_temp_file(self):
+        """
+        Open a temporary file on the USB drive for an incoming upload
+        
+        Serves as the multipart parser's stream factory, so uploaded files
+        are written straight to the drive and only renamed once complete.
+        
+        Returns:
+            file: Writable binary file, to pass to save_temp_upload or
+                discard_temp_upload
+        """
+        temp_file = tempfile.NamedTemporaryFile(dir=self.usb_drive_mount, prefix='.upload-',
+                                                suffix='.part', delete=False)
+        # mkstemp creates 0600; match what a regular save would produce
+        os.chmod(temp_file.name, 0o644)
+        return temp_file
+    
+    def save_temp_upload(self, filename, temp_file, expected_size=None):
+        """
+        Move an upload written to a file from upload_temp_file into place
+        
+        The data is synced to disk before the rename. The temporary file is
+        removed if the upload is rejected.
+        
+        Args:
+            filename (str): Original filename
+            temp_file: File returned by upload_temp_file
+            expected_size (int): Upload size, checked if given
+            
+        Returns:
+            tuple: (success: bool, message: str, filename: str or None)
+        """
+        error, filename = self._check_upload_name(filename)
+        if error:
+            self.discard_temp_upload(temp_file)
+            return False, error, None
+        
+        try:
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+            written = os.fstat(temp_file.fileno()).st_size
+            temp_file.close()
             
-            file_path = self.usb_drive_mount / filename
+            if written == 0:
+                self.discard_temp_upload(temp_file)
+                return False, "Empty upload", None
+            if expected_size is not None and written != expected_size:
+                self.discard_temp_upload(temp_file)
+                return False, f"Incomplete upload: received {written} of {expected_size} bytes", None
+            
+            file_path = self._commit_upload(temp_file.name, filename)
+            logger.info(f"File streamed successfully: {file_path.name} ({written} bytes)")
+            return True, f"File saved: {file_path.name}", file_path.name
             
-            # Check for duplicate files
-            if file_path.exists():
-                # Create a unique filename
-                base_name = file_path.stem
-                extension = file_path.suffix
-                counter = 1
-                
-                while file_path.exists():
-                    new_name = f"{base_name}_{counter}{extension}"
-                    file_path = self.usb_drive_mount / new_name
-                    counter += 1
-                
-                filename = file_path.name
-                logger.info(f"File renamed to avoid conflict: {filename}")
-            
-            # Save the file
-            uploaded_file.save(str(file_path))
-            
-            # Verify file was saved correctly
-            if file_path.exists() and file_path.stat().st_size > 0:
-                logger.info(f"File saved successfully: {filename}")
-                return True, f"File saved: {filename}", filename
-            else:
-                return False, "File save verification failed", None
-                
         except Exception as e:
             logger.error(f"Error saving file {filename}: {e}")
+            self.discard_temp_upload(temp_file)
             return False, f"Error saving file: {str(e)}", None
     
+    def discard_temp_upload(self, temp_file):
+        """
+        Close and delete a file from upload_temp_file
+        
+        Args:
+            temp_file: File returned by upload_temp_file
+        """
+        try:
+            temp_file.close()
+        except OSError:
+            pass
+        try:
+            os.unlink(temp_file.name)
+        except OSError:
+            pass
+    
+    def start_upload(self, filename, total_size):
+        """
+        Begin a resumable upload
+        
+        Args:
+            filename (str): Original filename
+            total_size (int): Final file size in bytes
+            
+        Returns:
+            tuple: (success: bool, message: str, upload_id: str or None)
+        """
+        error, filename = self._check_upload_name(filename)
+        if error:
+            return False, error, None
+        if not isinstance(total_size, int) or total_size <= 0:
+            return False, "Invalid file size", None
+        
+        free = self.get_disk_usage()
+        if free and total_size > free['free']:
+            return False, "Not enough free space on USB drive", None
+        
+        self._expire_uploads()
+        
+        upload_id = secrets.token_hex(16)
+        part_path = self.usb_drive_mount / f".upload-{upload_id}.part"
+        try:
+            part_path.touch(exist_ok=False)
+        except Exception as e:
+            logger.error(f"Error starting upload of {filename}: {e}")
+            return False, f"Error starting upload: {str(e)}", None
+        
+        with self._uploads_lock:
+            self._uploads[upload_id] = {
+                'filename': filename,
+                'total_size': total_size,
+                'offset': 0,
+                'path': part_path,
+                'sha256': hashlib.sha256(),
+                'updated': time.monotonic(),
+                'lock': threading.Lock()
+            }
+        
+        logger.info(f"Started resumable upload {upload_id} for {filename} ({total_size} bytes)")
+        return True, "Upload started", upload_id
+    
+    def get_upload(self, upload_id):
+        """
+        Get the state of a resumable upload
+        
+        Args:
+            upload_id (str): Upload ID from start_upload
+            
+        Returns:
+            dict: Upload state or None if unknown
+        """
+        session = self._uploads.get(upload_id)
+        if not session:
+            return None
+        return {
+            'upload_id': upload_id,
+            'filename': session['filename'],
+            'offset': session['offset'],
+            'total_size': session['total_size']
+        }
+    
+    def append_upload(self, upload_id, offset, data, checksum=None):
+        """
+        Append a chunk to a resumable upload
+        
+        Args:
+            upload_id (str): Upload ID from start_upload
+            offset (int): Byte offset the chunk starts at; must equal the current offset
+            data (bytes): Chunk data
+            checksum (str): Optional hex SHA-256 of the chunk
+            
+        Returns:
+            tuple: (success: bool, message: str, offset: int or None)
+        """
+        session = self._uploads.get(upload_id)
+        if not session:
+            return False, "Unknown upload", None
+        
+        with session['lock']:
+            if offset != session['offset']:
+                return False, "Offset mismatch", session['offset']
+            if offset + len(data) > session['total_size']:
+                return False, "Chunk exceeds declared file size", session['offset']
+            if checksum and hashlib.sha256(data).hexdigest() != checksum.lower():
+                return False, "Chunk checksum mismatch", session['offset']
+            
+            try:
+                with open(session['path'], 'r+b') as f:
+                    # Drop any tail left by an interrupted write before appending
+                    f.truncate(offset)
+                    f.seek(offset)
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                logger.error(f"Error writing upload {upload_id}: {e}")
+                return False, f"Error writing chunk: {str(e)}", session['offset']
+            
+            session['sha256'].update(data)
+            session['offset'] = offset + len(data)
+            session['updated'] = time.monotonic()
+            return True, "Chunk stored", session['offset']
+    
+    def finish_upload(self, upload_id, checksum=None):
+        """
+        Complete a resumable upload and move the file into place
+        
+        Args:
+            upload_id (str): Upload ID from start_upload
+            checksum (str): Optional hex SHA-256 of the whole file
+            
+        Returns:
+            tuple: (success: bool, message: str, filename: str or None)
+        """
+        session = self._uploads.get(upload_id)
+        if not session:
+            return False, "Unknown upload", None
+        
+        with session['lock']:
+            if session['offset'] != session['total_size']:
+                return False, f"Incomplete upload: received {session['offset']} of {session['total_size']} bytes", None
+            if checksum and session['sha256'].hexdigest() != checksum.lower():
+                self.abort_upload(upload_id)
+                return False, "File checksum mismatch", None
+            
+            try:
+                file_path = self._commit_upload(session['path'], session['filename'])
+            except Exception as e:
+                logger.error(f"Error completing upload {upload_id}: {e}")
+                return False, f"Error saving file: {str(e)}", None
+            
+            with self._uploads_lock:
+                self._uploads.pop(upload_id, None)
+        
+        logger.info(f"Resumable upload {upload_id} completed: {file_path.name}")
+        return True, f"File saved: {file_path.name}", file_path.name
+    
+    def abort_upload(self, upload_id):
+        """
+        Cancel a resumable upload and delete its partial data
+        
+        Args:
+            upload_id (str): Upload ID from start_upload
+            
+        Returns:
+            bool: True if the upload existed
+        """
+        with self._uploads_lock:
+            session = self._uploads.pop(upload_id, None)
+        if not session:
+            return False
+        
+        try:
+            session['path'].unlink()
+        except OSError:
+            pass
+        logger.info(f"Upload {upload_id} aborted")
+        return True
+    
+    def open_uploads(self):
+        """
+        Resumable uploads still in progress
+        
+        Returns:
+            list: Upload states as returned by get_upload
+        """
+        self._expire_uploads()
+        return [upload for upload in map(self.get_upload, list(self._uploads)) if upload]
+    
+    def _expire_uploads(self):
+        """Discard resumable uploads that have been idle too long"""
+        now = time.monotonic()
+        expired = [upload_id for upload_id, session in list(self._uploads.items())
+                   if now - session['updated'] > self.UPLOAD_SESSION_TTL]
+        for upload_id in expired:
+            self.abort_upload(upload_id)
+    
     def delete_file(self, filename):
         """
         Delete a file from the USB drive
@@ -242,6 +774,8 @@ class FileManager:
             if file_path.exists():
                 return False, f"File deletion verification failed: {filename}"
             
+            self._unindex_file(filename)
+            
             logger.info(f"File deleted successfully: {filename}")
             return True, f"File deleted: {filename}"
             
@@ -264,29 +798,28 @@ class FileManager:
             tuple: (files_deleted: int, message: str)
         """
         try:
-            files = self.get_file_list()
+            # Index is sorted newest first; walk it oldest first for deletion
+            files_by_age = self.get_file_list()[::-1]
             deleted_count = 0
-            current_time = datetime.now()
-            
-            # Sort by modification time (oldest first for deletion)
-            files_by_age = sorted(files, key=lambda x: x['modified'])
+            current_time = time.time()
+            remaining_files = []
             
             # Delete files older than max_age_days
             for file_info in files_by_age:
-                file_modified = datetime.strptime(file_info['modified'], '%Y-%m-%d %H:%M:%S')
-                age_days = (current_time - file_modified).days
+                age_days = int((current_time - file_info['mtime']) // 86400)
                 
                 if age_days > max_age_days:
                     success, _ = self.delete_file(file_info['name'])
                     if success:
                         deleted_count += 1
                         logger.info(f"Deleted old file: {file_info['name']} (age: {age_days} days)")
+                        continue
+                remaining_files.append(file_info)
             
             # If still too many files, delete oldest ones
-            remaining_files = self.get_file_list()
             if len(remaining_files) > max_files:
                 files_to_delete = len(remaining_files) - max_files
-                oldest_files = sorted(remaining_files, key=lambda x: x['modified'])[:files_to_delete]
+                oldest_files = remaining_files[:files_to_delete]
                 
                 for file_info in oldest_files:
                     success, _ = self.delete_file(file_info['name'])
@@ -312,20 +845,13 @@ class FileManager:
         """
         try:
             disk_usage = self.get_disk_usage()
-            files = self.get_file_list()
-            
-            # Calculate file statistics
-            total_files = len(files)
-            total_file_size = sum(file['size'] for file in files)
-            
-            # Group by extension
-            extensions = {}
-            for file in files:
-                ext = file['extension']
-                if ext not in extensions:
-                    extensions[ext] = {'count': 0, 'size': 0}
-                extensions[ext]['count'] += 1
-                extensions[ext]['size'] += file['size']
+            self.refresh_index()
+            
+            # Totals are maintained by the file index
+            with self._index_lock:
+                total_files = self._stats['total_files']
+                total_file_size = self._stats['total_file_size']
+                extensions = {ext: dict(values) for ext, values in self._stats['extensions'].items()}
             
             return {
                 'disk_usage': disk_usage,
@@ -4,7 +4,9 @@ File Management Routes for Resin Printer Control Application
 Contains all Flask routes related to file operations
 """
 
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify, send_from_directory, send_file
+from werkzeug.exceptions import HTTPException
+from werkzeug.formparser import parse_form_data
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,13 +47,71 @@ def create_file_routes(file_manager):
             logger.error(f"Error getting file info for {filename}: {e}")
             return jsonify({'error': str(e)}), 500
     
+    @file_bp.route('/files/<filename>/thumbnail')
+    def api_file_thumbnail(filename):
+        """Get the embedded preview image of a slice file as PNG"""
+        try:
+            thumbnail = file_manager.get_thumbnail(filename)
+            if not thumbnail:
+                return jsonify({'error': 'No preview available'}), 404
+            
+            # Cache key (inode-mtime) doubles as the ETag; 304s are handled by send_file
+            return send_file(
+                thumbnail,
+                mimetype='image/png',
+                etag=thumbnail.stem,
+                conditional=True,
+                max_age=86400
+            )
+        except Exception as e:
+            logger.error(f"Error getting thumbnail for {filename}: {e}")
+            return jsonify({'error': str(e)}), 500
+    
     @file_bp.route('/upload', methods=['POST'])
     def api_upload():
-        """Upload one or multiple files to USB drive"""
-        if 'files' not in request.files:
+        """
+        Upload one or multiple files to USB drive
+        
+        The multipart body is parsed from the request stream with each file
+        written directly to the drive (no spooling to /tmp and copying).
+        """
+        temp_files = []
+        
+        def upload_stream_factory(total_content_length, content_type, filename, content_length=None):
+            """Multipart parts go straight to temporary files on the USB drive"""
+            temp_file = file_manager.upload_temp_file()
+            temp_files.append(temp_file)
+            return temp_file
+        
+        try:
+            _, _, request_files = parse_form_data(
+                request.environ,
+                stream_factory=upload_stream_factory,
+                max_content_length=request.max_content_length,
+                max_form_memory_size=request.max_form_memory_size
+            )
+        except Exception as e:
+            # Disconnect, oversized or malformed body: drop the parts written so far
+            for temp_file in temp_files:
+                file_manager.discard_temp_upload(temp_file)
+            logger.error(f"Error parsing upload: {e}")
+            status = e.code if isinstance(e, HTTPException) else 400
+            return jsonify({'success': False, 'error': str(e)}), status
+        
+        # Parts other than 'files' were written out too, as were parts the
+        # parser gave up on (a truncated body); drop them
+        for field, file in request_files.items(multi=True):
+            if field != 'files':
+                file_manager.discard_temp_upload(file.stream)
+        parsed = {id(file.stream) for _, file in request_files.items(multi=True)}
+        for temp_file in temp_files:
+            if id(temp_file) not in parsed:
+                file_manager.discard_temp_upload(temp_file)
+        
+        if 'files' not in request_files:
             return jsonify({'success': False, 'error': 'No files provided'})
         
-        files = request.files.getlist('files')
+        files = request_files.getlist('files')
         uploaded = []
         errors = []
         
@@ -59,7 +119,7 @@ def create_file_routes(file_manager):
         
         for file in files:
             if file.filename:
-                success, message, saved_filename = file_manager.save_uploaded_file(file)
+                success, message, saved_filename = file_manager.save_temp_upload(file.filename, file.stream)
                 
                 if success:
                     uploaded.append({
@@ -75,6 +135,7 @@ def create_file_routes(file_manager):
                     })
                     logger.error(f"Failed to upload {file.filename}: {message}")
             else:
+                file_manager.discard_temp_upload(file.stream)
                 errors.append({
                     'filename': 'unknown',
                     'error': 'No filename provided'
@@ -88,6 +149,101 @@ def create_file_routes(file_manager):
             'total_errors': len(errors)
         })
     
+    @file_bp.route('/upload/stream', methods=['POST', 'PUT'])
+    def api_upload_stream():
+        """
+        Upload a single file as the raw request body
+        
+        The filename is taken from the 'filename' query parameter or the
+        X-Filename header. The body is streamed straight to the USB drive.
+        """
+        filename = request.args.get('filename') or request.headers.get('X-Filename', '')
+        
+        try:
+            success, message, saved_filename = file_manager.save_stream(
+                filename, request.stream, request.content_length
+            )
+            if success:
+                return jsonify({'success': True, 'name': saved_filename, 'message': message})
+            return jsonify({'success': False, 'error': message})
+        except Exception as e:
+            logger.error(f"Error streaming upload {filename}: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+    
+    @file_bp.route('/uploads', methods=['POST'])
+    def api_upload_start():
+        """Start a resumable upload: {"filename": ..., "size": ...}"""
+        data = request.get_json() or {}
+        
+        try:
+            success, message, upload_id = file_manager.start_upload(
+                data.get('filename', ''), data.get('size')
+            )
+            if success:
+                return jsonify({'success': True, 'upload_id': upload_id, 'offset': 0})
+            return jsonify({'success': False, 'error': message})
+        except Exception as e:
+            logger.error(f"Error starting upload: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+    
+    @file_bp.route('/uploads/<upload_id>', methods=['GET'])
+    def api_upload_status(upload_id):
+        """Get the current offset of a resumable upload"""
+        upload = file_manager.get_upload(upload_id)
+        if not upload:
+            return jsonify({'error': 'Upload not found'}), 404
+        return jsonify(upload)
+    
+    @file_bp.route('/uploads/<upload_id>', methods=['PUT'])
+    def api_upload_chunk(upload_id):
+        """
+        Append a chunk to a resumable upload
+        
+        Headers:
+            Upload-Offset: byte offset of the chunk (required)
+            X-Checksum-SHA256: hex SHA-256 of the chunk (optional)
+        """
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Missing or invalid Upload-Offset header'}), 400
+        
+        try:
+            success, message, new_offset = file_manager.append_upload(
+                upload_id, offset, request.get_data(cache=False),
+                request.headers.get('X-Checksum-SHA256')
+            )
+            if success:
+                return jsonify({'success': True, 'offset': new_offset})
+            if new_offset is None:
+                return jsonify({'success': False, 'error': message}), 404
+            # Client should resume from the returned offset
+            return jsonify({'success': False, 'error': message, 'offset': new_offset}), 409
+        except Exception as e:
+            logger.error(f"Error storing chunk for upload {upload_id}: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+    
+    @file_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+    def api_upload_complete(upload_id):
+        """Finish a resumable upload, optionally verifying {"sha256": ...}"""
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            success, message, saved_filename = file_manager.finish_upload(upload_id, data.get('sha256'))
+            if success:
+                return jsonify({'success': True, 'name': saved_filename, 'message': message})
+            return jsonify({'success': False, 'error': message})
+        except Exception as e:
+            logger.error(f"Error completing upload {upload_id}: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+    
+    @file_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+    def api_upload_abort(upload_id):
+        """Cancel a resumable upload"""
+        if not file_manager.abort_upload(upload_id):
+            return jsonify({'success': False, 'error': 'Upload not found'}), 404
+        return jsonify({'success': True})
+    
     @file_bp.route('/delete_file', methods=['POST'])
     def api_delete_file():
         """Delete a file from USB drive"""
@@ -178,7 +334,8 @@ def create_file_routes(file_manager):
     def api_refresh_files():
         """Force refresh of file list (useful after external changes)"""
         try:
-            # Just return fresh file list
+            # Rebuild the file index from disk
+            file_manager.refresh_index(force=True)
             files = file_manager.get_file_list()
             logger.info("File list refreshed")
             return jsonify({
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Plugin Hook Executor for Resin Printer Control Application
+Runs plugin hooks on per-plugin worker threads with per-hook time budgets
+"""
+
+import collections
+import threading
+import time
+from typing import Callable, Dict, Optional
+import logging
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HOOK_SECONDS = REGISTRY.histogram('resin_plugin_hook_seconds',
+                                  'Plugin hook execution time', ('hook', 'plugin'))
+HOOK_OVERRUNS = REGISTRY.counter('resin_plugin_hook_overruns_total',
+                                 'Hook calls that exceeded their time budget', ('hook', 'plugin'))
+HOOK_DROPPED = REGISTRY.counter('resin_plugin_hook_dropped_total',
+                                'Hook calls dropped because the plugin fell behind', ('hook', 'plugin'))
+HOOK_ERRORS = REGISTRY.counter('resin_plugin_hook_errors_total',
+                               'Hook calls that raised', ('hook', 'plugin'))
+
+# Time budget per hook (seconds). status_update fires on every status poll,
+# so it gets the tightest one.
+HOOK_BUDGETS = {
+    'status_update': 0.05,
+}
+DEFAULT_HOOK_BUDGET = 0.25
+
+# Hooks whose calls may be dropped when a plugin falls behind: each one
+# supersedes the last. Lifecycle hooks (print_started, printer_connected,
+# ...) are always delivered.
+DROPPABLE_HOOKS = frozenset({'status_update'})
+
+class HookExecutor:
+    """
+    Runs plugin hooks off the caller's thread
+
+    Every plugin has its own FIFO lane, so a plugin sees its hooks in the
+    order they fired. Each lane is drained by its own worker thread,
+    started when calls arrive and ended once the lane is empty, so a slow
+    or hung plugin only ever delays itself. When a plugin falls more
+    than max_pending calls behind, its oldest pending status_update call
+    is dropped; other hooks are never dropped.
+    Calls that take longer than their budget are logged and counted.
+    """
+
+    # Minimum spacing of overrun warnings per plugin and hook (seconds)
+    WARN_INTERVAL = 60.0
+
+    def __init__(self, max_pending: int = 32,
+                 budgets: Optional[Dict[str, float]] = None,
+                 default_budget: float = DEFAULT_HOOK_BUDGET):
+        """
+        Args:
+            max_pending (int): Queued calls per plugin before dropping
+            budgets (dict): Hook name -> budget in seconds
+            default_budget (float): Budget for hooks not in budgets
+        """
+        self.max_pending = max_pending
+        self.budgets = dict(HOOK_BUDGETS if budgets is None else budgets)
+        self.default_budget = default_budget
+        self.overruns: Dict[tuple, int] = {}
+        self._lanes: Dict[str, collections.deque] = {}
+        # Plugin name -> worker thread draining its lane
+        self._workers: Dict[str, threading.Thread] = {}
+        self._closed = False
+        self._last_warned: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, plugin_name: str, hook_name: str, method: Callable, args=(), kwargs=None):
+        """
+        Queue one hook call; never blocks on the plugin
+
+        Args:
+            plugin_name (str): Plugin the method belongs to
+            hook_name (str): Hook being fired
+            method: Bound hook method
+            args (tuple): Positional arguments
+            kwargs (dict): Keyword arguments
+        """
+        with self._lock:
+            if self._closed:
+                return
+            lane = self._lanes.setdefault(plugin_name, collections.deque())
+            call = (hook_name, method, args, kwargs or {})
+            if len(lane) >= self.max_pending and not self._drop_oldest(plugin_name, lane):
+                if hook_name in DROPPABLE_HOOKS:
+                    # Lane is full of calls that must run; skip this update
+                    HOOK_DROPPED.inc(hook_name, plugin_name)
+                    return
+            lane.append(call)
+            if plugin_name in self._workers:
+                return
+            worker = threading.Thread(target=self._drain, args=(plugin_name,),
+                                      name=f"plugin-hook-{plugin_name}", daemon=True)
+            self._workers[plugin_name] = worker
+        worker.start()
+
+    def _drop_oldest(self, plugin_name, lane):
+        """Remove the oldest droppable call from a full lane (lock held)"""
+        for index, (hook_name, _, _, _) in enumerate(lane):
+            if hook_name in DROPPABLE_HOOKS:
+                del lane[index]
+                HOOK_DROPPED.inc(hook_name, plugin_name)
+                logger.debug(f"Plugin {plugin_name} is behind, dropped a {hook_name} call")
+                return True
+        return False
+
+    def discard(self, plugin_name: str):
+        """Drop a plugin's pending calls (the running one, if any, completes)"""
+        with self._lock:
+            lane = self._lanes.get(plugin_name)
+            if lane:
+                lane.clear()
+
+    def shutdown(self, wait: bool = False):
+        """
+        Accept no further calls; pending status updates are abandoned
+        unless wait is set, in which case everything queued runs first
+        """
+        with self._lock:
+            self._closed = True
+            if not wait:
+                for lane in self._lanes.values():
+                    kept = [call for call in lane if call[0] not in DROPPABLE_HOOKS]
+                    lane.clear()
+                    lane.extend(kept)
+            workers = list(self._workers.values())
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _drain(self, plugin_name):
+        """Worker thread body: run a plugin's calls until its lane is empty"""
+        while True:
+            with self._lock:
+                lane = self._lanes.get(plugin_name)
+                if not lane:
+                    del self._workers[plugin_name]
+                    return
+                hook_name, method, args, kwargs = lane.popleft()
+            self._run(plugin_name, hook_name, method, args, kwargs)
+
+    def _run(self, plugin_name, hook_name, method, args, kwargs):
+        start = time.perf_counter()
+        try:
+            method(*args, **kwargs)
+        except Exception as e:
+            HOOK_ERRORS.inc(hook_name, plugin_name)
+            logger.error(f"Error calling hook {hook_name} on plugin {plugin_name}: {e}")
+        finally:
+            elapsed = time.perf_counter() - start
+            HOOK_SECONDS.observe(elapsed, hook_name, plugin_name)
+            budget = self.budgets.get(hook_name, self.default_budget)
+            if elapsed > budget:
+                self._overrun(plugin_name, hook_name, elapsed, budget)
+
+    def _overrun(self, plugin_name, hook_name, elapsed, budget):
+        key = (plugin_name, hook_name)
+        HOOK_OVERRUNS.inc(hook_name, plugin_name)
+        with self._lock:
+            count = self.overruns.get(key, 0) + 1
+            self.overruns[key] = count
+            now = time.monotonic()
+            if now - self._last_warned.get(key, -self.WARN_INTERVAL) < self.WARN_INTERVAL:
+                return
+            self._last_warned[key] = now
+        logger.warning(f"Plugin {plugin_name} took {elapsed * 1000:.0f} ms in {hook_name} "
+                       f"(budget {budget * 1000:.0f} ms, {count} overruns so far)")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Job History for Resin Printer Control Application
+Append-only SQLite record of finished print jobs
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ('completed', 'stopped', 'failed')
+
+# Index entries end with the rowid, so "filename = ? AND id < ? ORDER BY id DESC"
+# walks idx_jobs_filename directly without a sort
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    total_layers INTEGER NOT NULL DEFAULT 0,
+    layers_printed INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT NOT NULL,
+    progress TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_started ON jobs (started_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_filename ON jobs (filename);
+CREATE INDEX IF NOT EXISTS idx_jobs_outcome ON jobs (outcome);
+"""
+
+_SUMMARY_COLUMNS = "id, filename, started_at, ended_at, duration, total_layers, layers_printed, outcome"
+
+class JobHistory:
+    """
+    Records print jobs and answers paginated queries over them
+
+    The running job is kept in memory and written as a single row when it
+    ends, so the table is only ever appended to. Progress samples are
+    thinned to at most MAX_SAMPLES points per job.
+    """
+
+    # Minimum spacing between progress samples (seconds)
+    SAMPLE_INTERVAL = 30.0
+    MAX_SAMPLES = 500
+
+    def __init__(self, db_path="data/job_history.db"):
+        self.db_path = Path(db_path)
+        self.active_job = None
+        self._lock = threading.Lock()
+        self._db = None
+
+        try:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            self._db.commit()
+            logger.info(f"Job history database: {self.db_path}")
+        except sqlite3.Error as e:
+            logger.error(f"Job history unavailable ({self.db_path}): {e}")
+            self._db = None
+
+    @property
+    def available(self) -> bool:
+        return self._db is not None
+
+    def begin(self, filename: str, total_layers: int = 0):
+        """
+        Start tracking a job
+
+        Args:
+            filename (str): File being printed
+            total_layers (int): Layer count, 0 if unknown
+        """
+        with self._lock:
+            if self.active_job:
+                logger.warning(f"Job for {self.active_job['filename']} still open, replacing it")
+            self.active_job = {
+                'filename': filename or "(unknown)",
+                'started_at': time.time(),
+                'total_layers': total_layers or 0,
+                'layers_printed': 0,
+                'progress': [],
+                'last_sample': 0.0
+            }
+        logger.info(f"Job started: {filename}")
+
+    def sample(self, progress_percent: float, current_layer: int = 0, total_layers: int = 0):
+        """Record a point on the running job's progress curve"""
+        with self._lock:
+            job = self.active_job
+            if not job:
+                return
+            if current_layer:
+                job['layers_printed'] = current_layer
+            if total_layers:
+                job['total_layers'] = total_layers
+
+            now = time.time()
+            if job['progress'] and now - job['last_sample'] < self.SAMPLE_INTERVAL:
+                return
+            job['last_sample'] = now
+            job['progress'].append([round(now - job['started_at'], 1), round(progress_percent, 2)])
+
+            # Keep the curve bounded for very long prints: drop every other point
+            if len(job['progress']) > self.MAX_SAMPLES:
+                job['progress'] = job['progress'][::2]
+
+    def finish(self, outcome: str, progress_percent: Optional[float] = None) -> Optional[int]:
+        """
+        Close the running job and append it to the history
+
+        Args:
+            outcome (str): One of OUTCOMES
+            progress_percent (float): Final progress, added as the last sample
+
+        Returns:
+            int: Row ID of the stored job, or None if no job was running
+        """
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown job outcome: {outcome}")
+
+        with self._lock:
+            job = self.active_job
+            self.active_job = None
+        if not job:
+            return None
+
+        ended_at = time.time()
+        if progress_percent is not None:
+            job['progress'].append([round(ended_at - job['started_at'], 1), round(progress_percent, 2)])
+        if outcome == 'completed' and job['total_layers']:
+            job['layers_printed'] = job['total_layers']
+
+        logger.info(f"Job {outcome}: {job['filename']} after {ended_at - job['started_at']:.0f}s")
+        if not self._db:
+            return None
+
+        try:
+            with self._lock:
+                cursor = self._db.execute(
+                    "INSERT INTO jobs (filename, started_at, ended_at, duration, total_layers,"
+                    " layers_printed, outcome, progress) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job['filename'], job['started_at'], ended_at, ended_at - job['started_at'],
+                     job['total_layers'], job['layers_printed'], outcome,
+                     json.dumps(job['progress'], separators=(',', ':'))))
+                self._db.commit()
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"Error recording job for {job['filename']}: {e}")
+            return None
+
+    def list_jobs(self, filename=None, outcome=None, since=None, until=None,
+                  before_id=None, limit=50):
+        """
+        Query jobs, newest first, with keyset pagination
+
+        Args:
+            filename (str): Only jobs for this file
+            outcome (str): Only jobs with this outcome
+            since (float): Only jobs started at or after this epoch time
+            until (float): Only jobs started before this epoch time
+            before_id (int): Continue after this job ID (from 'next_before')
+            limit (int): Page size, capped at 500
+
+        Returns:
+            dict: {'jobs': [...], 'next_before': ID for the next page or None}
+        """
+        limit = max(1, min(int(limit), 500))
+        clauses = []
+        params = []
+        if filename:
+            clauses.append("filename = ?")
+            params.append(filename)
+        if outcome:
+            clauses.append("outcome = ?")
+            params.append(outcome)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started_at < ?")
+            params.append(until)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(int(before_id))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {_SUMMARY_COLUMNS} FROM jobs {where} ORDER BY id DESC LIMIT ?"
+
+        if not self._db:
+            return {'jobs': [], 'next_before': None}
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit + 1]).fetchall()
+
+        jobs = [dict(row) for row in rows[:limit]]
+        next_before = jobs[-1]['id'] if len(rows) > limit else None
+        return {'jobs': jobs, 'next_before': next_before}
+
+    def get_job(self, job_id: int) -> Optional[dict]:
+        """
+        Get one job including its progress curve
+
+        Returns:
+            dict: Job record or None if not found
+        """
+        if not self._db:
+            return None
+        with self._lock:
+            row = self._db.execute(f"SELECT {_SUMMARY_COLUMNS}, progress FROM jobs WHERE id = ?",
+                                   (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['progress'] = json.loads(job['progress'])
+        return job
+
+    def get_active_job(self) -> Optional[dict]:
+        """Get the running job, if any"""
+        with self._lock:
+            job = self.active_job
+            if not job:
+                return None
+            return {
+                'filename': job['filename'],
+                'started_at': job['started_at'],
+                'duration': time.time() - job['started_at'],
+                'total_layers': job['total_layers'],
+                'layers_printed': job['layers_printed'],
+                'progress': list(job['progress'])
+            }
+
+    def get_summary(self) -> dict:
+        """Job counts by outcome"""
+        if not self._db:
+            return {}
+        with self._lock:
+            rows = self._db.execute("SELECT outcome, COUNT(*) AS count FROM jobs GROUP BY outcome").fetchall()
+        return {row['outcome']: row['count'] for row in rows}
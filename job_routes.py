@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Job History Routes for Resin Printer Control Application
+Contains all Flask routes for querying past print jobs
+"""
+
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+import logging
+
+from job_history import OUTCOMES
+
+logger = logging.getLogger(__name__)
+
+def _parse_time(value):
+    """Accept epoch seconds or an ISO date/datetime string"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def create_job_routes(job_history, printer_registry=None):
+    """
+    Create Flask blueprint with job history routes
+    
+    Args:
+        job_history: JobHistory instance of the default printer
+        printer_registry: PrinterRegistry; if given, every route is also
+            served per printer under /api/printers/<printer_id>
+        
+    Returns:
+        Blueprint: Flask blueprint with job routes
+    """
+    
+    job_bp = Blueprint('jobs', __name__, url_prefix='/api')
+    
+    def route(rule):
+        def decorator(view):
+            job_bp.route(rule)(view)
+            if printer_registry is not None:
+                job_bp.route(f'/printers/<printer_id>{rule}')(view)
+            return view
+        return decorator
+    
+    def history(printer_id):
+        if printer_id is None:
+            return job_history
+        return printer_registry.get(printer_id).job_history
+    
+    @route('/jobs')
+    def api_jobs(printer_id=None):
+        """
+        List past jobs, newest first
+        
+        Query parameters: file, outcome, since, until (epoch or ISO date),
+        limit (default 50), before (the 'next_before' of the previous page)
+        """
+        try:
+            outcome = request.args.get('outcome') or None
+            if outcome and outcome not in OUTCOMES:
+                return jsonify({'error': f'Unknown outcome: {outcome}'}), 400
+            
+            page = history(printer_id).list_jobs(
+                filename=request.args.get('file') or None,
+                outcome=outcome,
+                since=_parse_time(request.args.get('since')),
+                until=_parse_time(request.args.get('until')),
+                before_id=request.args.get('before', type=int),
+                limit=request.args.get('limit', 50, type=int)
+            )
+            return jsonify(page)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid query: {e}'}), 400
+        except Exception as e:
+            logger.error(f"Error listing jobs: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @route('/jobs/<int:job_id>')
+    def api_job(job_id, printer_id=None):
+        """Get one job including its progress curve"""
+        try:
+            job = history(printer_id).get_job(job_id)
+            if not job:
+                return jsonify({'error': 'Job not found'}), 404
+            return jsonify(job)
+        except Exception as e:
+            logger.error(f"Error getting job {job_id}: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @route('/jobs/active')
+    def api_active_job(printer_id=None):
+        """Get the job currently printing, if any"""
+        return jsonify({'job': history(printer_id).get_active_job()})
+    
+    @route('/jobs/summary')
+    def api_jobs_summary(printer_id=None):
+        """Get job counts by outcome"""
+        try:
+            return jsonify(history(printer_id).get_summary())
+        except Exception as e:
+            logger.error(f"Error getting job summary: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    return job_bp
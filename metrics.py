@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Metrics for Resin Printer Control Application
+Minimal Prometheus text-format exporter with preallocated counters and
+fixed-bucket histograms (no external dependency)
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Default latency buckets (seconds): 1 ms .. 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+def _format_labels(names, values, extra=()):
+    pairs = [(name, value) for name, value in zip(names, values)] + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class _Metric:
+    """Base class: one metric family with optional labels"""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _child(self, labelvalues):
+        child = self._children.get(labelvalues)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in sorted(self._children.items()):
+            lines.extend(self._render_child(labelvalues, child))
+        return lines
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return [0]
+
+    def inc(self, *labelvalues, amount=1):
+        child = self._child(labelvalues)
+        with self._lock:
+            child[0] += amount
+
+    def _render_child(self, labelvalues, child):
+        yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child[0])}"
+
+class Gauge(_Metric):
+    """
+    Point-in-time value
+
+    Either set() it, or pass a function that is read at scrape time
+    (only for gauges without labels).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function: Callable[[], float] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _new_child(self):
+        return [0.0]
+
+    def set(self, value, *labelvalues):
+        self._child(labelvalues)[0] = value
+
+    def render(self):
+        if self.function is not None:
+            try:
+                self._child(())[0] = self.function()
+            except Exception as e:
+                logger.debug(f"Error reading gauge {self.name}: {e}")
+        return super().render()
+
+    def _render_child(self, labelvalues, child):
+        yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child[0])}"
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; each label set preallocates its bucket array"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        # Per-bucket (non-cumulative) counts, +Inf last, then sum and count
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value, *labelvalues):
+        child = self._child(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child[index] += 1
+            child[-2] += value
+            child[-1] += 1
+
+    def time(self, *labelvalues):
+        """Context manager observing the elapsed time of its block"""
+        return _Timer(self, labelvalues)
+
+    def _render_child(self, labelvalues, child):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), child):
+            cumulative += count
+            labels = _format_labels(self.labelnames, labelvalues, [('le', _format_value(float(bound)))])
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}_sum{labels} {_format_value(child[-2])}"
+        yield f"{self.name}_count{labels} {child[-1]}"
+
+class _Timer:
+    __slots__ = ('histogram', 'labelvalues', 'start')
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+
+class Registry:
+    """Collection of metric families rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Module reloads re-declare metrics; keep the first instance
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry used by the application modules
+REGISTRY = Registry()
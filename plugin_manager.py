@@ -6,17 +6,46 @@ Fixed version with better error handling and debug logging
 """
 
 import importlib.util
+import json
 import sys
 import os
+import threading
+import time
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 import logging
-from flask import Flask
+from flask import Flask, abort, current_app, has_request_context, request
 
 from plugins.plugin_base import PluginBase
+from hook_executor import HookExecutor
+from ui_registry import UIRegistry
+from config_manager import PLUGIN_SECTION_PREFIX, thaw
 
 logger = logging.getLogger(__name__)
 
+# Plugin blueprints live under /api/plugins/<name>/ (see PluginBase.create_blueprint)
+PLUGIN_URL_PREFIX = '/api/plugins/'
+PLUGIN_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+class PluginRoutes:
+    """
+    URL rules and views of one plugin's blueprint
+
+    Flask does not allow registering blueprints once the app has served a
+    request, and plugins are imported, enabled and reloaded later than
+    that. So the blueprint is registered on a private, never served app
+    only to collect its rules; the main app's catch-all plugin route
+    matches against them and calls the view itself, inside its own
+    request handling (hooks, error handlers, metrics).
+    """
+
+    def __init__(self, plugin: PluginBase, blueprint, host_app: Flask):
+        rules_app = Flask(host_app.import_name, root_path=host_app.root_path, static_folder=None)
+        rules_app.register_blueprint(blueprint)
+        self.plugin = plugin
+        self.url_map = rules_app.url_map
+        self.view_functions = rules_app.view_functions
+
 class PluginManager:
     """Manages all plugins for the application"""
     
@@ -30,6 +59,24 @@ class PluginManager:
         self.loaded_plugins: Dict[str, PluginBase] = {}
         self.plugin_hooks: Dict[str, List[PluginBase]] = {}
         
+        # Hook name -> ((plugin name, bound on_<hook> method), ...), rebuilt
+        # whenever hooks are registered or unregistered
+        self._hook_dispatch: Dict[str, tuple] = {}
+        self.hook_executor = HookExecutor()
+        # Cached toolbar/status bar/config tab/asset contributions
+        self.ui_registry = UIRegistry(self)
+        
+        # Metadata (config.json) of discovered plugins, read without importing them
+        self.plugin_manifests: Dict[str, Dict[str, Any]] = {}
+        # Plugin name -> {'import_ms': ..., 'init_ms': ...}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._plugin_routes: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+        
+        # Apply settings changed through the config manager (e.g. config import)
+        if self.config_manager and hasattr(self.config_manager, 'subscribe'):
+            self.config_manager.subscribe(self._on_config_changed)
+        
         # Create __init__.py if it doesn't exist
         init_file = self.plugins_dir / "__init__.py"
         if not init_file.exists():
@@ -39,7 +86,11 @@ class PluginManager:
         logger.info(f"Config manager available: {self.config_manager is not None}")
     
     def discover_plugins(self) -> List[str]:
-        """Discover all available plugins"""
+        """
+        Discover all available plugins
+        Only reads each plugin's config.json; modules are imported when a
+        plugin is enabled or its routes are first requested
+        """
         discovered = []
         
         logger.info(f"Discovering plugins in: {self.plugins_dir}")
@@ -65,6 +116,7 @@ class PluginManager:
                     
                     if plugin_file.exists():
                         discovered.append(plugin_dir.name)
+                        self.plugin_manifests[plugin_dir.name] = self._read_manifest(config_file)
                         logger.info(f"Found plugin: {plugin_dir.name}")
                     else:
                         logger.debug(f"Skipping {plugin_dir.name} - no plugin.py found")
@@ -110,8 +162,11 @@ class PluginManager:
             sys.modules[module_name] = module
             
             # Execute the module
+            started = time.perf_counter()
             spec.loader.exec_module(module)
-            logger.info(f"Successfully executed module for {plugin_name}")
+            import_ms = (time.perf_counter() - started) * 1000
+            self.timings.setdefault(plugin_name, {})['import_ms'] = round(import_ms, 2)
+            logger.info(f"Successfully executed module for {plugin_name} ({import_ms:.1f} ms)")
             
             # Find the plugin class (should be named Plugin)
             plugin_class = getattr(module, 'Plugin', None)
@@ -146,6 +201,10 @@ class PluginManager:
     
     def enable_plugin(self, plugin_name: str) -> bool:
         """Enable a plugin"""
+        with self._lock:
+            return self._enable_plugin(plugin_name)
+    
+    def _enable_plugin(self, plugin_name: str) -> bool:
         try:
             logger.info(f"Enabling plugin: {plugin_name}")
             
@@ -166,13 +225,17 @@ class PluginManager:
             
             # Initialize the plugin
             logger.info(f"Initializing plugin {plugin_name}")
+            started = time.perf_counter()
             if not plugin.initialize():
                 logger.error(f"Plugin {plugin_name} failed to initialize")
                 return False
+            self.timings.setdefault(plugin_name, {})['init_ms'] = round((time.perf_counter() - started) * 1000, 2)
             
             # Mark as enabled
             plugin.enabled = True
+            plugin.ui_listener = self.ui_registry.invalidate
             self.loaded_plugins[plugin_name] = plugin
+            self.ui_registry.invalidate(plugin_name)
             
             # Register hooks
             self._register_plugin_hooks(plugin)
@@ -194,6 +257,10 @@ class PluginManager:
     
     def disable_plugin(self, plugin_name: str) -> bool:
         """Disable a plugin"""
+        with self._lock:
+            return self._disable_plugin(plugin_name)
+    
+    def _disable_plugin(self, plugin_name: str) -> bool:
         try:
             logger.info(f"Disabling plugin: {plugin_name}")
             
@@ -218,6 +285,8 @@ class PluginManager:
             
             # Remove from loaded plugins
             del self.loaded_plugins[plugin_name]
+            self._plugin_routes.pop(plugin_name, None)
+            self.ui_registry.invalidate(plugin_name)
             
             # Update configuration
             if self.config_manager:
@@ -234,6 +303,10 @@ class PluginManager:
     
     def reload_plugin(self, plugin_name: str) -> bool:
         """Reload a plugin"""
+        with self._lock:
+            return self._reload_plugin(plugin_name)
+    
+    def _reload_plugin(self, plugin_name: str) -> bool:
         logger.info(f"Reloading plugin: {plugin_name}")
         
         was_enabled = plugin_name in self.loaded_plugins
@@ -277,35 +350,133 @@ class PluginManager:
             if plugin not in self.plugin_hooks[hook]:
                 self.plugin_hooks[hook].append(plugin)
                 logger.debug(f"Registered hook {hook} for plugin {plugin.name}")
+        self._rebuild_hook_dispatch()
     
     def _unregister_plugin_hooks(self, plugin: PluginBase):
         """Unregister plugin hooks"""
         for hook_list in self.plugin_hooks.values():
             if plugin in hook_list:
                 hook_list.remove(plugin)
+        self._rebuild_hook_dispatch()
+        self.hook_executor.discard(plugin.name)
     
-    def register_blueprints(self, app: Flask):
-        """Register all plugin blueprints with Flask app"""
-        for plugin in self.loaded_plugins.values():
+    def _rebuild_hook_dispatch(self):
+        """Bind every registered hook method once, instead of per call"""
+        dispatch = {}
+        for hook_name, plugins in self.plugin_hooks.items():
+            handlers = []
+            for plugin in plugins:
+                method = getattr(plugin, f"on_{hook_name}", None)
+                if callable(method):
+                    handlers.append((plugin.name, method))
+            if handlers:
+                dispatch[hook_name] = tuple(handlers)
+        # Swapped in whole, so call_hook never sees a half-built table
+        self._hook_dispatch = dispatch
+    
+    def _on_config_changed(self, snapshot, changed):
+        """Push changed plugin settings into the running plugins"""
+        for section in changed:
+            if not section.startswith(PLUGIN_SECTION_PREFIX):
+                continue
+            plugin = self.loaded_plugins.get(section[len(PLUGIN_SECTION_PREFIX):])
+            if plugin:
+                plugin.set_config(thaw(snapshot.plugin_settings(plugin.name)))
+                self.ui_registry.invalidate(plugin.name)
+    
+    def mount(self, app: Flask):
+        """
+        Serve plugin routes from app
+        
+        One catch-all route under PLUGIN_URL_PREFIX dispatches to the
+        plugin's own rules, and url_for() falls back to them for plugin
+        endpoints.
+        """
+        for rule in (PLUGIN_URL_PREFIX + '<plugin_name>/', PLUGIN_URL_PREFIX + '<plugin_name>/<path:subpath>'):
+            app.add_url_rule(rule, 'plugin_route', self.dispatch_request, methods=PLUGIN_METHODS)
+        app.url_build_error_handlers.append(self._build_plugin_url)
+    
+    def dispatch_request(self, plugin_name: str, subpath: str = ''):
+        """View of the catch-all plugin route: run the matching plugin view"""
+        routes = self.get_plugin_routes(plugin_name, current_app)
+        if routes is None:
+            abort(404)
+        
+        # Raises NotFound/MethodNotAllowed, handled like any routing error
+        rule, view_args = routes.url_map.bind_to_environ(request.environ).match(return_rule=True)
+        
+        # Expose the plugin's rule, e.g. to the request latency metrics
+        request.url_rule = rule
+        request.view_args = view_args
+        return current_app.ensure_sync(routes.view_functions[rule.endpoint])(**view_args)
+    
+    def get_plugin_routes(self, plugin_name: str, host_app: Flask) -> Optional[PluginRoutes]:
+        """
+        Get a plugin's routes, collecting them on first use
+        
+        A plugin that is enabled in the configuration but not imported yet
+        is enabled here, so its module is only loaded once it is needed.
+        
+        Args:
+            plugin_name (str): Plugin name from the request path
+            host_app (Flask): Main app serving the routes
+        
+        Returns:
+            PluginRoutes: Plugin routes, or None if the plugin is not enabled or has no routes
+        """
+        with self._lock:
+            plugin = self.loaded_plugins.get(plugin_name)
+            if plugin is None:
+                if (not self.config_manager or
+                        plugin_name not in self.config_manager.plugin_config.get('enabled_plugins', [])):
+                    return None
+                logger.info(f"Enabling plugin {plugin_name} on first request")
+                if not self._enable_plugin(plugin_name):
+                    return None
+                plugin = self.loaded_plugins[plugin_name]
+            
+            cached = self._plugin_routes.get(plugin_name)
+            if cached and cached[0] is plugin:
+                return cached[1]
+            
+            routes = None
             try:
                 blueprint = plugin.create_blueprint()
                 if blueprint:
-                    app.register_blueprint(blueprint)
+                    routes = PluginRoutes(plugin, blueprint, host_app)
                     logger.info(f"Registered blueprint for plugin {plugin.name}")
             except Exception as e:
                 logger.error(f"Error registering blueprint for plugin {plugin.name}: {e}")
+            self._plugin_routes[plugin_name] = (plugin, routes)
+            return routes
+    
+    def _build_plugin_url(self, error, endpoint, values):
+        """url_for() fallback for endpoints of plugin blueprints"""
+        for _, routes in list(self._plugin_routes.values()):
+            if routes is not None and endpoint in routes.view_functions:
+                values = dict(values)
+                anchor = values.pop('_anchor', None)
+                method = values.pop('_method', None)
+                values.pop('_scheme', None)
+                values.pop('_external', None)
+                script_name = request.script_root if has_request_context() else None
+                adapter = routes.url_map.bind('localhost', script_name=script_name)
+                url = adapter.build(endpoint, values, method=method)
+                return f"{url}#{anchor}" if anchor else url
+        raise error
     
     def call_hook(self, hook_name: str, *args, **kwargs):
-        """Call all plugins registered for a specific hook"""
-        if hook_name in self.plugin_hooks:
-            for plugin in self.plugin_hooks[hook_name]:
-                try:
-                    method_name = f"on_{hook_name}"
-                    if hasattr(plugin, method_name):
-                        method = getattr(plugin, method_name)
-                        method(*args, **kwargs)
-                except Exception as e:
-                    logger.error(f"Error calling hook {hook_name} on plugin {plugin.name}: {e}")
+        """
+        Call all plugins registered for a specific hook
+        Returns immediately; the hooks run on the hook executor, so a slow
+        plugin cannot hold up the caller (e.g. the status poller). Only
+        status_update calls are dropped for a plugin that falls behind.
+        """
+        handlers = self._hook_dispatch.get(hook_name)
+        if not handlers:
+            return
+        for plugin_name, method in handlers:
+            self.hook_executor.submit(plugin_name, hook_name, method, args, kwargs)
     
     def modify_response(self, response_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Allow plugins to modify responses"""
@@ -321,60 +492,26 @@ class PluginManager:
     
     def get_toolbar_items(self) -> List[Dict[str, Any]]:
         """Get toolbar items from all plugins"""
-        items = []
-        for plugin in self.loaded_plugins.values():
-            try:
-                plugin_items = plugin.get_toolbar_items()
-                for item in plugin_items:
-                    item['plugin'] = plugin.name
-                    items.append(item)
-            except Exception as e:
-                logger.error(f"Error getting toolbar items from plugin {plugin.name}: {e}")
-        return items
+        return self.ui_registry.get('toolbar_items').value
     
     def get_status_bar_items(self) -> List[Dict[str, Any]]:
         """Get status bar items from all plugins"""
-        items = []
-        for plugin in self.loaded_plugins.values():
-            try:
-                plugin_items = plugin.get_status_bar_items()
-                for item in plugin_items:
-                    item['plugin'] = plugin.name
-                    items.append(item)
-            except Exception as e:
-                logger.error(f"Error getting status bar items from plugin {plugin.name}: {e}")
-        return items
+        return self.ui_registry.get('status_bar_items').value
     
     def get_config_tabs(self) -> List[Dict[str, Any]]:
         """Get configuration tabs from all plugins"""
-        tabs = []
-        for plugin in self.loaded_plugins.values():
-            try:
-                plugin_tabs = plugin.get_config_tabs()
-                for tab in plugin_tabs:
-                    tab['plugin'] = plugin.name
-                    tabs.append(tab)
-            except Exception as e:
-                logger.error(f"Error getting config tabs from plugin {plugin.name}: {e}")
-        return tabs
+        return self.ui_registry.get('config_tabs').value
     
     def get_frontend_assets(self) -> Dict[str, List[str]]:
         """Get all frontend assets from loaded plugins"""
-        assets = {"css": [], "js": []}
-        for plugin in self.loaded_plugins.values():
-            try:
-                plugin_assets = plugin.get_frontend_assets()
-                for asset_type, files in plugin_assets.items():
-                    if asset_type in assets:
-                        assets[asset_type].extend(files)
-            except Exception as e:
-                logger.error(f"Error getting frontend assets from plugin {plugin.name}: {e}")
-        return assets
+        return self.ui_registry.get('frontend_assets').value
     
     def get_plugin_info(self, plugin_name: str) -> Optional[Dict[str, Any]]:
         """Get information about a specific plugin"""
         if plugin_name in self.available_plugins:
             return self.available_plugins[plugin_name].get_metadata()
+        if plugin_name in self.plugin_manifests:
+            return self._manifest_info(plugin_name)
         return None
     
     def get_all_plugins_info(self) -> List[Dict[str, Any]]:
@@ -387,8 +524,40 @@ class PluginManager:
             info['loaded'] = name in self.loaded_plugins
             plugins_info.append(info)
         
+        # Discovered plugins that have not been imported yet
+        for name in self.plugin_manifests:
+            if name not in self.available_plugins:
+                info = self._manifest_info(name)
+                info['loaded'] = False
+                plugins_info.append(info)
+        
         return plugins_info
     
+    def _read_manifest(self, config_file: Path) -> Dict[str, Any]:
+        try:
+            with open(config_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug(f"No usable manifest at {config_file}: {e}")
+            return {}
+    
+    def _manifest_info(self, plugin_name: str) -> Dict[str, Any]:
+        """Metadata in PluginBase.get_metadata() form, from config.json only"""
+        manifest = self.plugin_manifests.get(plugin_name, {})
+        enabled = bool(self.config_manager and
+                       plugin_name in self.config_manager.plugin_config.get('enabled_plugins', []))
+        return {
+            "name": plugin_name,
+            "version": manifest.get("version", "1.0.0"),
+            "author": manifest.get("author", "Unknown"),
+            "description": manifest.get("description", ""),
+            "dependencies": manifest.get("dependencies", []),
+            "hooks": manifest.get("hooks", []),
+            "routes": manifest.get("routes", []),
+            "frontend_assets": manifest.get("frontend_assets", {}),
+            "enabled": enabled
+        }
+    
     def initialize_enabled_plugins(self):
         """Initialize all enabled plugins from configuration"""
         if not self.config_manager:
@@ -400,6 +569,8 @@ class PluginManager:
             logger.info(f"Found {len(enabled_plugins)} enabled plugins in config: {enabled_plugins}")
             
             for plugin_name in enabled_plugins:
+                if plugin_name in self.loaded_plugins:
+                    continue  # Already enabled by a request for its routes
                 logger.info(f"Auto-enabling plugin: {plugin_name}")
                 if self.enable_plugin(plugin_name):
                     logger.info(f"Successfully enabled plugin: {plugin_name}")
@@ -416,6 +587,7 @@ class PluginManager:
             logger.info(f"Shutting down plugin: {plugin_name}")
             self.disable_plugin(plugin_name)
         
+        self.hook_executor.shutdown()
         logger.info("All plugins shutdown")
     
     def save_plugin_config(self, plugin_name: str, config_data: Dict[str, Any]) -> bool:
@@ -425,7 +597,9 @@ class PluginManager:
             
             if plugin_name in self.loaded_plugins:
                 plugin = self.loaded_plugins[plugin_name]
-                if plugin.handle_config_save(config_data):
+                saved = plugin.handle_config_save(config_data)
+                self.ui_registry.invalidate(plugin_name)
+                if saved:
                     # Save to global config
                     if self.config_manager:
                         success = self.config_manager.set_plugin_config(plugin_name, config_data)
@@ -22,6 +22,8 @@ class PluginBase(ABC):
         self.config = {}
         self.enabled = False
         self.blueprint = None
+        # Set by the plugin manager; see notify_ui_changed()
+        self.ui_listener = None
         
         # Load plugin metadata
         self._load_metadata()
@@ -188,6 +190,15 @@ class PluginBase(ABC):
         """Return configuration tabs for the settings modal"""
         return []
     
+    def notify_ui_changed(self):
+        """
+        Tell the app this plugin's toolbar/status bar/config tab output changed
+        The output is cached, so call this when it changes for reasons other
+        than a config save (e.g. a relay was switched)
+        """
+        if self.ui_listener:
+            self.ui_listener(self.name)
+    
     def handle_config_save(self, config_data: Dict[str, Any]) -> bool:
         """Handle configuration save from the settings modal"""
         try:
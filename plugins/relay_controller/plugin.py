@@ -161,6 +161,7 @@ class Plugin(PluginBase):
         if not GPIO_AVAILABLE:
             logger.info(f"Simulation mode: Setting {relay_id} to {'ON' if state else 'OFF'}")
             self.relay_states[relay_id] = state
+            self.notify_ui_changed()
             return True
         
         try:
@@ -175,6 +176,7 @@ class Plugin(PluginBase):
                 GPIO.output(gpio_pin, gpio_state)
             
             self.relay_states[relay_id] = state
+            self.notify_ui_changed()
             logger.debug(f"Set {relay_id} to {'ON' if state else 'OFF'}")
             return True
             
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Printer Registry for Resin Printer Control Application
+Keeps one printer instance (serial port, worker thread, status cache) per
+configured device and serves the fleet status from memory
+"""
+
+import re
+import threading
+import time
+from typing import Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ID of the printer configured by the 'printer' section; it also answers
+# the un-namespaced /api/... routes
+DEFAULT_PRINTER_ID = 'default'
+
+PRINTER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+class PrinterRegistry:
+    """
+    Printers by ID
+
+    The default printer always exists. Additional printers come from the
+    'printers' config section ({id: settings overriding 'printer'}) and
+    are added and removed as that section changes. Each printer owns its
+    serial connection and worker thread, so a slow or disconnected device
+    never holds up the others.
+    """
+
+    def __init__(self, config_manager, factory: Callable[[str], object], default):
+        """
+        Args:
+            config_manager (ConfigManager): Source of the 'printers' section
+            factory: Called with a printer ID to create that printer
+            default: The already created default printer
+        """
+        self.config_manager = config_manager
+        self.factory = factory
+        self._printers: Dict[str, object] = {DEFAULT_PRINTER_ID: default}
+        self._started = False
+        self._lock = threading.Lock()
+
+        self._sync(config_manager.snapshot())
+        config_manager.subscribe(lambda snapshot, changed: self._sync(snapshot), {'printers'})
+
+    def get(self, printer_id: str = None):
+        """
+        Get a printer
+
+        Args:
+            printer_id (str): Printer ID, None for the default printer
+
+        Returns:
+            ChituboardPrinter: The printer
+
+        Raises:
+            KeyError: If no printer has that ID
+        """
+        return self._printers[DEFAULT_PRINTER_ID if printer_id is None else printer_id]
+
+    def __contains__(self, printer_id):
+        return printer_id in self._printers
+
+    def ids(self):
+        """Printer IDs, default first"""
+        return list(self._printers)
+
+    def items(self):
+        """(ID, printer) pairs, default first"""
+        return list(self._printers.items())
+
+    def gadget_printer(self):
+        """The printer on the Pi's USB port (reading the gadget images), else the default one"""
+        for printer in self._printers.values():
+            if printer.usb_gadget:
+                return printer
+        return self._printers[DEFAULT_PRINTER_ID]
+
+    def start_all(self):
+        """Start monitoring every printer; printers added later start on their own"""
+        self._started = True
+        for printer in list(self._printers.values()):
+            printer.ensure_monitoring()
+
+    def stop_all(self):
+        """Disconnect every printer"""
+        self._started = False
+        for printer_id, printer in self.items():
+            try:
+                if printer.is_connected:
+                    printer.disconnect()
+            except Exception as e:
+                logger.error(f"Error disconnecting printer {printer_id}: {e}")
+
+    def fleet_status(self):
+        """
+        Summary of every printer from the status caches (no serial I/O)
+
+        Returns:
+            list: One dict per printer, default first
+        """
+        now = time.time()
+        fleet = []
+        for printer_id, printer in self.items():
+            snapshot = printer.status_cache.get()
+            # Nothing polled yet: fall back to the connection state
+            data = snapshot.data if snapshot.version else {
+                'connected': printer.is_connected,
+                'connection_state': printer.connection_state
+            }
+            age = now - snapshot.timestamp if snapshot.version else None
+            fleet.append({
+                'id': printer_id,
+                'name': printer.name,
+                'serial_port': printer.serial_port,
+                'usb_gadget': printer.usb_gadget,
+                'connected': data.get('connected', False),
+                'connection_state': data.get('connection_state'),
+                'firmware_version': data.get('firmware_version'),
+                'print_status': data.get('print_status'),
+                'version': snapshot.version,
+                'age': round(age, 3) if age is not None else None,
+                'stale': age is None or age > printer.status_max_age
+            })
+        return fleet
+
+    @staticmethod
+    def _shutdown(printer):
+        try:
+            printer.shutdown()
+        except Exception as e:
+            logger.error(f"Error shutting down printer {printer.printer_id}: {e}")
+
+    def _sync(self, snapshot):
+        """Create and retire printers to match the 'printers' section"""
+        configured = snapshot.section('printers')
+        with self._lock:
+            printers = dict(self._printers)
+            added, removed = [], []
+
+            for printer_id in configured:
+                if printer_id in printers:
+                    continue
+                if printer_id == DEFAULT_PRINTER_ID or not PRINTER_ID_PATTERN.match(printer_id):
+                    logger.error(f"Ignoring printer with invalid ID: {printer_id!r}")
+                    continue
+                try:
+                    printers[printer_id] = self.factory(printer_id)
+                    added.append(printer_id)
+                except Exception as e:
+                    logger.error(f"Error creating printer {printer_id}: {e}")
+
+            for printer_id in list(printers):
+                if printer_id != DEFAULT_PRINTER_ID and printer_id not in configured:
+                    removed.append(printers.pop(printer_id))
+
+            # Readers never lock; they see either the old or the new mapping
+            self._printers = printers
+
+        # Shutting down joins the printer's threads; keep that off the
+        # thread that changed the config (usually a request)
+        for printer in removed:
+            logger.info(f"Removing printer {printer.printer_id}")
+            threading.Thread(target=self._shutdown, args=(printer,),
+                             name=f"printer-shutdown-{printer.printer_id}", daemon=True).start()
+        for printer_id in added:
+            logger.info(f"Added printer {printer_id}")
+            if self._started:
+                printers[printer_id].ensure_monitoring()
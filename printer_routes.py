@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Printer Routes for Resin Printer Control Application
+Contains the Flask routes listing the printers of the fleet
+"""
+
+import time
+from flask import Blueprint, jsonify
+import logging
+
+logger = logging.getLogger(__name__)
+
+def create_printer_routes(printer_registry):
+    """
+    Create Flask blueprint with fleet routes
+
+    Per-printer control routes (/api/printers/<printer_id>/status, ...)
+    are registered by app.py next to their un-namespaced versions.
+
+    Args:
+        printer_registry: PrinterRegistry instance
+
+    Returns:
+        Blueprint: Flask blueprint with printer routes
+    """
+
+    printer_bp = Blueprint('printers', __name__, url_prefix='/api')
+
+    @printer_bp.route('/printers')
+    def api_printers():
+        """Status of every printer, served from the status caches"""
+        try:
+            fleet = printer_registry.fleet_status()
+            return jsonify({
+                'success': True,
+                'printers': fleet,
+                'connected': sum(1 for entry in fleet if entry['connected']),
+                'printing': sum(1 for entry in fleet
+                                if (entry['print_status'] or {}).get('state') == 'PRINTING'),
+                'timestamp': time.time()
+            })
+        except Exception as e:
+            logger.error(f"Error getting fleet status: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+
+    return printer_bp
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Chituboard Printer Simulator for Resin Printer Control Application
+Emulates the printer's serial firmware on a pseudo-terminal so the app,
+benchmarks and manual tests can run without hardware
+"""
+
+import os
+import pty
+import re
+import threading
+import time
+import tty
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Firmware processing time per command (seconds), measured loosely on a
+# ChiTu board at 115200 baud. Commands not listed use the default delay.
+DEFAULT_DELAYS = {
+    'M4002': 0.005,
+    'M115': 0.005,
+    'M21': 0.030,
+    'M23': 0.060,
+    'M6030': 0.200,
+    'M33': 0.050,
+    'G28': 0.050,
+}
+DEFAULT_REPLY_DELAY = 0.002
+
+# Status queries answered with "wait" while the board is busy
+BUSY_QUERIES = {'M27', 'M4000'}
+
+class ChituboardSimulator:
+    """
+    Pty-backed stand-in for a Chituboard printer
+
+    Point ChituboardPrinter at `port` and it behaves like a printer with an
+    SD card holding `files`. Prints advance through the file at
+    `print_rate` bytes per second. With `quirks` enabled the simulator
+    reproduces the firmware oddities _process_response has to fix:
+    "wait" replies while busy, the "CBD make it" identifier, "C: X:" in
+    M114 and line noise ahead of the M4002 greeting.
+    """
+
+    def __init__(self, files=None, firmware_version='V4.13', reply_delay=DEFAULT_REPLY_DELAY,
+                 delays=None, print_rate=50000, busy_time=1.0, quirks=True):
+        """
+        Args:
+            files (dict): SD card contents, filename -> size in bytes
+            firmware_version (str): Version reported by M4002
+            reply_delay (float): Processing delay for commands without an entry in delays
+            delays (dict): Per-command processing delays, merged over DEFAULT_DELAYS
+            print_rate (float): Bytes of the print file consumed per second
+            busy_time (float): Seconds after start/stop during which status queries get "wait"
+            quirks (bool): Reproduce firmware quirks
+        """
+        self.files = dict(files or {})
+        self.firmware_version = firmware_version
+        self.reply_delay = reply_delay
+        self.delays = {**DEFAULT_DELAYS, **(delays or {})}
+        self.print_rate = print_rate
+        self.busy_time = busy_time
+        self.quirks = quirks
+
+        self.sd_initialized = False
+        self.selected_file = None
+        self.printing = False
+        self.paused = False
+        self.z_position = 0.0
+        self.relative_moves = False
+        self.commands_received = 0
+
+        self._byte_position = 0.0
+        self._position_updated = time.monotonic()
+        self._busy_until = 0.0
+        self._state_lock = threading.Lock()
+
+        self._master_fd = None
+        self._slave_fd = None
+        self._thread = None
+        self._running = False
+        self.port = None
+
+    def start(self):
+        """
+        Open the pseudo-terminal and start answering commands
+
+        Returns:
+            str: Device path of the simulated serial port
+        """
+        if self._running:
+            return self.port
+
+        self._master_fd, self._slave_fd = pty.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name="printer-simulator", daemon=True)
+        self._thread.start()
+        logger.info(f"Printer simulator listening on {self.port}")
+        return self.port
+
+    def stop(self):
+        """Close the pseudo-terminal"""
+        self._running = False
+        for fd in (self._master_fd, self._slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master_fd = self._slave_fd = None
+        if self._thread:
+            self._thread.join(timeout=1)
+        logger.info("Printer simulator stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add_files_from(self, directory):
+        """Load SD card contents from a directory, e.g. the USB drive mount"""
+        for path in Path(directory).iterdir():
+            if path.is_file():
+                self.files[path.name] = path.stat().st_size
+
+    def byte_position(self):
+        """Current position in the print file"""
+        with self._state_lock:
+            self._advance()
+            return int(self._byte_position)
+
+    def _serve(self):
+        pending = b""
+        while self._running:
+            try:
+                data = os.read(self._master_fd, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            pending += data
+            while b"\n" in pending:
+                line, pending = pending.split(b"\n", 1)
+                command = line.strip().decode('latin-1')
+                if not command:
+                    continue
+                self.commands_received += 1
+                code = command.split(' ', 1)[0].upper()
+                time.sleep(self.delays.get(code, self.reply_delay))
+                try:
+                    reply = self.handle_command(command)
+                    os.write(self._master_fd, reply.encode('latin-1') + b"\r\n")
+                except OSError:
+                    return
+                except Exception as e:
+                    logger.error(f"Simulator error handling {command!r}: {e}")
+
+    def _advance(self):
+        """Move the print position forward by the time elapsed (state lock held)"""
+        now = time.monotonic()
+        if self.printing and not self.paused and self.selected_file:
+            total = self.files.get(self.selected_file, 0)
+            self._byte_position = min(total, self._byte_position + (now - self._position_updated) * self.print_rate)
+            if self._byte_position >= total:
+                self.printing = False
+        self._position_updated = now
+
+    def _total_bytes(self):
+        return self.files.get(self.selected_file, 0) if self.selected_file else 0
+
+    def handle_command(self, command):
+        """
+        Produce the firmware reply for one command line
+
+        Args:
+            command (str): Command without line ending
+
+        Returns:
+            str: Reply line
+        """
+        code, _, args = command.partition(' ')
+        code = code.upper()
+
+        with self._state_lock:
+            self._advance()
+
+            if self.quirks and code in BUSY_QUERIES and time.monotonic() < self._busy_until:
+                return "wait"
+
+            handler = getattr(self, f"_cmd_{code}", None)
+            return handler(args.strip()) if handler else "ok"
+
+    def _cmd_M4002(self, args):
+        reply = f"ok {self.firmware_version}"
+        # The board emits a few bytes of boot noise ahead of the first reply
+        return ("\x00\x13" + reply) if self.quirks else reply
+
+    def _cmd_M115(self, args):
+        if self.quirks:
+            return "ok CBD make it. Date:Dec 14 2020 Time:10:21:00"
+        return f"ok FIRMWARE_NAME:CBD PROTOCOL_VERSION:{self.firmware_version}"
+
+    def _cmd_M21(self, args):
+        self.sd_initialized = True
+        return "ok"
+
+    def _cmd_M23(self, args):
+        name = args.strip().strip("'\"")
+        if name not in self.files:
+            return f"Error:open failed, File: {name}."
+        self.selected_file = name
+        self._byte_position = 0.0
+        return f"ok File opened: {name} Size: {self.files[name]}"
+
+    def _cmd_M6030(self, args):
+        name = args.strip().strip("'\"")
+        if name:
+            if name not in self.files:
+                return f"Error:open failed, File: {name}."
+            self.selected_file = name
+        if not self.selected_file:
+            return "Error:No file selected"
+        self.printing = True
+        self.paused = False
+        self._byte_position = 0.0
+        self._busy_until = time.monotonic() + self.busy_time
+        return "ok"
+
+    def _cmd_M27(self, args):
+        if not self.printing and not self._byte_position:
+            return "Not SD printing."
+        return f"SD printing byte {int(self._byte_position)}/{self._total_bytes()}"
+
+    def _cmd_M4000(self, args):
+        z = f"{self.z_position:.3f}"
+        return (f"ok B:0/0 X:0.000 Y:0.000 Z:{z} F:256/256 "
+                f"D:{int(self._byte_position)}/{self._total_bytes()}/{1 if self.paused else 0}")
+
+    def _cmd_M114(self, args):
+        prefix = "C: " if self.quirks else ""
+        return f"ok {prefix}X:0.000000 Y:0.000000 Z:{self.z_position:.6f} E:0.000000"
+
+    def _cmd_M25(self, args):
+        if self.printing:
+            self.paused = True
+        return "ok"
+
+    def _cmd_M24(self, args):
+        if self.printing:
+            self.paused = False
+        return "ok"
+
+    def _cmd_M33(self, args):
+        self.printing = False
+        self.paused = False
+        self._byte_position = 0.0
+        self._busy_until = time.monotonic() + self.busy_time
+        return "ok"
+
+    def _cmd_G28(self, args):
+        self.z_position = 0.0
+        return "ok"
+
+    def _cmd_G90(self, args):
+        self.relative_moves = False
+        return "ok"
+
+    def _cmd_G91(self, args):
+        self.relative_moves = True
+        return "ok"
+
+    def _cmd_G1(self, args):
+        match = re.search(r"Z\s*([-+]?[0-9]*\.?[0-9]+)", args, re.IGNORECASE)
+        if match:
+            value = float(match.group(1))
+            self.z_position = max(0.0, self.z_position + value if self.relative_moves else value)
+        return "ok"
+
+    _cmd_G0 = _cmd_G1
+
+    def _cmd_M999(self, args):
+        self.printing = False
+        self.paused = False
+        self.sd_initialized = False
+        return "ok"
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a simulated Chituboard printer on a pty")
+    parser.add_argument('--files', help="Directory whose files appear on the simulated SD card")
+    parser.add_argument('--print-rate', type=float, default=50000, help="Print speed in bytes/second")
+    parser.add_argument('--no-quirks', action='store_true', help="Send clean, well-formed replies")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    simulator = ChituboardSimulator(print_rate=args.print_rate, quirks=not args.no_quirks)
+    if args.files:
+        simulator.add_files_from(args.files)
+    port = simulator.start()
+    print(f"Simulated printer on {port} - set printer.serial_port to this path. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Firmware Response Classifier for Resin Printer Control Application
+Parses Chituboard serial replies in a single pass and applies the
+firmware fixes the rest of the app relies on
+"""
+
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional, Tuple, Union
+
+class ResponseKind(Enum):
+    OK = "ok"
+    BUSY = "busy"
+    PROGRESS = "progress"
+    POSITION = "position"
+    IDENTIFIER = "identifier"
+    VERSION = "version"
+    ERROR = "error"
+    OTHER = "other"
+
+# Control characters dropped from replies (tab, LF and CR are kept)
+_CONTROL_BYTES = bytes(b for b in range(32) if b not in (9, 10, 13))
+_CONTROL_TABLE = dict.fromkeys(_CONTROL_BYTES)
+
+_NUM = r"[-+]?[0-9]*\.?[0-9]+"
+
+# Reply prefixes: an anchored match whose named alternative gives the
+# reply type (match.lastgroup is the outermost group that matched)
+_LINE_RE = re.compile(r"""
+    (?P<busy>wait)
+  | (?P<error>Error|!!)
+  | ok\ (?P<version>(?P<version_value>V\S*))
+  | (?P<ok>ok)
+""", re.VERBOSE)
+
+# Firmware identifiers, replaced wherever they appear in the line
+_IDENT_NAMES = ("CBD", "ZWLF")
+
+_SD_BYTE_RE = re.compile(r"SD printing byte (?P<current>\d+)/(?P<total>\d+)")
+
+# Key:value[/value[/flag]] fields of position and M4000 replies
+_FIELD_RE = re.compile(r"(?<![A-Za-z])(?P<key>[A-Za-z])z?:\s*(?P<value>%(num)s)"
+                       r"(?:\s*/\s*(?P<second>%(num)s))?(?:\s*/\s*(?P<third>\d+))?" % {'num': _NUM})
+
+@dataclass
+class FirmwareResponse:
+    """A classified firmware reply"""
+    kind: ResponseKind
+    text: str                       # Reply with firmware fixes applied (what callers see)
+    raw: str                        # Reply after control-character stripping only
+    command: str = ""
+    printing: Optional[bool] = None
+    current_byte: Optional[int] = None
+    total_bytes: Optional[int] = None
+    paused: bool = False
+    x: Optional[float] = None
+    y: Optional[float] = None
+    z: Optional[float] = None
+    bed: Optional[Tuple[str, str]] = None
+    firmware_name: Optional[str] = None
+    version: Optional[str] = None
+
+def clean_response(line: Union[bytes, str]) -> str:
+    """Strip control characters and surrounding whitespace from a reply line"""
+    if isinstance(line, (bytes, bytearray)):
+        return line.translate(None, _CONTROL_BYTES).decode('latin-1').strip()
+    return line.translate(_CONTROL_TABLE).strip()
+
+def classify_response(line: Union[bytes, str], command: str = "",
+                      firmware_version: str = "") -> FirmwareResponse:
+    """
+    Classify one firmware reply and apply Chituboard's response fixes
+
+    Args:
+        line: Reply as read from the port (bytes) or already decoded
+        command (str): Command the reply belongs to
+        firmware_version (str): Version substituted into identifier fixes
+
+    Returns:
+        FirmwareResponse: Typed reply; .text matches what the fixes produce
+    """
+    raw = clean_response(line)
+    code = command.strip().split(' ', 1)[0].upper()
+    if not raw:
+        return FirmwareResponse(ResponseKind.OTHER, raw, raw, code)
+
+    match = _LINE_RE.match(raw)
+    token = match.lastgroup if match else None
+
+    # Precedence follows the order the firmware fixes have always been applied in
+    if token == 'busy':
+        return FirmwareResponse(ResponseKind.BUSY, "echo:busy processing", raw, code)
+
+    # Identifier and M114 fixes apply anywhere in the line (substring
+    # tests, which also beat a regex search on these short lines)
+    for name in _IDENT_NAMES:
+        if f"{name} make it" in raw:
+            text = raw.replace(f"{name} make it",
+                               f"FIRMWARE_NAME:{name} made it PROTOCOL_VERSION:{firmware_version}")
+            return FirmwareResponse(ResponseKind.IDENTIFIER, text, raw, code, firmware_name=name)
+
+    if "C: X:" in raw:
+        return _with_fields(FirmwareResponse(ResponseKind.POSITION, raw.replace("C: ", ""), raw, code))
+
+    if code == 'M4000':
+        return _classify_m4000(raw, code)
+
+    if token == 'version':
+        return FirmwareResponse(ResponseKind.VERSION, 'ok start' + raw, raw, code,
+                                version=match.group('version_value'))
+
+    sd_byte = _SD_BYTE_RE.search(raw) if "SD printing byte" in raw else None
+    if sd_byte:
+        return FirmwareResponse(ResponseKind.PROGRESS, raw, raw, code, printing=True,
+                                current_byte=int(sd_byte.group('current')),
+                                total_bytes=int(sd_byte.group('total')))
+
+    if "Not SD printing" in raw:
+        return FirmwareResponse(ResponseKind.PROGRESS, raw, raw, code, printing=False,
+                                current_byte=0, total_bytes=0)
+
+    if token == 'error':
+        return FirmwareResponse(ResponseKind.ERROR, raw, raw, code)
+
+    if code == 'M114':
+        return _with_fields(FirmwareResponse(ResponseKind.POSITION, raw, raw, code))
+
+    if token == 'ok':
+        return FirmwareResponse(ResponseKind.OK, raw, raw, code)
+
+    return FirmwareResponse(ResponseKind.OTHER, raw, raw, code)
+
+def _with_fields(response):
+    """Fill position, bed and progress from the reply's key:value fields"""
+    for key, value, second, third in _FIELD_RE.findall(response.raw):
+        if key in 'XxYyZz':
+            setattr(response, key.lower(), float(value))
+        elif key in 'Bb':
+            response.bed = (value, second or value)
+        elif key in 'Dd' and second:
+            response.current_byte = int(float(value))
+            response.total_bytes = int(float(second))
+            response.paused = third == '1'
+    return response
+
+def _classify_m4000(raw, code):
+    """M4000 reports bed, position and print progress in one line"""
+    response = _with_fields(FirmwareResponse(ResponseKind.OTHER, raw, raw, code))
+
+    if response.total_bytes is not None:
+        response.kind = ResponseKind.PROGRESS
+    elif raw.startswith('ok'):
+        response.kind = ResponseKind.OK
+
+    if response.bed:
+        # Temperature format the monitoring side expects
+        response.text = f"T:0 /0 B:{response.bed[0]} /{response.bed[1]}"
+    elif response.total_bytes is not None:
+        response.text = f"SD printing byte {response.current_byte}/{response.total_bytes}"
+    return response
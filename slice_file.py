@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Slice File Parser for Resin Printer Control Application
+Reads the header, print parameters and layer table of ChiTuBox
+.ctb/.cbddlp files without loading the layer images
+"""
+
+import mmap
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Any, Optional
+import logging
+
+# Optional numpy for vectorized preview decoding
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# File magics (first uint32 of the file)
+CBDDLP_MAGIC = 0x12FD0019
+CTB_MAGIC = 0x12FD0086
+
+SLICE_FORMATS = {
+    CBDDLP_MAGIC: 'cbddlp',
+    CTB_MAGIC: 'ctb',
+}
+
+PARSEABLE_EXTENSIONS = {'.ctb', '.cbddlp'}
+PREVIEW_EXTENSIONS = PARSEABLE_EXTENSIONS | {'.pwmx'}
+
+# magic, version, bed x/y/z (mm), 2 x unknown, total height, layer height,
+# exposure, bottom exposure, light-off delay, bottom layers, resolution x/y,
+# large preview offset, layer table offset, layer count, small preview offset,
+# print time (s), projector type, print params offset/size, anti-alias level,
+# light PWM, bottom light PWM, encryption key, slicer info offset/size
+HEADER = struct.Struct('<2I3f2I5f12I2H3I')
+
+# bottom lift height/speed, lift height/speed, retract speed, volume (ml),
+# weight (g), cost, bottom light-off delay, light-off delay, bottom layers
+PRINT_PARAMS = struct.Struct('<10fI')
+
+# width, height, image data offset, image data length, 4 x unknown
+PREVIEW_HEADER = struct.Struct('<4I16x')
+
+# Anycubic .pwmx: "ANYCUBIC" mark, version, area count, header address,
+# software address, preview address
+PWMX_FILE_MARK = struct.Struct('<12s5I')
+# "PREVIEW" section mark, section length, width, "x" mark, height
+PWMX_PREVIEW = struct.Struct('<12sI I4sI')
+
+# CTB preview pixels are 16-bit RGB555; in the run-length data bit 5 flags
+# a run. Anycubic previews are plain RGB565.
+RLE_REPEAT_FLAG = 0x0020
+RLE_REPEAT_MASK = 0x0FFF
+
+# Largest preview side accepted, and most pixels per byte of CTB preview
+# data; anything beyond is a corrupt header that would make the decoders
+# allocate gigabytes
+MAX_PREVIEW_SIDE = 2048
+MAX_PREVIEW_PIXELS_PER_BYTE = 4096
+
+# position z, exposure, light-off delay, data address, data size,
+# page number (high bits of the address on large files), 3 x unknown
+LAYER_DEF = struct.Struct('<3f3I12x')
+
+@dataclass(frozen=True)
+class SliceFileInfo:
+    """Print metadata read from a slice file header"""
+    format: str
+    version: int
+    resolution_x: int
+    resolution_y: int
+    bed_x_mm: float
+    bed_y_mm: float
+    bed_z_mm: float
+    total_height_mm: float
+    layer_height_mm: float
+    layer_count: int
+    bottom_layers: int
+    exposure_s: float
+    bottom_exposure_s: float
+    light_off_delay_s: float
+    print_time_s: int
+    volume_ml: float
+    weight_g: float
+    antialias_level: int
+    layer_table_offset: int
+    preview_large_offset: int
+    preview_small_offset: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public metadata as a JSON-serializable dict"""
+        data = asdict(self)
+        for key in ('layer_table_offset', 'preview_large_offset', 'preview_small_offset'):
+            del data[key]
+        return data
+
+def _read_header(view, file_size) -> Optional[SliceFileInfo]:
+    """Parse the fixed header and print parameters from a mapped file"""
+    if file_size < HEADER.size:
+        return None
+
+    (magic, version, bed_x, bed_y, bed_z, _, _, total_height, layer_height,
+     exposure, bottom_exposure, light_off_delay, bottom_layers, resolution_x,
+     resolution_y, preview_large_offset, layer_table_offset, layer_count,
+     preview_small_offset, print_time, _, params_offset, params_size,
+     antialias_level, _, _, _, _, _) = HEADER.unpack_from(view, 0)
+
+    slice_format = SLICE_FORMATS.get(magic)
+    if slice_format is None:
+        return None
+
+    # The layer table must fit inside the file
+    if layer_table_offset + layer_count * LAYER_DEF.size > file_size:
+        logger.debug(f"Layer table out of bounds ({layer_count} layers at {layer_table_offset})")
+        return None
+
+    volume_ml = 0.0
+    weight_g = 0.0
+    if params_offset and params_size >= PRINT_PARAMS.size and params_offset + PRINT_PARAMS.size <= file_size:
+        params = PRINT_PARAMS.unpack_from(view, params_offset)
+        volume_ml = params[5]
+        weight_g = params[6]
+
+    return SliceFileInfo(
+        format=slice_format,
+        version=version,
+        resolution_x=resolution_x,
+        resolution_y=resolution_y,
+        bed_x_mm=round(bed_x, 3),
+        bed_y_mm=round(bed_y, 3),
+        bed_z_mm=round(bed_z, 3),
+        total_height_mm=round(total_height, 3),
+        layer_height_mm=round(layer_height, 4),
+        layer_count=layer_count,
+        bottom_layers=bottom_layers,
+        exposure_s=round(exposure, 3),
+        bottom_exposure_s=round(bottom_exposure, 3),
+        light_off_delay_s=round(light_off_delay, 3),
+        print_time_s=print_time,
+        volume_ml=round(volume_ml, 3),
+        weight_g=round(weight_g, 3),
+        antialias_level=antialias_level,
+        layer_table_offset=layer_table_offset,
+        preview_large_offset=preview_large_offset,
+        preview_small_offset=preview_small_offset
+    )
+
+def parse_slice_file(file_path) -> Optional[SliceFileInfo]:
+    """
+    Read print metadata from a .ctb/.cbddlp file
+
+    The file is memory-mapped and only the header pages are touched, so the
+    cost does not depend on the size of the layer data.
+
+    Args:
+        file_path (Path): Path to the slice file
+
+    Returns:
+        SliceFileInfo: Parsed metadata, or None if the file is not a
+        supported slice file
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            file_size = f.seek(0, 2)
+            if file_size < HEADER.size:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return _read_header(view, file_size)
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Could not parse slice file {file_path}: {e}")
+        return None
+
+class LayerIndex:
+    """
+    Maps a byte position in a slice file to the layer being printed
+
+    The firmware only reports how far it has read into the file. Layer
+    images vary wildly in size, so the byte ratio is a poor progress
+    measure; this index is built once from the layer table and answers
+    each poll with a binary search over the layer data offsets.
+    """
+
+    def __init__(self, offsets, sizes, layer_times, print_time_s=0):
+        """
+        Args:
+            offsets: Start address of each layer's image data, in layer order
+            sizes: Size of each layer's image data
+            layer_times: Estimated seconds spent on each layer
+            print_time_s (int): Slicer's total estimate used to scale layer_times
+        """
+        order = sorted(range(len(offsets)), key=offsets.__getitem__)
+        self.offsets = array('Q', (offsets[i] for i in order))
+        self.sizes = array('Q', (sizes[i] for i in order))
+        self.layers = array('I', (i + 1 for i in order))
+
+        estimated = sum(layer_times)
+        scale = print_time_s / estimated if print_time_s and estimated else 1.0
+        self.layer_times = array('d', (layer_times[i] * scale for i in order))
+        self.elapsed = array('d')
+        total = 0.0
+        for layer_time in self.layer_times:
+            self.elapsed.append(total)
+            total += layer_time
+        self.total_time = total
+
+    @property
+    def layer_count(self) -> int:
+        return len(self.offsets)
+
+    def _position(self, byte_offset):
+        """Index of the layer whose data contains byte_offset, or -1 before layer 1"""
+        return bisect_right(self.offsets, byte_offset) - 1
+
+    def layer_at(self, byte_offset: int) -> int:
+        """1-based layer number being printed at byte_offset (0 before the first layer)"""
+        position = self._position(byte_offset)
+        return self.layers[position] if position >= 0 else 0
+
+    def time_remaining(self, byte_offset: int) -> float:
+        """Estimated seconds left when the firmware has read up to byte_offset"""
+        position = self._position(byte_offset)
+        if position < 0:
+            return self.total_time
+        size = self.sizes[position]
+        fraction = min(1.0, (byte_offset - self.offsets[position]) / size) if size else 1.0
+        done = self.elapsed[position] + fraction * self.layer_times[position]
+        return max(0.0, self.total_time - done)
+
+def read_layer_index(file_path, info: Optional[SliceFileInfo] = None) -> Optional[LayerIndex]:
+    """
+    Build a LayerIndex from a slice file's layer table
+
+    Args:
+        file_path (Path): Path to the slice file
+        info (SliceFileInfo): Header already parsed by the caller
+
+    Returns:
+        LayerIndex or None if the file cannot be parsed
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            file_size = f.seek(0, 2)
+            if file_size < HEADER.size:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                info = info or _read_header(view, file_size)
+                if info is None:
+                    return None
+
+                offsets = []
+                sizes = []
+                layer_times = []
+                for position_z, exposure, light_off, address, size, page in LAYER_DEF.iter_unpack(
+                        view[info.layer_table_offset:info.layer_table_offset + info.layer_count * LAYER_DEF.size]):
+                    offsets.append(address + (page << 32))
+                    sizes.append(size)
+                    layer_times.append(max(0.0, exposure) + max(0.0, light_off))
+
+                return LayerIndex(offsets, sizes, layer_times, info.print_time_s)
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Could not read layer table from {file_path}: {e}")
+        return None
+
+class SliceMetadataCache:
+    """
+    LRU cache of parsed slice file metadata keyed by (path, size, mtime)
+
+    A file that is rewritten in place gets a new size or mtime and is parsed
+    again; stale entries simply age out.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path, stat_result=None) -> Optional[SliceFileInfo]:
+        """
+        Get metadata for a file, parsing it on a cache miss
+
+        Args:
+            file_path (Path): Path to the slice file
+            stat_result (os.stat_result): Optional stat already taken by the caller
+
+        Returns:
+            SliceFileInfo or None for unsupported files
+        """
+        file_path = Path(file_path)
+        if file_path.suffix.lower() not in PARSEABLE_EXTENSIONS:
+            return None
+
+        try:
+            stat_result = stat_result or file_path.stat()
+        except OSError:
+            return None
+
+        key = (str(file_path), stat_result.st_size, stat_result.st_mtime_ns)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        info = parse_slice_file(file_path)
+
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+@dataclass(frozen=True)
+class PreviewImage:
+    """Decoded preview: 8-bit RGB rows, top to bottom"""
+    width: int
+    height: int
+    rgb: bytes
+
+def _rgb555_to_rgb(words):
+    """Expand CTB RGB555 words (numpy uint16 array) to an (n, 3) uint8 array"""
+    rgb = np.empty((len(words), 3), dtype=np.uint8)
+    rgb[:, 0] = ((words >> 11) & 0x1F) << 3
+    rgb[:, 1] = ((words >> 6) & 0x1F) << 3
+    rgb[:, 2] = (words & 0x1F) << 3
+    return rgb
+
+def _rgb565_to_rgb(words):
+    """Expand RGB565 words (numpy uint16 array) to an (n, 3) uint8 array"""
+    rgb = np.empty((len(words), 3), dtype=np.uint8)
+    rgb[:, 0] = ((words >> 11) & 0x1F) << 3
+    rgb[:, 1] = ((words >> 5) & 0x3F) << 2
+    rgb[:, 2] = (words & 0x1F) << 3
+    return rgb
+
+def _valid_preview_size(width, height):
+    return 0 < width <= MAX_PREVIEW_SIDE and 0 < height <= MAX_PREVIEW_SIDE
+
+def _decode_rle_numpy(data, pixel_count):
+    """
+    Vectorized CTB preview RLE decode
+
+    A word is a colour word unless the word before it was a colour word
+    with the repeat flag set. Within a streak of flagged words colour and
+    run words alternate, so a word's role follows from the parity of its
+    distance to the last unflagged word before it.
+    """
+    words = np.frombuffer(data, dtype='<u2', count=len(data) // 2)
+    if not len(words):
+        return bytes(pixel_count * 3)
+    flagged = (words & RLE_REPEAT_FLAG) != 0
+    index = np.arange(len(words))
+
+    last_unflagged = np.maximum.accumulate(np.where(flagged, -1, index))
+    streak_start = np.empty_like(index)
+    streak_start[0] = 0
+    streak_start[1:] = last_unflagged[:-1] + 1
+    is_colour = (index - streak_start) % 2 == 0
+
+    colour_positions = index[is_colour]
+    following = np.append(words, 0)[colour_positions + 1]
+    repeats = np.where(flagged[colour_positions], (following & RLE_REPEAT_MASK) + 1, 1)
+
+    # Expand only the runs that fit in the image
+    ends = np.cumsum(repeats)
+    used = int(np.searchsorted(ends, pixel_count)) + 1
+    colour_positions, repeats = colour_positions[:used], repeats[:used]
+
+    pixels = np.repeat(_rgb555_to_rgb(words[colour_positions]), repeats, axis=0)[:pixel_count]
+    if len(pixels) < pixel_count:
+        pixels = np.vstack([pixels, np.zeros((pixel_count - len(pixels), 3), dtype=np.uint8)])
+    return pixels.tobytes()
+
+def _decode_rle_python(data, pixel_count):
+    """CTB preview RLE decode without numpy - one step per run, not per pixel"""
+    out = bytearray()
+    words = struct.unpack_from(f'<{len(data) // 2}H', data)
+    i = 0
+    while i < len(words) and len(out) < pixel_count * 3:
+        dot = words[i]
+        i += 1
+        repeat = 1
+        if dot & RLE_REPEAT_FLAG and i < len(words):
+            repeat += words[i] & RLE_REPEAT_MASK
+            i += 1
+        out += bytes((((dot >> 11) & 0x1F) << 3, ((dot >> 6) & 0x1F) << 3, (dot & 0x1F) << 3)) * repeat
+    out = out[:pixel_count * 3]
+    out += bytes(pixel_count * 3 - len(out))
+    return bytes(out)
+
+def _decode_raw_rgb565(data, pixel_count):
+    """Uncompressed RGB565 preview (Anycubic)"""
+    if NUMPY_AVAILABLE:
+        words = np.frombuffer(data, dtype='<u2', count=pixel_count)
+        return _rgb565_to_rgb(words).tobytes()
+    out = bytearray()
+    for dot in struct.unpack_from(f'<{pixel_count}H', data):
+        out += bytes((((dot >> 11) & 0x1F) << 3, ((dot >> 5) & 0x3F) << 2, (dot & 0x1F) << 3))
+    return bytes(out)
+
+def _read_ctb_preview(view, file_size):
+    info = _read_header(view, file_size)
+    if info is None:
+        return None
+    offset = info.preview_large_offset or info.preview_small_offset
+    if not offset or offset + PREVIEW_HEADER.size > file_size:
+        return None
+    width, height, data_offset, data_length = PREVIEW_HEADER.unpack_from(view, offset)
+    if not data_length or data_offset + data_length > file_size:
+        return None
+    if not _valid_preview_size(width, height) or width * height > data_length * MAX_PREVIEW_PIXELS_PER_BYTE:
+        logger.debug(f"Implausible preview size {width}x{height} ({data_length} bytes)")
+        return None
+    data = view[data_offset:data_offset + data_length]
+    decode = _decode_rle_numpy if NUMPY_AVAILABLE else _decode_rle_python
+    return PreviewImage(width, height, decode(data, width * height))
+
+def _read_pwmx_preview(view, file_size):
+    if file_size < PWMX_FILE_MARK.size:
+        return None
+    mark, _, _, _, _, preview_address = PWMX_FILE_MARK.unpack_from(view, 0)
+    if not mark.startswith(b'ANYCUBIC') or preview_address + PWMX_PREVIEW.size > file_size:
+        return None
+    section, _, width, _, height = PWMX_PREVIEW.unpack_from(view, preview_address)
+    data_offset = preview_address + PWMX_PREVIEW.size
+    if not section.startswith(b'PREVIEW') or not _valid_preview_size(width, height):
+        return None
+    if data_offset + width * height * 2 > file_size:
+        return None
+    data = view[data_offset:data_offset + width * height * 2]
+    return PreviewImage(width, height, _decode_raw_rgb565(data, width * height))
+
+def read_preview(file_path) -> Optional[PreviewImage]:
+    """
+    Decode the embedded preview image of a .ctb/.cbddlp/.pwmx file
+
+    Args:
+        file_path (Path): Path to the slice file
+
+    Returns:
+        PreviewImage or None if the file has no readable preview
+    """
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix not in PREVIEW_EXTENSIONS:
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            file_size = f.seek(0, 2)
+            if file_size < PWMX_FILE_MARK.size:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                if suffix == '.pwmx':
+                    return _read_pwmx_preview(view, file_size)
+                return _read_ctb_preview(view, file_size)
+    except (OSError, ValueError, struct.error, MemoryError) as e:
+        logger.debug(f"Could not read preview from {file_path}: {e}")
+        return None
@@ -1,5 +1,7 @@
 // Global variables
 let updateInterval;
+let statusStream = null;
+let currentStatus = null;
 let selectedFile = null;
 let printStartTime = null;
 let consoleLines = [];
@@ -15,13 +17,60 @@ document.addEventListener('DOMContentLoaded', function() {
     loadPluginStatusItems();
     addConsoleMessage('System initialized with plugin support', 'info');
     addConsoleMessage('Waiting for printer connection...');
-    
+});
+
+// Live status updates: Server-Sent Events with a polling fallback
+function startStatusUpdates() {
+    if (!window.EventSource) {
+        startStatusPolling();
+        return;
+    }
+
+    statusStream = new EventSource('/api/status/stream');
+
+    statusStream.onmessage = (event) => {
+        applyStatusEvent(JSON.parse(event.data));
+    };
+
+    statusStream.onerror = () => {
+        // EventSource retries on its own; only fall back once it gives up
+        if (statusStream.readyState === EventSource.CLOSED) {
+            console.warn('Status stream closed, falling back to polling');
+            statusStream = null;
+            startStatusPolling();
+        }
+    };
+}
+
+function startStatusPolling() {
+    if (updateInterval) return;
     updateInterval = setInterval(() => {
         updateStatus();
         checkUSB();
         loadPluginStatusItems();
+        refreshRelayStates();
     }, 3000);
-});
+}
+
+function applyStatusEvent(event) {
+    if (event.status) {
+        currentStatus = Object.assign(currentStatus || {}, event.status);
+        renderStatus(currentStatus);
+
+        const relays = currentStatus.plugins?.relay_controller?.relays;
+        if (relays) {
+            for (const [relayId, relayInfo] of Object.entries(relays)) {
+                updateRelayButtonState(relayId, relayInfo.state);
+            }
+        }
+    }
+    if (event.usb) {
+        renderUSBStatus(event.usb);
+    }
+    if (event.status_bar_items) {
+        updatePluginStatusItems(event.status_bar_items);
+    }
+}
 
 // Plugin Status Items
 async function loadPluginStatusItems() {
@@ -216,6 +265,46 @@ async function generatePrinterConfig() {
                            onchange="updateConfigValue('printer', 'firmware_version', this.value)">
                     <div class="form-help">Expected firmware version</div>
                 </div>
+
+                <div class="form-group">
+                    <label class="form-label">Status Poll Interval (seconds)</label>
+                    <input type="number" class="form-input" id="statusPollInterval"
+                           value="${config.printer?.status_poll_interval || 2.0}" min="0.5" max="30" step="0.5"
+                           onchange="updateConfigValue('printer', 'status_poll_interval', parseFloat(this.value))">
+                    <div class="form-help">Poll interval while a print runs; it grows up to the maximum below while nothing changes</div>
+                </div>
+
+                <div class="form-group">
+                    <label class="form-label">Fast Poll Interval (seconds)</label>
+                    <input type="number" class="form-input" id="statusPollFastInterval"
+                           value="${config.printer?.status_poll_fast_interval || 0.5}" min="0.2" max="10" step="0.1"
+                           onchange="updateConfigValue('printer', 'status_poll_fast_interval', parseFloat(this.value))">
+                    <div class="form-help">Used around start, pause, stop and the end of a print</div>
+                </div>
+
+                <div class="form-group">
+                    <label class="form-label">Max Poll Interval (seconds)</label>
+                    <input type="number" class="form-input" id="statusPollMaxInterval"
+                           value="${config.printer?.status_poll_max_interval || 8.0}" min="1" max="60" step="0.5"
+                           onchange="updateConfigValue('printer', 'status_poll_max_interval', parseFloat(this.value))">
+                    <div class="form-help">Slowest polling during a steady print</div>
+                </div>
+
+                <div class="form-group">
+                    <label class="form-label">Idle Poll Interval (seconds)</label>
+                    <input type="number" class="form-input" id="statusPollIdleInterval"
+                           value="${config.printer?.status_poll_idle_interval || 5.0}" min="1" max="60" step="0.5"
+                           onchange="updateConfigValue('printer', 'status_poll_idle_interval', parseFloat(this.value))">
+                    <div class="form-help">How often an idle printer is checked for prints started from its screen</div>
+                </div>
+
+                <div class="form-group">
+                    <label class="form-label">Status Max Age (seconds)</label>
+                    <input type="number" class="form-input" id="statusMaxAge"
+                           value="${config.printer?.status_max_age || 10.0}" min="1" max="120" step="1"
+                           onchange="updateConfigValue('printer', 'status_max_age', parseFloat(this.value))">
+                    <div class="form-help">Status older than this is reported as stale</div>
+                </div>
             </div>
             
             <div class="config-section">
@@ -237,6 +326,22 @@ async function generatePrinterConfig() {
                     <div class="form-help">USB gadget image file path</div>
                 </div>
                 
+                <div class="form-group">
+                    <label class="form-label">Staging Image File</label>
+                    <input type="text" class="form-input" id="stagingImageFile" 
+                           value="${config.usb?.staging_image_file || ''}"
+                           onchange="updateConfigValue('usb', 'staging_image_file', this.value)">
+                    <div class="form-help">Optional second image that uploads go to until it is swapped in (configfs only)</div>
+                </div>
+                
+                <div class="form-group">
+                    <label class="form-label">Extra Image Files</label>
+                    <input type="text" class="form-input" id="extraImageFiles" 
+                           value="${(config.usb?.extra_image_files || []).join(', ')}"
+                           onchange="updateConfigValue('usb', 'extra_image_files', this.value.split(',').map(s => s.trim()).filter(s => s))">
+                    <div class="form-help">Comma-separated images exposed as further drives (LUNs) of the same USB device. They all go to the one printer on the Pi's USB port; they are not per-printer.</div>
+                </div>
+                
                 <div class="form-group">
                     <label class="form-label">
                         <input type="checkbox" class="form-checkbox" id="autoStart" 
@@ -662,54 +767,126 @@ function setupUpload() {
 }
 
 // Upload files
+const UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024;
+const UPLOAD_MAX_RETRIES = 5;
+
 async function uploadFiles(files) {
-    const formData = new FormData();
+    let uploaded = 0;
+    let failed = 0;
+
+    showAlert('Uploading...', 'warning');
+    addConsoleMessage(`Uploading ${files.length} file(s)...`);
+
     for (let file of files) {
-        formData.append('files', file);
+        try {
+            const result = await uploadFileResumable(file);
+            if (result.success) {
+                uploaded++;
+                addConsoleMessage(`Uploaded ${result.name}`, 'success');
+            } else {
+                failed++;
+                addConsoleMessage(`Failed to upload ${file.name}: ${result.error}`, 'error');
+            }
+        } catch (error) {
+            failed++;
+            addConsoleMessage(`Upload error for ${file.name}: ${error.message}`, 'error');
+        }
     }
 
-    try {
-        showAlert('Uploading...', 'warning');
-        addConsoleMessage(`Uploading ${files.length} file(s)...`);
-        
-        const response = await fetch('/api/upload', {
-            method: 'POST',
-            body: formData
-        });
-        const result = await response.json();
-        
-        if (result.success) {
-            showAlert(`Uploaded ${result.total_uploaded} files successfully`, 'success');
-            addConsoleMessage(`Successfully uploaded ${result.total_uploaded} file(s)`, 'success');
-            
-            if (result.total_errors > 0) {
-                addConsoleMessage(`${result.total_errors} file(s) failed to upload`, 'warning');
+    if (uploaded > 0) {
+        showAlert(`Uploaded ${uploaded} files successfully`, 'success');
+        addConsoleMessage(`Successfully uploaded ${uploaded} file(s)`, 'success');
+
+        if (failed > 0) {
+            addConsoleMessage(`${failed} file(s) failed to upload`, 'warning');
+        }
+
+        updateFiles();
+    } else {
+        showAlert('Upload failed', 'error');
+        addConsoleMessage('Upload failed', 'error');
+    }
+}
+
+// Upload one file in chunks, resuming from the server's offset after errors
+async function uploadFileResumable(file) {
+    const startResponse = await fetch('/api/uploads', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({filename: file.name, size: file.size})
+    });
+    const start = await startResponse.json();
+    if (!start.success) return start;
+
+    const uploadUrl = `/api/uploads/${start.upload_id}`;
+    let offset = 0;
+    let retries = 0;
+
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + UPLOAD_CHUNK_SIZE);
+        const headers = {'Upload-Offset': String(offset)};
+        const checksum = await sha256Hex(chunk);
+        if (checksum) headers['X-Checksum-SHA256'] = checksum;
+
+        try {
+            const response = await fetch(uploadUrl, {method: 'PUT', headers, body: chunk});
+            const result = await response.json();
+
+            if (result.success) {
+                offset = result.offset;
+                retries = 0;
+                const percent = Math.round(offset / file.size * 100);
+                showAlert(`Uploading ${file.name}: ${percent}%`, 'warning');
+                continue;
             }
-            
-            updateFiles();
-        } else {
-            showAlert('Upload failed', 'error');
-            addConsoleMessage('Upload failed', 'error');
+            if (response.status !== 409 || ++retries > UPLOAD_MAX_RETRIES) {
+                return result;
+            }
+            offset = result.offset;
+        } catch (error) {
+            if (++retries > UPLOAD_MAX_RETRIES) {
+                await fetch(uploadUrl, {method: 'DELETE'}).catch(() => {});
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+
+            // Ask the server how much actually arrived before resending
+            const status = await fetch(uploadUrl).then(r => r.json()).catch(() => null);
+            if (status && typeof status.offset === 'number') offset = status.offset;
         }
-    } catch (error) {
-        showAlert(`Upload error: ${error.message}`, 'error');
-        addConsoleMessage(`Upload error: ${error.message}`, 'error');
     }
+
+    const completeResponse = await fetch(`${uploadUrl}/complete`, {method: 'POST'});
+    return completeResponse.json();
+}
+
+// SHA-256 of a blob as hex; WebCrypto is only available on secure origins
+async function sha256Hex(blob) {
+    if (!window.crypto || !window.crypto.subtle) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
 }
 
 // Update status
 async function updateStatus() {
     try {
         const response = await fetch('/api/status');
-        const status = await response.json();
+        currentStatus = await response.json();
+        renderStatus(currentStatus);
+    } catch (error) {
+        console.error('Status error:', error);
+    }
+}
 
+function renderStatus(status) {
+    try {
         // Connection
         const connEl = document.getElementById('connectionStatus');
         if (status.connected) {
             connEl.textContent = 'Connected';
             connEl.className = 'status-value status-connected';
         } else {
-            connEl.textContent = 'Disconnected';
+            connEl.textContent = status.connection_state === 'connecting' ? 'Connecting...' : 'Disconnected';
             connEl.className = 'status-value status-disconnected';
         }
 
@@ -762,6 +939,9 @@ function updateButtons(status) {
     document.getElementById('stopBtn').disabled = !connected || (!printing && !paused);
 }
 
+// File types with an embedded preview image
+const THUMBNAIL_EXTENSIONS = ['.ctb', '.cbddlp', '.pwmx'];
+
 // Update file list
 async function updateFiles() {
     try {
@@ -776,9 +956,13 @@ async function updateFiles() {
 
         fileList.innerHTML = files.map(file => `
             <div class="file-item">
+                ${THUMBNAIL_EXTENSIONS.includes(file.extension) ? `
+                <img class="file-thumb" loading="lazy" alt=""
+                     src="/api/files/${encodeURIComponent(file.name)}/thumbnail"
+                     onerror="this.remove()">` : ''}
                 <div class="file-info">
                     <div class="file-name">${file.name}</div>
-                    <div class="file-meta">${formatSize(file.size)} • ${file.modified}</div>
+                    <div class="file-meta">${formatSize(file.size)} • ${file.modified}${formatSliceMetadata(file.metadata)}</div>
                 </div>
                 <div class="file-actions">
                     <button class="btn file-btn" onclick="selectFile('${file.name}')">📋 Select</button>
@@ -792,6 +976,14 @@ async function updateFiles() {
     }
 }
 
+function formatSliceMetadata(metadata) {
+    if (!metadata) return '';
+    let text = ` • ${metadata.layer_count} layers`;
+    if (metadata.print_time_s) text += ` • ${formatTime(metadata.print_time_s)}`;
+    if (metadata.volume_ml) text += ` • ${metadata.volume_ml.toFixed(1)} ml`;
+    return text;
+}
+
 function formatSize(bytes) {
     if (bytes < 1024) return bytes + ' B';
     if (bytes < 1024 * 1024) return (bytes / 1024).toFixed(1) + ' KB';
@@ -985,8 +1177,14 @@ function refreshFiles() {
 async function checkUSB() {
     try {
         const response = await fetch('/api/usb_status');
-        const status = await response.json();
+        renderUSBStatus(await response.json());
+    } catch (error) {
+        console.error('USB status error:', error);
+    }
+}
 
+function renderUSBStatus(status) {
+    try {
         const serviceEl = document.getElementById('usbService');
         const mountEl = document.getElementById('usbMount');
         const spaceEl = document.getElementById('usbSpace');
@@ -1051,11 +1249,15 @@ function updatePrintingOverlay(status) {
     const fileName = status.selected_file || selectedFile || 'Unknown File';
     document.getElementById('printingFileName').textContent = fileName;
 
-    // Layer info
+    // Layer info (exact when the server knows the file's layer table)
     const progress = status.print_status.progress_percent;
-    const estimatedLayers = Math.max(1, Math.round(status.print_status.total_bytes / 10000));
-    const currentLayer = Math.round((progress / 100) * estimatedLayers);
-    document.getElementById('printingLayerInfo').textContent = `Layer ${currentLayer} of ${estimatedLayers}`;
+    let currentLayer = status.print_status.current_layer;
+    let totalLayers = status.print_status.total_layers;
+    if (!totalLayers) {
+        totalLayers = Math.max(1, Math.round(status.print_status.total_bytes / 10000));
+        currentLayer = Math.round((progress / 100) * totalLayers);
+    }
+    document.getElementById('printingLayerInfo').textContent = `Layer ${currentLayer} of ${totalLayers}`;
 
     // Progress
     document.getElementById('printingProgress').textContent = `${progress.toFixed(0)}%`;
@@ -1063,8 +1265,10 @@ function updatePrintingOverlay(status) {
     // Z Position
     document.getElementById('printingZPos').textContent = `${status.z_position.toFixed(2)}`;
 
-    // Time left (estimated)
-    if (printStartTime && progress > 1) {
+    // Time left (from the layer table, else extrapolated from elapsed time)
+    if (status.print_status.time_remaining > 0) {
+        document.getElementById('printingTimeLeft').textContent = formatTime(status.print_status.time_remaining);
+    } else if (printStartTime && progress > 1) {
         const elapsed = (Date.now() - printStartTime) / 1000;
         const totalEstimated = (elapsed / progress) * 100;
         const remaining = Math.max(0, totalEstimated - elapsed);
@@ -1289,12 +1493,7 @@ document.addEventListener('DOMContentLoaded', function() {
     addConsoleMessage('System initialized with plugin support', 'info');
     addConsoleMessage('Waiting for printer connection...');
     
-    updateInterval = setInterval(() => {
-        updateStatus();
-        checkUSB();
-        loadPluginStatusItems();
-        refreshRelayStates();     // Refresh relay states
-    }, 3000);
+    startStatusUpdates();     // Stream status, USB, status bar and relay updates
 });
 
 // Keyboard shortcuts for relays
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Status Cache for Resin Printer Control Application
+Holds the latest printer status published by the background poller so
+HTTP handlers can serve it from memory without touching the serial port
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """Immutable, versioned copy of the printer status"""
+    version: int = 0
+    timestamp: float = 0.0
+    monotonic: float = 0.0
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def age(self) -> float:
+        """Seconds since this snapshot was published"""
+        if not self.version:
+            return float('inf')
+        return time.monotonic() - self.monotonic
+
+class StatusCache:
+    """
+    Single-writer status store
+
+    The poller replaces the snapshot wholesale on every publish, so readers
+    just grab the current reference and never need the lock. Streaming
+    readers can block in wait_for_update until a newer version appears.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._snapshot = StatusSnapshot()
+
+    def publish(self, data: Dict[str, Any]) -> StatusSnapshot:
+        """Publish a new status dict and return the resulting snapshot"""
+        with self._condition:
+            snapshot = StatusSnapshot(
+                version=self._snapshot.version + 1,
+                timestamp=time.time(),
+                monotonic=time.monotonic(),
+                data=data
+            )
+            self._snapshot = snapshot
+            self._condition.notify_all()
+        logger.debug(f"Published status snapshot v{snapshot.version}")
+        return snapshot
+
+    def get(self) -> StatusSnapshot:
+        """Get the latest snapshot"""
+        return self._snapshot
+
+    def wait_for_update(self, version: int, timeout: float) -> StatusSnapshot:
+        """
+        Wait until a snapshot newer than `version` is published
+
+        Returns the latest snapshot, which is unchanged if the timeout expired
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._snapshot.version > version, timeout)
+            return self._snapshot
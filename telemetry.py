@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Telemetry for Resin Printer Control Application
+Fixed-memory time series of printer samples at several resolutions
+"""
+
+import bisect
+import math
+import threading
+import time
+from array import array
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Column name -> array typecode, in storage/transfer order. 8-byte columns
+# come first so every column of a packed binary response stays aligned.
+COLUMNS = (
+    ('t', 'd'),          # epoch seconds
+    ('byte', 'q'),       # position in the print file
+    ('progress', 'f'),   # percent
+    ('layer', 'i'),
+    ('z', 'f'),          # mm
+    ('bed', 'f'),        # bed/resin temperature, NaN if not reported
+)
+
+# Range name -> (bucket width in seconds, number of buckets)
+TIERS = {
+    '1h': (5, 720),
+    '24h': (60, 1440),
+    '7d': (600, 1008),
+}
+
+class RingBuffer:
+    """Columnar ring buffer backed by preallocated arrays"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.columns = {name: array(code, [0]) * capacity for name, code in COLUMNS}
+        self.head = 0    # next slot to write
+        self.count = 0
+
+    def append(self, values):
+        for name, column in self.columns.items():
+            column[self.head] = values[name]
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def replace_last(self, values):
+        last = (self.head - 1) % self.capacity
+        for name, column in self.columns.items():
+            column[last] = values[name]
+
+    def last_time(self):
+        if not self.count:
+            return None
+        return self.columns['t'][(self.head - 1) % self.capacity]
+
+    def snapshot(self, since=None):
+        """
+        Copy the buffer out in chronological order
+
+        Args:
+            since (float): Only samples newer than this epoch time
+
+        Returns:
+            dict: Column name -> array
+        """
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            spans = [(start, start + self.count)]
+        else:
+            spans = [(start, self.capacity), (0, self.head)]
+
+        result = {}
+        for name, code in COLUMNS:
+            column = self.columns[name]
+            out = array(code)
+            for lo, hi in spans:
+                out.extend(column[lo:hi])
+            result[name] = out
+
+        if since is not None and result['t']:
+            # Times are ascending: binary search for the first newer sample
+            first = bisect.bisect_right(result['t'], since)
+            if first:
+                result = {name: values[first:] for name, values in result.items()}
+        return result
+
+class Telemetry:
+    """
+    Printer telemetry at 1 h / 24 h / 7 d resolution
+
+    Every sample goes to all tiers. Each tier keeps the latest sample per
+    bucket (5 s, 1 min and 10 min wide), so memory is fixed at about
+    100 KB whatever the uptime.
+    """
+
+    def __init__(self, tiers=None):
+        self.tiers = {name: (width, RingBuffer(capacity))
+                      for name, (width, capacity) in (tiers or TIERS).items()}
+        self._lock = threading.Lock()
+
+    def record(self, progress=0.0, current_byte=0, layer=0, z=0.0, bed=None, timestamp=None):
+        """
+        Add a sample
+
+        Args:
+            progress (float): Print progress in percent
+            current_byte (int): Position in the print file
+            layer (int): Current layer
+            z (float): Z position in mm
+            bed (float): Bed/resin temperature, None if not reported
+            timestamp (float): Epoch time, defaults to now
+        """
+        values = {
+            't': timestamp if timestamp is not None else time.time(),
+            'progress': progress or 0.0,
+            'byte': current_byte or 0,
+            'layer': layer or 0,
+            'z': z or 0.0,
+            'bed': math.nan if bed is None else bed,
+        }
+
+        with self._lock:
+            for width, ring in self.tiers.values():
+                last = ring.last_time()
+                if last is not None and values['t'] // width == last // width:
+                    ring.replace_last(values)
+                else:
+                    ring.append(values)
+
+    def get_series(self, range_name='1h', since=None):
+        """
+        Get one tier's samples
+
+        Args:
+            range_name (str): '1h', '24h' or '7d'
+            since (float): Only samples newer than this epoch time
+
+        Returns:
+            tuple: (bucket width in seconds, dict of column name -> array)
+        """
+        if range_name not in self.tiers:
+            raise ValueError(f"Unknown telemetry range: {range_name}")
+        width, ring = self.tiers[range_name]
+        with self._lock:
+            return width, ring.snapshot(since)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Telemetry Routes for Resin Printer Control Application
+Contains the Flask route serving recorded printer time series
+"""
+
+import math
+import sys
+from flask import Blueprint, Response, request, jsonify
+import logging
+
+from telemetry import COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# array typecode -> name used in the binary layout header
+BINARY_TYPES = {'d': 'f64', 'q': 'i64', 'f': 'f32', 'i': 'i32'}
+
+def create_telemetry_routes(telemetry, printer_registry=None):
+    """
+    Create Flask blueprint with telemetry routes
+    
+    Args:
+        telemetry: Telemetry instance of the default printer
+        printer_registry: PrinterRegistry; if given, the route is also
+            served per printer at /api/printers/<printer_id>/telemetry
+        
+    Returns:
+        Blueprint: Flask blueprint with telemetry routes
+    """
+    
+    telemetry_bp = Blueprint('telemetry', __name__, url_prefix='/api')
+    
+    @telemetry_bp.route('/telemetry')
+    def api_telemetry(printer_id=None):
+        """
+        Get recorded samples for one time range
+        
+        Query parameters:
+            range: '1h' (5 s buckets), '24h' (1 min) or '7d' (10 min)
+            since: only samples newer than this epoch time
+            format: 'json' (columnar, default) or 'binary'
+        
+        The binary format is the columns packed back to back, little-endian,
+        in the order and types given by the X-Telemetry-Columns header.
+        """
+        range_name = request.args.get('range', '1h')
+        since = request.args.get('since', type=float)
+        
+        try:
+            source = telemetry if printer_id is None else printer_registry.get(printer_id).telemetry
+            interval, series = source.get_series(range_name, since)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error reading telemetry: {e}")
+            return jsonify({'error': str(e)}), 500
+        
+        count = len(series['t'])
+        
+        if request.args.get('format') == 'binary':
+            chunks = []
+            for name, _ in COLUMNS:
+                values = series[name]
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                chunks.append(values.tobytes())
+            return Response(b''.join(chunks), mimetype='application/octet-stream', headers={
+                'X-Telemetry-Columns': ','.join(f"{name}:{BINARY_TYPES[code]}" for name, code in COLUMNS),
+                'X-Telemetry-Count': str(count),
+                'X-Telemetry-Interval': str(interval),
+                'Cache-Control': 'no-cache'
+            })
+        
+        # float32 columns are rounded so JSON does not carry conversion noise;
+        # missing temperatures (NaN) become null
+        columns = {
+            't': [round(t, 1) for t in series['t']],
+            'byte': series['byte'].tolist(),
+            'progress': [round(v, 2) for v in series['progress']],
+            'layer': series['layer'].tolist(),
+            'z': [round(v, 3) for v in series['z']],
+            'bed': [None if math.isnan(v) else round(v, 1) for v in series['bed']],
+        }
+        return jsonify({
+            'range': range_name,
+            'interval': interval,
+            'count': count,
+            'columns': columns
+        })
+    
+    if printer_registry is not None:
+        telemetry_bp.add_url_rule('/printers/<printer_id>/telemetry', view_func=api_telemetry)
+    
+    return telemetry_bp
@@ -0,0 +1,77 @@
+"""Multipart uploads through /api/upload"""
+
+import io
+
+import pytest
+from flask import Flask
+
+from file_manager import FileManager
+from file_routes import create_file_routes
+
+BOUNDARY = 'testboundary'
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    return tmp_path / 'usb'
+
+@pytest.fixture
+def client(upload_dir):
+    app = Flask(__name__)
+    app.register_blueprint(create_file_routes(FileManager(upload_dir)))
+    return app.test_client()
+
+def multipart(*parts):
+    body = b''
+    for name, data in parts:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="files"; '
+                 f'filename="{name}"\r\nContent-Type: application/octet-stream\r\n\r\n').encode()
+        body += data + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+def part_files(upload_dir):
+    return list(upload_dir.glob('.upload-*.part'))
+
+def test_upload(client, upload_dir):
+    response = client.post('/api/upload', data=multipart(('model.ctb', b'x' * 4096)),
+                           content_type=f'multipart/form-data; boundary={BOUNDARY}')
+    assert response.get_json()['total_uploaded'] == 1
+    assert (upload_dir / 'model.ctb').read_bytes() == b'x' * 4096
+    assert not part_files(upload_dir)
+
+class DisconnectingStream(io.BytesIO):
+    """Request body whose client goes away after `limit` bytes"""
+
+    def __init__(self, data, limit):
+        super().__init__(data)
+        self.limit = limit
+
+    def readinto(self, buffer):
+        if self.tell() >= self.limit:
+            raise OSError("Client disconnected")
+        view = memoryview(buffer)[:self.limit - self.tell()]
+        return super().readinto(view)
+
+def test_aborted_upload_leaves_no_part_files(client, upload_dir):
+    body = multipart(('first.ctb', b'a' * 100000), ('second.ctb', b'b' * 100000))
+    # The client goes away halfway through the second file
+    response = client.post('/api/upload', input_stream=DisconnectingStream(body, 150000),
+                           content_type=f'multipart/form-data; boundary={BOUNDARY}',
+                           headers={'Content-Length': str(len(body))})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert not part_files(upload_dir)
+    assert not list(upload_dir.glob('*.ctb'))
+
+def test_truncated_upload_leaves_no_part_files(client, upload_dir):
+    body = multipart(('first.ctb', b'a' * 100000), ('second.ctb', b'b' * 100000))
+    response = client.post('/api/upload', input_stream=io.BytesIO(body[:150000]),
+                           content_type=f'multipart/form-data; boundary={BOUNDARY}')
+    assert response.get_json()['success'] is False
+    assert not part_files(upload_dir)
+
+def test_oversized_upload_leaves_no_part_files(client, upload_dir):
+    client.application.config['MAX_CONTENT_LENGTH'] = 50000
+    response = client.post('/api/upload', data=multipart(('big.ctb', b'c' * 100000)),
+                           content_type=f'multipart/form-data; boundary={BOUNDARY}')
+    assert response.status_code == 413
+    assert not part_files(upload_dir)
@@ -0,0 +1,67 @@
+"""HookExecutor drops only status updates when a plugin falls behind"""
+
+import threading
+import time
+
+from hook_executor import HookExecutor
+
+def test_lifecycle_hooks_are_never_dropped():
+    executor = HookExecutor(max_pending=4)
+    gate = threading.Event()
+    seen = []
+    done = threading.Event()
+
+    def hook(tag):
+        gate.wait()
+        seen.append(tag)
+        if tag == 'last':
+            done.set()
+
+    # Block the lane, then overfill it
+    executor.submit('plugin', 'print_started', hook, ('started',))
+    time.sleep(0.05)
+    for i in range(6):
+        executor.submit('plugin', 'status_update', hook, (f'status{i}',))
+    for i in range(5):
+        executor.submit('plugin', 'print_finished', hook, (f'finished{i}',))
+    executor.submit('plugin', 'print_failed', hook, ('last',))
+
+    gate.set()
+    assert done.wait(5)
+    assert seen == ['started'] + [f'finished{i}' for i in range(5)] + ['last']
+    executor.shutdown()
+
+def test_status_updates_keep_the_newest():
+    executor = HookExecutor(max_pending=3)
+    gate = threading.Event()
+    seen = []
+
+    def hook(tag):
+        gate.wait()
+        seen.append(tag)
+
+    executor.submit('plugin', 'status_update', hook, ('blocked',))
+    time.sleep(0.05)
+    for i in range(10):
+        executor.submit('plugin', 'status_update', hook, (i,))
+
+    gate.set()
+    executor.shutdown(wait=True)
+    assert seen == ['blocked', 7, 8, 9]
+
+def test_hung_plugins_do_not_block_others():
+    executor = HookExecutor()
+    release = threading.Event()
+    delivered = threading.Event()
+
+    def hang(*args):
+        release.wait()
+
+    # More hung plugins than the old shared pool had workers
+    for name in ('hung1', 'hung2', 'hung3'):
+        executor.submit(name, 'print_started', hang, ('model.ctb',))
+    executor.submit('healthy', 'print_started', lambda *args: delivered.set(), ('model.ctb',))
+
+    assert delivered.wait(2)
+    release.set()
+    executor.shutdown(wait=True)
@@ -0,0 +1,134 @@
+"""
+ChituboardPrinter against the pty firmware simulator: the firmware quirks
+through the app's reader, and a connect/poll/print/stop round trip
+"""
+
+import time
+
+import pytest
+
+import app
+from job_history import JobHistory
+from printer_simulator import ChituboardSimulator
+from response_classifier import ResponseKind
+from telemetry import Telemetry
+
+FILES = {'model.ctb': 200000}
+
+@pytest.fixture
+def simulator():
+    sim = ChituboardSimulator(files=FILES, reply_delay=0.001, delays={'M6030': 0.01, 'M23': 0.01},
+                              print_rate=20000, busy_time=0.3)
+    sim.start()
+    yield sim
+    sim.stop()
+
+@pytest.fixture
+def printer(simulator, tmp_path):
+    printer = app.ChituboardPrinter(job_history=JobHistory(tmp_path / 'jobs.db'), telemetry=Telemetry())
+    printer.serial_port = simulator.port
+    # The simulated card is not the file manager's mount
+    printer.usb_gadget = False
+    yield printer
+    printer.disconnect()
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.mark.parametrize("line,command,kind,text", [
+    (b"wait\r\n", "M27", ResponseKind.BUSY, "echo:busy processing"),
+    (b"ok CBD make it. Date:Dec 14 2020 Time:10:21:00\r\n", "M115", ResponseKind.IDENTIFIER,
+     "ok FIRMWARE_NAME:CBD made it PROTOCOL_VERSION:V4.13. Date:Dec 14 2020 Time:10:21:00"),
+    (b"ok C: X:0.000000 Y:0.000000 Z:12.500000 E:0.000000\r\n", "M114", ResponseKind.POSITION,
+     "ok X:0.000000 Y:0.000000 Z:12.500000 E:0.000000"),
+    (b"\x00\x13ok V4.13\r\n", "M4002", ResponseKind.VERSION, "ok startok V4.13"),
+])
+def test_quirk_replies(line, command, kind, text):
+    printer = app.ChituboardPrinter(job_history=JobHistory(':memory:'), telemetry=Telemetry())
+    response = printer._process_response(line, command)
+    assert response.kind == kind
+    assert response.text == text
+
+def test_quirk_replies_over_serial(simulator, printer):
+    assert printer.connect()
+    # M115's identifier fix carries the version M4002 reported
+    assert printer.firmware_version.startswith('V4.13')
+
+    response = printer._query("M114")
+    assert response.kind == ResponseKind.POSITION
+    assert "C: " not in response.text
+
+    # Status queries get "wait" right after a print starts
+    printer._query("M6030 'model.ctb'")
+    response = printer._query("M27")
+    assert response.kind == ResponseKind.BUSY
+
+def test_connect_poll_print_stop(simulator, printer):
+    assert printer.connect()
+    assert printer.is_connected
+    assert simulator.sd_initialized
+
+    assert printer.start_printing('model.ctb')
+    assert printer.print_status.state == app.PrinterState.PRINTING
+
+    # Past the simulator's busy window the detailed poll reports progress
+    assert wait_for(lambda: printer.get_print_status(True).current_byte > 0)
+    status = printer.print_status
+    assert status.state == app.PrinterState.PRINTING
+    assert status.total_bytes == FILES['model.ctb']
+    assert printer.bed_temperature == 0.0
+
+    assert printer.pause_printing()
+    assert simulator.paused
+    assert printer.resume_printing()
+    assert not simulator.paused
+
+    assert printer.stop_printing()
+    assert printer.print_status.state == app.PrinterState.IDLE
+    assert not simulator.printing
+
+    printer.disconnect()
+    assert not printer.is_connected
+
+def inject_wait(simulator, code):
+    """Make the simulator send an unprompted "wait" ahead of its reply to `code`"""
+    handle_command = simulator.handle_command
+
+    def with_wait(command):
+        reply = handle_command(command)
+        return "wait\r\n" + reply if command.split(' ', 1)[0].upper() == code else reply
+    simulator.handle_command = with_wait
+
+def test_batch_replies_stay_aligned_around_wait(simulator, printer):
+    assert printer.connect()
+    inject_wait(simulator, 'G1')
+
+    commands = ["G91", "G1 Z5 F300", "M114", "G90", "M115", "M27"]
+    responses = printer.send_commands(commands)
+
+    assert [response.command for response in responses] == [command.split(' ')[0] for command in commands]
+    assert [response.kind for response in responses] == [
+        ResponseKind.OK, ResponseKind.OK, ResponseKind.POSITION,
+        ResponseKind.OK, ResponseKind.IDENTIFIER, ResponseKind.PROGRESS]
+    assert responses[2].z == 5.0
+    assert responses[5].printing is False
+
+    # Nothing left over for the next command
+    assert printer._query("M114").kind == ResponseKind.POSITION
+
+def test_gcode_route(simulator, printer, monkeypatch):
+    assert printer.connect()
+    inject_wait(simulator, 'G28')
+    monkeypatch.setattr(app.printers, 'get', lambda printer_id=None: printer)
+
+    response = app.app.test_client().post('/api/gcode', json={'gcode': "G28 Z0 ; home\nG91\nG1 Z2\nM114"})
+    data = response.get_json()
+    assert data['success']
+    assert data['sent'] == 4
+    assert [result['kind'] for result in data['results']] == ['ok', 'ok', 'ok', 'position']
+    assert 'Z:2.000000' in data['results'][3]['response']
@@ -0,0 +1,52 @@
+"""
+Regression tests for response_classifier against the firmware fixes it
+replaced (the legacy _process_response kept in the benchmark)
+"""
+
+import pytest
+
+from benchmarks.response_benchmark import CORPUS, LegacyResponseProcessor
+from response_classifier import ResponseKind, classify_response
+
+# Replies where the marker is not at the start of the line
+SHIFTED = [
+    ("M115", b"echo:CBD make it. Date:Dec 14 2020\r\n"),
+    ("M115", b"ok\x13 ZWLF make it. Date:Jan 02 2021\r\n"),
+    ("M115", b"FW CBD make it, CBD make it\r\n"),
+    ("M114", b"echo: C: X:0.000000 Y:0.000000 Z:3.500000 E:0.000000\r\n"),
+    ("M114", b"ok C: X:1.000000 C: Y:2.000000 Z:3.000000\r\n"),
+    ("M27", b"ok SD printing byte 100/2000\r\n"),
+    ("M27", b"echo:Not SD printing.\r\n"),
+]
+
+@pytest.mark.parametrize("command,line", CORPUS + SHIFTED)
+def test_text_matches_legacy(command, line):
+    legacy = LegacyResponseProcessor("V4.13")
+    assert classify_response(line, command, "V4.13").text == legacy.process(line, command)
+
+def test_identifier_anywhere():
+    response = classify_response(b"echo:CBD make it. Date:Dec 14 2020", "M115", "V4.13")
+    assert response.kind == ResponseKind.IDENTIFIER
+    assert response.firmware_name == "CBD"
+    assert "FIRMWARE_NAME:CBD made it PROTOCOL_VERSION:V4.13" in response.text
+
+def test_position_anywhere():
+    response = classify_response(b"echo: C: X:0.000000 Y:0.000000 Z:3.500000", "M114")
+    assert response.kind == ResponseKind.POSITION
+    assert response.z == 3.5
+    assert "C: " not in response.text
+
+def test_progress_fields():
+    response = classify_response(b"SD printing byte 41234/1048576\r\n", "M27")
+    assert response.kind == ResponseKind.PROGRESS
+    assert (response.printing, response.current_byte, response.total_bytes) == (True, 41234, 1048576)
+
+    response = classify_response(b"Not SD printing.\r\n", "M27")
+    assert (response.printing, response.total_bytes) == (False, 0)
+
+def test_busy_and_noise():
+    assert classify_response(b"wait\r\n", "M27").kind == ResponseKind.BUSY
+    response = classify_response(b"\x00\x13ok V4.13\r\n", "M4002")
+    assert response.kind == ResponseKind.VERSION
+    assert response.version == "V4.13"
+    assert response.text == "ok startok V4.13"
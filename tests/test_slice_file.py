@@ -0,0 +1,64 @@
+"""Preview decoding of CTB (RLE RGB555) and Anycubic (RGB565) slice files"""
+
+import struct
+
+import pytest
+
+import slice_file
+from slice_file import (CTB_MAGIC, HEADER, PREVIEW_HEADER, PWMX_FILE_MARK, PWMX_PREVIEW,
+                        read_preview)
+
+def words(*values):
+    return struct.pack(f'<{len(values)}H', *values)
+
+def ctb_file(path, width, height, data):
+    """Minimal .ctb with a large preview and no layers"""
+    preview_offset = HEADER.size
+    data_offset = preview_offset + PREVIEW_HEADER.size
+    header = HEADER.pack(CTB_MAGIC, 3, 68.0, 120.0, 150.0, 0, 0, 0.0, 0.05, 2.0, 30.0, 1.0,
+                         5, 1440, 2560, preview_offset, 0, 0, 0, 0, 0, 0, 0, 1,
+                         255, 255, 0, 0, 0)
+    path.write_bytes(header + PREVIEW_HEADER.pack(width, height, data_offset, len(data)) + data)
+    return path
+
+def pwmx_file(path, width, height, data):
+    preview_address = PWMX_FILE_MARK.size
+    mark = PWMX_FILE_MARK.pack(b'ANYCUBIC', 1, 0, 0, 0, preview_address)
+    section = PWMX_PREVIEW.pack(b'PREVIEW', len(data), width, b'x', height)
+    path.write_bytes(mark + section + data)
+    return path
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def numpy_available(request, monkeypatch):
+    if request.param and not slice_file.NUMPY_AVAILABLE:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(slice_file, 'NUMPY_AVAILABLE', request.param)
+    return request.param
+
+def test_ctb_known_pixels(tmp_path, numpy_available):
+    # Green (RGB555, bits 6-10) repeated 3 times, then one red pixel
+    data = words(0x07C0 | slice_file.RLE_REPEAT_FLAG, 0x3002, 0xF800)
+    preview = read_preview(ctb_file(tmp_path / 'model.ctb', 2, 2, data))
+    assert (preview.width, preview.height) == (2, 2)
+    assert preview.rgb == bytes((0, 248, 0)) * 3 + bytes((248, 0, 0))
+
+def test_pwmx_known_pixels(tmp_path, numpy_available):
+    # Pure red, green and blue in RGB565, plus the lowest green bit
+    data = words(0xF800, 0x07E0, 0x001F, 0x0020)
+    preview = read_preview(pwmx_file(tmp_path / 'model.pwmx', 2, 2, data))
+    assert preview.rgb == bytes((248, 0, 0, 0, 252, 0, 0, 0, 248, 0, 4, 0))
+
+@pytest.mark.parametrize('width,height', [(0, 10), (100000, 100000), (2049, 1), (2048, 2048)])
+def test_ctb_implausible_size_rejected(tmp_path, width, height):
+    # A single long run: 2048x2048 pixels cannot come from 4 bytes
+    data = words(0x07C0 | slice_file.RLE_REPEAT_FLAG, 0x0FFF)
+    assert read_preview(ctb_file(tmp_path / 'bad.ctb', width, height, data)) is None
+
+def test_pwmx_implausible_size_rejected(tmp_path):
+    assert read_preview(pwmx_file(tmp_path / 'bad.pwmx', 100000, 100000, words(0, 0))) is None
+
+def test_ctb_runs_past_the_image_are_cut(tmp_path, numpy_available):
+    # Each pair claims 4096 pixels; only the first 4 are kept
+    data = words(0xF800 | slice_file.RLE_REPEAT_FLAG, 0x0FFF) * 64
+    preview = read_preview(ctb_file(tmp_path / 'model.ctb', 2, 2, data))
+    assert preview.rgb == bytes((248, 0, 0)) * 4
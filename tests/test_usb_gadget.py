@@ -0,0 +1,78 @@
+"""Mirroring the active image onto the staging image after a swap"""
+
+import os
+import shutil
+
+import pytest
+
+from usb_gadget import UsbGadgetManager
+
+class Snapshot:
+    def __init__(self, usb):
+        self.usb = usb
+
+    def section(self, name):
+        return self.usb if name == 'usb' else {}
+
+class Config:
+    def __init__(self, **usb):
+        self.usb = usb
+
+    def snapshot(self):
+        return Snapshot(self.usb)
+
+@pytest.fixture
+def gadget(tmp_path, monkeypatch):
+    """Gadget whose 'active image' is a plain directory copied in by the mount stub"""
+    mount_point = tmp_path / 'usb'
+    mount_point.mkdir()
+    active = tmp_path / 'active_files'
+    active.mkdir()
+    manager = UsbGadgetManager(Config(image_file='/b.bin', staging_image_file='/a.bin'),
+                               mount_point, tmp_path / 'manifest.json')
+    manager.mounted = []
+    monkeypatch.setattr(manager, 'lun_files', lambda: ['/b.bin'])
+
+    def mount(image, target=None, options=None):
+        manager.mounted.append((image, options))
+        shutil.copytree(active, target, dirs_exist_ok=True)
+    monkeypatch.setattr(manager, '_mount', mount)
+    monkeypatch.setattr(manager, '_unmount', lambda target=None: shutil.rmtree(target))
+    manager.active_files = active
+    return manager
+
+def write(path, data, mtime=1000):
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+def test_mirror_copies_and_keeps_unrecorded_files(gadget):
+    write(gadget.active_files / 'model.ctb', b'x' * 10)
+    write(gadget.mount_point / 'uploaded.ctb', b'y')
+    gadget._mirror_active()
+
+    assert gadget.mounted == [('/b.bin', 'loop,ro')]
+    assert gadget._mirror_progress['state'] == 'done'
+    assert sorted(path.name for path in gadget.mount_point.iterdir()) == ['model.ctb', 'uploaded.ctb']
+
+def test_mirror_only_deletes_files_it_copied(gadget):
+    write(gadget.active_files / 'old.ctb', b'o')
+    write(gadget.active_files / 'kept.ctb', b'k')
+    gadget._mirror_active()
+
+    # Deleted on the active side since; a new file appears on staging
+    (gadget.active_files / 'old.ctb').unlink()
+    write(gadget.mount_point / 'new.ctb', b'n')
+    gadget._mirror_active()
+
+    assert sorted(path.name for path in gadget.mount_point.iterdir()) == ['kept.ctb', 'new.ctb']
+    assert gadget._mirror_progress['removed'] == 1
+
+def test_mirror_waits_for_the_gadget(gadget, monkeypatch):
+    # LUN 0 still exports the staging image: nothing is mounted or changed
+    monkeypatch.setattr(gadget, 'lun_files', lambda: ['/a.bin'])
+    write(gadget.active_files / 'model.ctb', b'x')
+    gadget._mirror_active()
+
+    assert gadget.mounted == []
+    assert gadget._mirror_progress['state'] == 'failed'
+    assert not list(gadget.mount_point.iterdir())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Thumbnail Cache for Resin Printer Control Application
+Stores decoded slice file previews as PNG files on disk
+"""
+
+import os
+import struct
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Optional
+import logging
+
+from slice_file import read_preview, PREVIEW_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+def encode_png(width: int, height: int, rgb: bytes) -> bytes:
+    """Encode 8-bit RGB rows as a PNG (no filtering)"""
+    stride = width * 3
+    raw = b''.join(b'\x00' + rgb[row * stride:(row + 1) * stride] for row in range(height))
+
+    def chunk(chunk_type, data):
+        body = chunk_type + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xFFFFFFFF)
+
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw, 6)) +
+            chunk(b'IEND', b''))
+
+class ThumbnailCache:
+    """
+    On-disk cache of slice file previews
+
+    Entries are named <inode>-<mtime_ns>.png, so a replaced or rewritten
+    file gets a new key and the name doubles as the HTTP ETag.
+    """
+
+    def __init__(self, cache_dir="cache/thumbnails"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def supports(self, file_path) -> bool:
+        """Check if the file type embeds a preview"""
+        return Path(file_path).suffix.lower() in PREVIEW_EXTENSIONS
+
+    def get(self, file_path) -> Optional[Path]:
+        """
+        Get the cached PNG for a slice file, decoding it on first use
+
+        Args:
+            file_path (Path): Path to the slice file
+
+        Returns:
+            Path: PNG file in the cache, or None if the file has no preview
+        """
+        file_path = Path(file_path)
+        if not self.supports(file_path):
+            return None
+
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+
+        thumbnail = self.cache_dir / f"{stat.st_ino}-{stat.st_mtime_ns}.png"
+        if thumbnail.exists():
+            return thumbnail
+
+        preview = read_preview(file_path)
+        if preview is None:
+            return None
+
+        try:
+            png = encode_png(preview.width, preview.height, preview.rgb)
+            fd, temp_name = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(temp_name, thumbnail)
+        except Exception as e:
+            logger.error(f"Error caching thumbnail for {file_path.name}: {e}")
+            return None
+
+        self._remove_stale(stat.st_ino, thumbnail)
+        logger.info(f"Cached thumbnail for {file_path.name} ({preview.width}x{preview.height})")
+        return thumbnail
+
+    def _remove_stale(self, inode, keep):
+        """Delete older entries for the same inode"""
+        for entry in self.cache_dir.glob(f"{inode}-*.png"):
+            if entry != keep:
+                try:
+                    entry.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+UI Registry for Resin Printer Control Application
+Caches plugin UI contributions (toolbar, status bar, config tabs, assets)
+and serves them with ETags
+"""
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Contribution kind -> (PluginBase method, response key)
+UI_KINDS = {
+    'toolbar_items': ('get_toolbar_items', 'items'),
+    'status_bar_items': ('get_status_bar_items', 'items'),
+    'config_tabs': ('get_config_tabs', 'tabs'),
+    'frontend_assets': ('get_frontend_assets', 'assets'),
+}
+
+# Status bar items show live values (clock, relay states), so they are also
+# re-read once this old; everything else changes only on invalidate()
+LIVE_KINDS = {'status_bar_items': 1.0}
+
+@dataclass(frozen=True)
+class UIEntry:
+    """Merged contributions of one kind; value must be treated as read-only"""
+    value: Any
+    body: bytes          # JSON response body
+    etag: str
+    version: int
+    built_at: float
+
+class UIRegistry:
+    """
+    Memoized plugin UI contributions
+
+    Each plugin's contribution of each kind is cached until the plugin is
+    enabled, disabled, reloaded or reconfigured (see invalidate()). A
+    rebuilt result that serializes identically keeps its version and ETag,
+    so clients polling unchanged metadata get 304s.
+    """
+
+    def __init__(self, plugin_manager):
+        self.plugin_manager = plugin_manager
+        self._contributions: Dict[tuple, Any] = {}   # (plugin name, kind) -> value
+        self._entries: Dict[str, UIEntry] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, kind: str) -> UIEntry:
+        """
+        Get the merged contributions of one kind
+
+        Args:
+            kind (str): One of UI_KINDS
+
+        Returns:
+            UIEntry: Current value, response body and ETag
+        """
+        if kind not in UI_KINDS:
+            raise ValueError(f"Unknown UI contribution kind: {kind}")
+
+        entry = self._entries.get(kind)
+        max_age = LIVE_KINDS.get(kind)
+        if entry and (max_age is None or time.monotonic() - entry.built_at < max_age):
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(kind)
+            if entry and (max_age is None or time.monotonic() - entry.built_at < max_age):
+                return entry
+            if max_age is not None:
+                # Live kinds are re-read from every plugin
+                for key in [key for key in self._contributions if key[1] == kind]:
+                    del self._contributions[key]
+            entry = self._build(kind, entry)
+            self._entries[kind] = entry
+            return entry
+
+    def invalidate(self, plugin_name: str = None):
+        """
+        Drop cached contributions
+
+        Args:
+            plugin_name (str): Only this plugin's, or all if None
+        """
+        with self._lock:
+            if plugin_name is None:
+                self._contributions.clear()
+            else:
+                for key in [key for key in self._contributions if key[0] == plugin_name]:
+                    del self._contributions[key]
+            self._entries.clear()
+        logger.debug(f"UI contributions invalidated: {plugin_name or 'all plugins'}")
+
+    def _build(self, kind, previous):
+        method_name, response_key = UI_KINDS[kind]
+        merged = {"css": [], "js": []} if kind == 'frontend_assets' else []
+
+        for plugin in list(self.plugin_manager.loaded_plugins.values()):
+            key = (plugin.name, kind)
+            if key not in self._contributions:
+                try:
+                    self._contributions[key] = self._collect(plugin, kind, method_name)
+                except Exception as e:
+                    logger.error(f"Error getting {kind} from plugin {plugin.name}: {e}")
+                    continue
+            contribution = self._contributions[key]
+            if kind == 'frontend_assets':
+                for asset_type, files in contribution.items():
+                    if asset_type in merged:
+                        merged[asset_type].extend(files)
+            else:
+                merged.extend(contribution)
+
+        body = json.dumps({'success': True, response_key: merged}, separators=(',', ':')).encode('utf-8')
+        if previous and previous.body == body:
+            return UIEntry(previous.value, body, previous.etag, previous.version, time.monotonic())
+
+        self._version += 1
+        etag = f"{kind}-{hashlib.blake2b(body, digest_size=8).hexdigest()}"
+        return UIEntry(merged, body, etag, self._version, time.monotonic())
+
+    def _collect(self, plugin, kind, method_name):
+        result = getattr(plugin, method_name)()
+        if kind == 'frontend_assets':
+            return {asset_type: list(files) for asset_type, files in result.items()}
+        items = []
+        for item in result:
+            item = dict(item)
+            item['plugin'] = plugin.name
+            items.append(item)
+        return items
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+USB Gadget Manager for Resin Printer Control Application
+Exposes the print images to the printer as a USB mass storage device,
+through configfs (several LUNs, live image swaps) or the g_mass_storage
+module as a fallback
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIGFS_ROOT = Path("/sys/kernel/config/usb_gadget")
+UDC_ROOT = Path("/sys/class/udc")
+
+GADGET_NAME = "resin_printer"
+FUNCTION_NAME = "mass_storage.usb0"
+CONFIG_NAME = "c.1"
+
+# Same identity g_mass_storage presents ("File-backed Storage Gadget"), so
+# the printer sees the device it always has
+GADGET_IDS = {
+    'idVendor': '0x0525',
+    'idProduct': '0xa4a5',
+    'bcdDevice': '0x0100',
+    'bcdUSB': '0x0200',
+}
+GADGET_STRINGS = {
+    'manufacturer': 'Resin Print Portal',
+    'product': 'Mass Storage',
+    'serialnumber': 'resin0001',
+}
+
+# Per-LUN attributes, matching the g_mass_storage parameters used before
+LUN_ATTRIBUTES = {'removable': '1', 'ro': '0', 'nofua': '1', 'cdrom': '0'}
+
+BACKEND_CONFIGFS = 'configfs'
+BACKEND_LEGACY = 'g_mass_storage'
+
+class GadgetError(Exception):
+    """A gadget operation failed or is not possible in the current setup"""
+
+class UsbGadgetManager:
+    """
+    Manages the USB mass storage gadget the printer reads its files from
+
+    Settings come from the 'usb' config section:
+        image_file: image exposed to the printer as LUN 0
+        staging_image_file: optional second image. While set, the mount
+            point holds this (inactive) image, so uploads never write to
+            the FAT filesystem the printer is reading; swap() then hands it
+            to the printer in one media change.
+        extra_image_files: images exposed as further LUNs (1, 2, ...) of
+            the same device, so they all go to the one printer on the Pi's
+            USB port; LUNs are not assigned to printers
+        backend: 'auto', 'configfs' or 'g_mass_storage'
+        mount_options: options for mounting the staging image
+        mirror_after_swap: copy the newly active image's files onto the
+            new staging image after a swap (in the background, progress in
+            status()), so both hold the same library. Only files an
+            earlier mirror copied are ever deleted from the staging image
+            (the list is kept in manifest_path).
+
+    Image swaps and extra LUNs need configfs (libcomposite); with the
+    g_mass_storage module only the images given at load time are exposed.
+    """
+
+    # Seconds to let the host notice a gadget going away before rebinding
+    REBIND_DELAY = 2.0
+
+    def __init__(self, config_manager, mount_point, manifest_path="data/usb_mirror.json"):
+        """
+        Args:
+            config_manager (ConfigManager): Source of the 'usb' section;
+                swaps are recorded there
+            mount_point (Path): Where the file manager reads and writes
+            manifest_path (str): Where the files of the last mirror are listed
+        """
+        self.config_manager = config_manager
+        self.mount_point = Path(mount_point)
+        self.manifest_path = Path(manifest_path)
+        self.gadget_dir = CONFIGFS_ROOT / GADGET_NAME
+        self._lock = threading.RLock()
+        self._mirror_thread = None
+        self._mirror_progress = {'state': 'idle'}
+
+    # ---- configuration ----
+
+    @property
+    def config(self):
+        return self.config_manager.snapshot().section('usb')
+
+    @property
+    def image_file(self) -> str:
+        return self.config.get('image_file', '/piusb.bin')
+
+    @property
+    def staging_image_file(self) -> Optional[str]:
+        return self.config.get('staging_image_file') or None
+
+    @property
+    def extra_image_files(self) -> List[str]:
+        return list(self.config.get('extra_image_files', ()))
+
+    def images(self) -> List[str]:
+        """Backing images by LUN number"""
+        return [self.image_file] + self.extra_image_files
+
+    @property
+    def backend(self) -> str:
+        """Backend start() uses"""
+        configured = self.config.get('backend', 'auto')
+        if configured in (BACKEND_CONFIGFS, BACKEND_LEGACY):
+            return configured
+        if CONFIGFS_ROOT.exists():
+            return BACKEND_CONFIGFS
+        # libcomposite may just not be loaded yet
+        if _run('modprobe', 'libcomposite', sudo=True).returncode == 0 and CONFIGFS_ROOT.exists():
+            return BACKEND_CONFIGFS
+        return BACKEND_LEGACY
+
+    # ---- state ----
+
+    def running_backend(self) -> Optional[str]:
+        """Backend currently exposing the images, None if the gadget is down"""
+        try:
+            if (self.gadget_dir / 'UDC').read_text().strip():
+                return BACKEND_CONFIGFS
+        except OSError:
+            pass
+        try:
+            with open('/proc/modules', 'r') as f:
+                if any(line.startswith(BACKEND_LEGACY + ' ') for line in f):
+                    return BACKEND_LEGACY
+        except OSError:
+            pass
+        return None
+
+    def is_running(self) -> bool:
+        return self.running_backend() is not None
+
+    def lun_files(self) -> List[str]:
+        """Images the configfs gadget currently exposes, by LUN number"""
+        function_dir = self.gadget_dir / 'functions' / FUNCTION_NAME
+        files = []
+        lun = 0
+        while (function_dir / f'lun.{lun}').is_dir():
+            try:
+                files.append((function_dir / f'lun.{lun}' / 'file').read_text().strip())
+            except OSError:
+                files.append('')
+            lun += 1
+        return files
+
+    def mounted_image(self) -> Optional[str]:
+        """Backing file of the loop device mounted at the mount point"""
+        try:
+            with open('/proc/mounts', 'r') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 1 and fields[1] == str(self.mount_point):
+                        device = fields[0]
+                        if not device.startswith('/dev/loop'):
+                            return device
+                        backing = Path('/sys/block') / Path(device).name / 'loop' / 'backing_file'
+                        return backing.read_text().strip()
+        except OSError as e:
+            logger.debug(f"Cannot read mounts: {e}")
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        """Gadget state for the UI (reads only procfs/sysfs)"""
+        running = self.running_backend()
+        return {
+            'running': running is not None,
+            'backend': running or self.config.get('backend', 'auto'),
+            'active_image': self.image_file,
+            'staging_image': self.staging_image_file,
+            'mounted_image': self.mounted_image(),
+            'luns': self.lun_files() if running == BACKEND_CONFIGFS else self.images() if running else [],
+            'can_swap': (running == BACKEND_CONFIGFS and self.staging_image_file is not None and
+                         not self.is_mirroring()),
+            'mirror': dict(self._mirror_progress)
+        }
+
+    def is_mirroring(self) -> bool:
+        """Whether the staging image is still being brought up to date after a swap"""
+        return self._mirror_thread is not None and self._mirror_thread.is_alive()
+
+    # ---- start / stop ----
+
+    def start(self):
+        """
+        Expose the images to the printer and mount the staging image
+
+        Raises:
+            GadgetError: If the gadget could not be started
+        """
+        with self._lock:
+            backend = self.backend
+            running = self.running_backend()
+            if running and running != backend:
+                self._stop(running)
+                time.sleep(self.REBIND_DELAY)
+
+            if backend == BACKEND_CONFIGFS:
+                self._start_configfs()
+            else:
+                if self.extra_image_files:
+                    logger.warning("g_mass_storage exposes the extra images, but cannot swap them")
+                self._start_legacy()
+
+            if self.staging_image_file:
+                self._mount_staging()
+            logger.info(f"USB gadget started ({backend}): {', '.join(self.images())}")
+
+    def ensure_started(self):
+        """Start the gadget unless it already runs on the configured backend"""
+        running = self.running_backend()
+        if running and running == self.backend:
+            if self.staging_image_file:
+                with self._lock:
+                    self._mount_staging()
+            return
+        self.start()
+
+    def stop(self):
+        """
+        Take the images away from the printer
+
+        Raises:
+            GadgetError: If the gadget could not be stopped
+        """
+        with self._lock:
+            running = self.running_backend()
+            if running:
+                self._stop(running)
+                logger.info(f"USB gadget stopped ({running})")
+
+    def restart(self):
+        """Re-present the images, e.g. after the printer reported a USB error"""
+        with self._lock:
+            self.stop()
+            time.sleep(self.REBIND_DELAY)
+            self.start()
+
+    def _start_legacy(self):
+        images = self.images()
+        result = _run('modprobe', BACKEND_LEGACY,
+                      f"file={','.join(images)}",
+                      f"removable={','.join(['1'] * len(images))}",
+                      f"ro={','.join(['0'] * len(images))}",
+                      'stall=0', 'nofua=1', 'cdrom=0', sudo=True)
+        if result.returncode != 0:
+            raise GadgetError(result.stderr.strip() or f"modprobe {BACKEND_LEGACY} failed")
+
+    def _start_configfs(self):
+        gadget = self.gadget_dir
+        function_dir = gadget / 'functions' / FUNCTION_NAME
+        config_dir = gadget / 'configs' / CONFIG_NAME
+
+        # Layout: IDs, strings, one mass storage function linked into one config
+        for directory in (gadget / 'strings' / '0x409', config_dir / 'strings' / '0x409', function_dir):
+            _mkdir(directory)
+        for name, value in GADGET_IDS.items():
+            _set(gadget / name, value)
+        for name, value in GADGET_STRINGS.items():
+            _set(gadget / 'strings' / '0x409' / name, value)
+        _set(config_dir / 'strings' / '0x409' / 'configuration', 'Mass Storage')
+        _set(config_dir / 'MaxPower', '250')
+        _set(function_dir / 'stall', '0')
+
+        # LUN 0 exists with the function; the others are created on demand
+        for lun, image in enumerate(self.images()):
+            lun_dir = function_dir / f'lun.{lun}'
+            _mkdir(lun_dir)
+            for name, value in LUN_ATTRIBUTES.items():
+                _set(lun_dir / name, value)
+            self._set_lun_file(lun, image)
+
+        link = config_dir / FUNCTION_NAME
+        if not link.is_symlink():
+            _symlink(function_dir, link)
+
+        if not (gadget / 'UDC').read_text().strip():
+            udcs = sorted(os.listdir(UDC_ROOT)) if UDC_ROOT.exists() else []
+            if not udcs:
+                raise GadgetError("No USB device controller found (is dwc2 enabled?)")
+            _write(gadget / 'UDC', udcs[0])
+
+    def _stop(self, backend):
+        if backend == BACKEND_CONFIGFS:
+            # Unbinding is enough; the layout is reused by the next start
+            _write(self.gadget_dir / 'UDC', '')
+        else:
+            result = _run('rmmod', BACKEND_LEGACY, sudo=True)
+            if result.returncode != 0:
+                raise GadgetError(result.stderr.strip() or f"rmmod {BACKEND_LEGACY} failed")
+
+    def _set_lun_file(self, lun, image):
+        """Point a LUN at an image; the host sees a media change"""
+        lun_dir = self.gadget_dir / 'functions' / FUNCTION_NAME / f'lun.{lun}'
+        current = (lun_dir / 'file').read_text().strip()
+        if current == image:
+            return
+        if current and (lun_dir / 'forced_eject').exists():
+            # Ejects even if the host locked the medium
+            _write(lun_dir / 'forced_eject', '1')
+        _write(lun_dir / 'file', image)
+
+    # ---- staging ----
+
+    def swap(self):
+        """
+        Hand the staging image to the printer and stage on the old one
+
+        The staging image is unmounted (so its FAT is consistent on disk)
+        and replaces the active image on LUN 0 in a single media change.
+        The previously active image is then mounted for staging and, with
+        mirror_after_swap, brought up to date with the new active image
+        by a background thread; status()['mirror'] reports its progress.
+
+        Returns:
+            dict: New active and staging images
+
+        Raises:
+            GadgetError: If swapping is not possible or failed
+        """
+        with self._lock:
+            staging, active = self.staging_image_file, self.image_file
+            if not staging:
+                raise GadgetError("No staging image configured (usb.staging_image_file)")
+            if self.running_backend() != BACKEND_CONFIGFS:
+                raise GadgetError("Swapping images needs the configfs gadget to be running")
+            if self.is_mirroring():
+                raise GadgetError("The staging image is still being mirrored from the last swap")
+
+            self._unmount()
+            try:
+                self._set_lun_file(0, staging)
+            except GadgetError:
+                self._mount(staging)
+                raise
+
+            if not self.config_manager.update_many({'usb': {'image_file': staging, 'staging_image_file': active}}):
+                logger.warning("Swapped USB images, but could not save the new assignment")
+            self._mount(active)
+            logger.info(f"USB images swapped: printer reads {staging}, staging on {active}")
+
+            if self.config.get('mirror_after_swap', True):
+                self._mirror_progress = {'state': 'starting'}
+                self._mirror_thread = threading.Thread(target=self._mirror_active, name='usb-mirror', daemon=True)
+                self._mirror_thread.start()
+            return {'active_image': staging, 'staging_image': active, 'mirroring': self.is_mirroring()}
+
+    def _mount_staging(self):
+        """Make sure the mount point holds the staging image, not the active one"""
+        mounted = self.mounted_image()
+        if mounted == self.staging_image_file:
+            return
+        if mounted is not None:
+            self._unmount()
+        self._mount(self.staging_image_file)
+
+    def _mount(self, image, mount_point=None, options=None):
+        mount_point = mount_point or self.mount_point
+        options = options or self.config.get('mount_options', 'loop,rw,umask=000')
+        result = _run('mount', '-o', options, image, str(mount_point), sudo=True)
+        if result.returncode != 0:
+            raise GadgetError(result.stderr.strip() or f"Cannot mount {image}")
+
+    def _unmount(self, mount_point=None):
+        mount_point = mount_point or self.mount_point
+        os.sync()
+        result = _run('umount', str(mount_point), sudo=True)
+        if result.returncode != 0:
+            raise GadgetError(result.stderr.strip() or f"Cannot unmount {mount_point}")
+
+    def _mirror_active(self):
+        """Copy the active image's files onto the staging image (runs in its own thread)"""
+        started = time.time()
+        progress = self._mirror_progress = {'state': 'running', 'started': started,
+                                            'files': 0, 'bytes': 0, 'copied': 0,
+                                            'bytes_done': 0, 'removed': 0, 'current': None}
+        source = self.mount_point.with_name(self.mount_point.name + '_active')
+        try:
+            # Only read the active image once the printer has it on LUN 0 and
+            # no LUN still exports the staging image we are about to write
+            luns = self.lun_files()
+            if not luns or luns[0] != self.image_file or self.staging_image_file in luns:
+                raise GadgetError(f"Gadget does not export the expected images (LUNs: {luns})")
+            source.mkdir(exist_ok=True)
+            # Read-only, so the printer's filesystem is never written from here
+            self._mount(self.image_file, source, 'loop,ro')
+        except (OSError, GadgetError) as e:
+            logger.warning(f"Cannot mirror the active image: {e}")
+            progress.update(state='failed', error=str(e), finished=time.time())
+            return
+        try:
+            wanted = {path.name: path for path in source.iterdir() if path.is_file()}
+            # Files the previous mirror put in place and that are gone from
+            # the active image were deleted there; anything else on the
+            # staging image (e.g. just uploaded) is left alone
+            stale = [self.mount_point / name for name in self._read_manifest()
+                     if name not in wanted and (self.mount_point / name).is_file()]
+            progress.update(files=len(wanted), bytes=sum(path.stat().st_size for path in wanted.values()))
+            for path in stale:
+                path.unlink()
+                progress['removed'] += 1
+            for name, path in wanted.items():
+                target = self.mount_point / name
+                stat = path.stat()
+                if target.exists():
+                    target_stat = target.stat()
+                    # Same file, or placed on the staging image since the swap
+                    if ((target_stat.st_size == stat.st_size and int(target_stat.st_mtime) == int(stat.st_mtime)) or
+                            target_stat.st_mtime >= started):
+                        progress['bytes_done'] += stat.st_size
+                        continue
+                progress['current'] = name
+                shutil.copy2(path, target)
+                progress['copied'] += 1
+                progress['bytes_done'] += stat.st_size
+            os.sync()
+            self._write_manifest(sorted(wanted))
+            progress.update(state='done', current=None, finished=time.time())
+            logger.info(f"Staging image mirrored: {progress['copied']} copied, {progress['removed']} removed")
+        except OSError as e:
+            logger.warning(f"Mirroring the active image failed: {e}")
+            progress.update(state='failed', error=str(e), current=None, finished=time.time())
+        finally:
+            try:
+                self._unmount(source)
+            except GadgetError as e:
+                logger.warning(f"Cannot unmount {source}: {e}")
+
+    def _read_manifest(self):
+        """Names the last mirror copied; empty if there was none"""
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return list(json.load(f).get('files', []))
+        except (OSError, ValueError, AttributeError):
+            return []
+
+    def _write_manifest(self, names):
+        try:
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump({'image': self.image_file, 'files': names, 'time': time.time()}, f)
+            os.replace(temp_path, self.manifest_path)
+        except OSError as e:
+            logger.warning(f"Cannot record the mirrored files: {e}")
+
+def _run(*command, sudo=False):
+    """Run a system command, through sudo unless already root"""
+    if sudo and os.geteuid() != 0:
+        command = ('sudo',) + command
+    try:
+        return subprocess.run(command, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return subprocess.CompletedProcess(command, 1, '', str(e))
+
+def _write(path, value):
+    """Write a configfs/sysfs attribute"""
+    try:
+        Path(path).write_text(value + '\n' if value else '\n')
+        return
+    except PermissionError:
+        pass
+    except OSError as e:
+        raise GadgetError(f"Cannot write {path}: {e}")
+    result = _run('sh', '-c', 'printf "%s\\n" "$1" > "$2"', 'sh', value, str(path), sudo=True)
+    if result.returncode != 0:
+        raise GadgetError(f"Cannot write {path}: {result.stderr.strip()}")
+
+def _set(path, value):
+    """Write an attribute unless it already has the value (some are read-only while in use)"""
+    try:
+        if Path(path).read_text().strip() == value:
+            return
+    except OSError:
+        pass
+    _write(path, value)
+
+def _mkdir(path):
+    if Path(path).is_dir():
+        return
+    try:
+        Path(path).mkdir(parents=True)
+        return
+    except PermissionError:
+        pass
+    except OSError as e:
+        raise GadgetError(f"Cannot create {path}: {e}")
+    result = _run('mkdir', '-p', str(path), sudo=True)
+    if result.returncode != 0:
+        raise GadgetError(f"Cannot create {path}: {result.stderr.strip()}")
+
+def _symlink(target, link):
+    try:
+        Path(link).symlink_to(target)
+        return
+    except PermissionError:
+        pass
+    except OSError as e:
+        raise GadgetError(f"Cannot link {link}: {e}")
+    result = _run('ln', '-s', str(target), str(link), sudo=True)
+    if result.returncode != 0:
+        raise GadgetError(f"Cannot link {link}: {result.stderr.strip()}")
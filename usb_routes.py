@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+USB Gadget Routes for Resin Printer Control Application
+Contains the Flask routes for the gadget state and staging image swaps
+"""
+
+from flask import Blueprint, request, jsonify
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Print states during which the printer reads the active image
+BUSY_STATES = {'PRINTING', 'PAUSED'}
+
+def create_usb_routes(usb_gadget, printer_registry, file_manager):
+    """
+    Create Flask blueprint with USB gadget routes
+
+    Args:
+        usb_gadget: UsbGadgetManager instance
+        printer_registry: PrinterRegistry, to check the printer on the USB
+            port is not printing and to make it re-read the new image
+        file_manager: FileManager serving the staging mount point
+
+    Returns:
+        Blueprint: Flask blueprint with USB gadget routes
+    """
+
+    usb_bp = Blueprint('usb', __name__, url_prefix='/api/usb')
+
+    @usb_bp.route('/gadget')
+    def api_gadget_status():
+        """Gadget backend, exposed LUNs and the active/staging images"""
+        try:
+            return jsonify({'success': True, 'gadget': usb_gadget.status()})
+        except Exception as e:
+            logger.error(f"Error getting USB gadget status: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+
+    @usb_bp.route('/swap', methods=['POST'])
+    def api_swap_images():
+        """
+        Hand the staging image (with the files uploaded since the last
+        swap) to the printer. Refused while a print is running unless
+        the body has {"force": true}, and while resumable uploads are
+        open (their partial files are on the staging image) unless it has
+        {"abort_uploads": true}. The mirror of the new staging image runs
+        in the background; /api/usb/gadget reports its progress.
+        """
+        data = request.get_json(silent=True) or {}
+        printer = printer_registry.gadget_printer()
+        if (printer.is_connected and printer.print_status.state.value in BUSY_STATES and
+                not data.get('force')):
+            return jsonify({'success': False,
+                            'error': f"Printer {printer.printer_id} is printing from the active image"}), 409
+
+        uploads = file_manager.open_uploads()
+        if uploads:
+            if not data.get('abort_uploads'):
+                return jsonify({'success': False,
+                                'error': f"{len(uploads)} upload(s) in progress on the staging image",
+                                'uploads': uploads}), 409
+            for upload in uploads:
+                file_manager.abort_upload(upload['upload_id'])
+
+        try:
+            result = usb_gadget.swap()
+        except Exception as e:
+            logger.error(f"USB image swap failed: {e}")
+            return jsonify({'success': False, 'error': str(e)})
+
+        # The mount point now holds the other image
+        file_manager.refresh_index(force=True)
+
+        # Make the printer re-read the card
+        if printer.is_connected:
+            try:
+                printer.send_command_async("M21")
+            except Exception as e:
+                logger.warning(f"Printer {printer.printer_id} did not take M21 after the swap: {e}")
+
+        return jsonify({'success': True, 'message': 'USB images swapped', **result})
+
+    return usb_bp